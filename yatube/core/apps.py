@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import checks, identity, querycache, sessions
+        checks.connect()
+        querycache.connect()
+        identity.install()
+        sessions.connect()
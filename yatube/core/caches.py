@@ -0,0 +1,11 @@
+"""Общий ли кеш у процессов сайта."""
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias='default'):
+    """Видят ли все процессы записи друг друга в кеше ``alias``.
+
+    ``LocMemCache`` у каждого процесса свой.
+    """
+    return not isinstance(caches[alias], LocMemCache)
@@ -0,0 +1,47 @@
+"""Проверки настроек для ``check --deploy``."""
+from django.conf import settings
+from django.core import checks
+
+from core.caches import is_shared
+
+
+def check_query_cache(app_configs, **kwargs):
+    if settings.QUERY_CACHE_TIMEOUT and not is_shared():
+        return [checks.Warning(
+            'Кеш запросов выключен: LocMemCache не общий у процессов, '
+            'и запросы с cached() идут в БД.',
+            hint='Подключите общий кеш (memcached, redis).',
+            id='core.W001',
+        )]
+    return []
+
+
+def check_sessions(app_configs, **kwargs):
+    if settings.SESSION_ENGINE == 'core.sessions' and not (
+        is_shared(settings.SESSION_CACHE_ALIAS) and is_shared()
+    ):
+        return [checks.Warning(
+            'core.sessions с LocMemCache читает сессии и пользователей '
+            'из БД на каждый запрос.',
+            hint='Подключите общий кеш (memcached, redis).',
+            id='core.W002',
+        )]
+    return []
+
+
+def check_page_cache(app_configs, **kwargs):
+    if settings.PAGE_CACHE_ENABLED and not is_shared():
+        return [checks.Warning(
+            'Кеш страниц выключен: LocMemCache не общий у процессов, и '
+            'сброс страниц после записи не дошёл бы до других воркеров.',
+            hint='Подключите общий кеш (memcached, redis).',
+            id='core.W003',
+        )]
+    return []
+
+
+def connect():
+    """Регистрирует проверки."""
+    checks.register(check_query_cache, 'caches', deploy=True)
+    checks.register(check_sessions, 'caches', deploy=True)
+    checks.register(check_page_cache, 'caches', deploy=True)
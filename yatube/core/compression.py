@@ -0,0 +1,67 @@
+"""Сжатие длинных текстов в БД.
+
+``compressed()`` включает сжатие у обычного ``TextField``: значения
+длиннее ``TEXT_COMPRESSION_THRESHOLD`` байт при записи сжимаются zlib
+и хранятся как ``MARKER`` и base85 сжатых байт, при чтении из БД
+распаковываются обратно. Тип поля и колонки не меняется, поэтому
+миграция схемы не нужна, а старые несжатые строки читаются как есть.
+
+Распаковка делается в конвертере поля, чтобы ``values()`` и
+``values_list()`` тоже отдавали строки. Ленты, которым полный текст не
+нужен, должны его откладывать (``defer``) — тогда сжатые значения не
+читаются вовсе.
+
+Поиск по подстроке на стороне БД сжатые строки не находит: для
+админки есть ``CompressedSearchMixin`` в ``posts.admin``.
+"""
+import zlib
+from base64 import b85decode, b85encode
+
+from django.conf import settings
+
+MARKER = 'zlib:'
+LEVEL = 6
+
+
+def encode(value):
+    """Значение для записи в БД: сжатое, если оно длиннее порога и
+    сжатие его укорачивает.
+
+    Несжатый текст, начинающийся с ``MARKER``, тоже сжимается, иначе
+    при чтении его приняли бы за сжатый.
+    """
+    if not isinstance(value, str):
+        return value
+    raw = value.encode()
+    short = len(raw) <= settings.TEXT_COMPRESSION_THRESHOLD
+    if short and not value.startswith(MARKER):
+        return value
+    packed = MARKER + b85encode(zlib.compress(raw, LEVEL)).decode('ascii')
+    if short or len(packed) < len(raw):
+        return packed
+    # Несжимаемый текст выгоднее хранить как есть.
+    return value
+
+
+def decode(value):
+    """Исходный текст из значения, прочитанного из БД."""
+    if isinstance(value, str) and value.startswith(MARKER):
+        packed = b85decode(value[len(MARKER):])
+        return zlib.decompress(packed).decode()
+    return value
+
+
+def compressed(field):
+    """Включает сжатие у текстового поля модели и возвращает его."""
+    get_db_prep_save = field.get_db_prep_save
+
+    def get_db_prep_save_compressed(value, connection):
+        return get_db_prep_save(encode(value), connection)
+
+    def from_db_value(value, expression, connection):
+        return decode(value)
+
+    field.get_db_prep_save = get_db_prep_save_compressed
+    field.from_db_value = from_db_value
+    field.compressed = True
+    return field
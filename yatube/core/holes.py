@@ -0,0 +1,112 @@
+"""Личные блоки страницы, вставляемые после рендера.
+
+Страница рисуется как общая для всех заготовка: на месте личных
+блоков (меню пользователя, кнопки подписки, формы с CSRF-токеном)
+тег ``{% hole %}`` из библиотеки ``holes`` оставляет метку с именем
+блока и его параметрами. ``core.middleware.HoleMiddleware`` заменяет
+метки в HTML-ответе на блоки, отрисованные для текущего запроса. Такую
+заготовку можно кешировать целиком и отдавать любому пользователю, см.
+``core.pagecache``.
+
+Блок регистрируется через ``register(name, template_name, load)``:
+шаблон блока рисуется с параметрами метки, а ``load(request,
+params_list)`` возвращает по контексту на каждую метку блока — одним
+запросом на все метки страницы. Если блок отрисован в том же запросе
+(view посчитал для него контекст), повторно он не рисуется.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+from django.utils.crypto import salted_hmac
+
+HOLES = {}
+
+
+def register(name, template_name, load=None):
+    HOLES[name] = (template_name, load)
+
+
+def _token():
+    # Подделать метку текстом поста нельзя: токен зависит от SECRET_KEY.
+    return salted_hmac('core.holes', 'marker').hexdigest()[:16]
+
+
+def _pattern():
+    return re.compile(f'<!--hole:{_token()}:([A-Za-z0-9_=-]+)-->')
+
+
+def marker(name, params):
+    payload = base64.urlsafe_b64encode(
+        json.dumps([name, params], sort_keys=True).encode()
+    ).decode()
+    return f'<!--hole:{_token()}:{payload}-->'
+
+
+def stash(request, name, params, render):
+    """Рисует блок через ``render()`` и запоминает его до ``splice``.
+
+    Возвращает метку, которая встаёт в заготовку вместо блока.
+    """
+    csrf_used = request.META.get('CSRF_COOKIE_USED')
+    html = render()
+    if request.META.get('CSRF_COOKIE_USED') and not csrf_used:
+        # Токен попал в блок, а не в заготовку: заготовку можно
+        # кешировать, а cookie нужна ответу после splice.
+        del request.META['CSRF_COOKIE_USED']
+        request.holes_csrf_used = True
+    mark = marker(name, params)
+    if not hasattr(request, 'holes'):
+        request.holes = {}
+    request.holes[mark] = html
+    return mark
+
+
+def has_holes(content):
+    return f'<!--hole:{_token()}:'.encode() in content
+
+
+def _render(request, marks):
+    rendered = dict(getattr(request, 'holes', {}))
+    pending = {}
+    for mark, payload in marks.items():
+        if mark in rendered:
+            continue
+        name, params = json.loads(base64.urlsafe_b64decode(payload))
+        pending.setdefault(name, []).append((mark, params))
+    for name, holes in pending.items():
+        if name not in HOLES:
+            rendered.update(dict.fromkeys(
+                (mark for mark, _ in holes), ''
+            ))
+            continue
+        template_name, load = HOLES[name]
+        params_list = [params for _, params in holes]
+        contexts = (
+            load(request, params_list) if load
+            else [{} for _ in params_list]
+        )
+        for (mark, params), context in zip(holes, contexts):
+            rendered[mark] = render_to_string(
+                template_name, {**params, **context}, request
+            )
+    return rendered
+
+
+def splice(request, content, charset):
+    """HTML ответа с блоками для ``request`` на месте меток."""
+    text = content.decode(charset)
+    marks = {
+        match.group(0): match.group(1)
+        for match in _pattern().finditer(text)
+    }
+    rendered = _render(request, marks)
+    if getattr(request, 'holes_csrf_used', False):
+        request.META['CSRF_COOKIE_USED'] = True
+    return _pattern().sub(
+        lambda match: rendered[match.group(0)], text
+    ).encode(charset)
+
+
+register('header_menu', 'includes/holes/header_menu.html')
@@ -0,0 +1,144 @@
+"""Карта объектов на время запроса.
+
+Пока идёт запрос, пользователи и группы (``IDENTITY_MAP_MODELS``)
+загружаются из БД не больше одного раза: переход по внешнему ключу,
+``get_object_or_404`` этого модуля и ``request.user`` отдают один и
+тот же объект из карты. Карту открывает и очищает
+``core.middleware.IdentityMapMiddleware``; вне запроса (команды,
+тесты без клиента) всё работает как обычно.
+
+Переход по ключу к пользователю сначала достаёт ``request.user``: в
+полной странице его всё равно загрузит шапка, а совпадает он с
+автором часто. Изменения через ``update()`` внутри запроса карта не
+видит — объект остаётся таким, каким был загружен.
+"""
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Model
+from django.db.models.signals import post_delete
+from django.shortcuts import get_object_or_404 as _get_object_or_404
+
+from core import sessions
+
+_local = threading.local()
+
+
+def _scope():
+    return getattr(_local, 'scope', None)
+
+
+def _mapped(model):
+    return model._meta.label in settings.IDENTITY_MAP_MODELS
+
+
+def activate(request):
+    _local.scope = {'request': request, 'objects': {}}
+
+
+def deactivate():
+    _local.scope = None
+
+
+def remember(obj):
+    """Кладёт объект в карту текущего запроса и возвращает его."""
+    scope = _scope()
+    if scope is not None and obj is not None and obj.pk is not None and (
+        _mapped(type(obj))
+    ):
+        scope['objects'].setdefault((obj._meta.label, obj.pk), obj)
+    return obj
+
+
+def forget(obj):
+    scope = _scope()
+    if scope is not None:
+        scope['objects'].pop((obj._meta.label, obj.pk), None)
+
+
+def find(model, **lookups):
+    """Объект из карты по pk или уникальным полям; None — его там нет."""
+    scope = _scope()
+    if scope is None or not _mapped(model):
+        return None
+    fields = {}
+    for name, value in lookups.items():
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(
+            name
+        )
+        if not field.unique:
+            return None
+        fields[field.attname] = field.to_python(value)
+    if model is get_user_model() and scope['request'] is not None:
+        # Пользователь запроса — частый кандидат, а в полной странице
+        # его всё равно загрузит шапка.
+        remember(sessions.get_user(scope['request']))
+    for (label, _), obj in scope['objects'].items():
+        if label == model._meta.label and all(
+            getattr(obj, name) == value for name, value in fields.items()
+        ):
+            return obj
+    return None
+
+
+def get_object_or_404(klass, **lookups):
+    """``get_object_or_404``, который сначала ищет объект в карте.
+
+    Карта используется только для выборки без фильтров и поиска по
+    уникальным полям.
+    """
+    queryset = klass._default_manager.all() if isinstance(
+        klass, type
+    ) and issubclass(klass, Model) else klass
+    if not queryset.query.where:
+        found = find(queryset.model, **lookups)
+        if found is not None:
+            return found
+    return remember(_get_object_or_404(queryset, **lookups))
+
+
+class IdentityDescriptorMixin:
+    """Переход по внешнему ключу через карту запроса."""
+
+    def get_object(self, instance):
+        model = self.field.remote_field.model
+        found = find(model, pk=getattr(instance, self.field.attname))
+        if found is not None:
+            return found
+        return remember(super().get_object(instance))
+
+
+def install():
+    """Подключает карту к внешним ключам на модели из
+    ``IDENTITY_MAP_MODELS`` и к удалению этих моделей.
+    """
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if not (
+                field.many_to_one or field.one_to_one
+            ) or not field.concrete or not _mapped(field.related_model):
+                continue
+            if field.target_field != field.related_model._meta.pk:
+                continue
+            descriptor = model.__dict__.get(field.name)
+            if descriptor is None or isinstance(
+                descriptor, IdentityDescriptorMixin
+            ):
+                continue
+            descriptor_class = type(
+                f'Identity{type(descriptor).__name__}',
+                (IdentityDescriptorMixin, type(descriptor)),
+                {},
+            )
+            setattr(model, field.name, descriptor_class(field))
+        if _mapped(model):
+            post_delete.connect(
+                _deleted, sender=model,
+                dispatch_uid=f'identity_delete_{model._meta.label}',
+            )
+
+
+def _deleted(sender, instance, **kwargs):
+    forget(instance)
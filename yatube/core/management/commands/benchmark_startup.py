@@ -0,0 +1,106 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Код замера в отдельном процессе: время импорта считается с нуля.
+PROBE = '''
+import importlib, json, os, sys, time, types
+started = time.perf_counter()
+settings_module, wsgi_module, preload, url = sys.argv[1:]
+# Настройки проекта с нужной предзагрузкой и без прогрева кеша.
+probe_settings = types.ModuleType('startup_probe_settings')
+exec(f'from {settings_module} import *', probe_settings.__dict__)
+probe_settings.STARTUP_PRELOAD = preload == '1'
+probe_settings.WARM_CACHE_ON_STARTUP = False
+sys.modules[probe_settings.__name__] = probe_settings
+os.environ['DJANGO_SETTINGS_MODULE'] = probe_settings.__name__
+application = importlib.import_module(wsgi_module).application
+imported = time.perf_counter()
+from core.warmup import environ
+timings = [imported - started]
+statuses = []
+for _ in range(2):
+    request_started = time.perf_counter()
+    response = application(
+        environ(url),
+        lambda status, headers, exc_info=None: statuses.append(status),
+    )
+    b''.join(response)
+    response.close()
+    timings.append(time.perf_counter() - request_started)
+print(json.dumps({'timings': timings, 'status': statuses[0]}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет старт воркера: импорт WSGI-приложения, первый и второй '
+        'запрос — без предзагрузки core.startup и с ней.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='/', help='Страница для первого запроса.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько процессов запустить на каждый вариант.',
+        )
+        parser.add_argument(
+            '--modules', type=int, default=0,
+            help='Показать столько самых долгих импортов верхнего уровня.',
+        )
+
+    def run(self, url, preload, *options):
+        result = subprocess.run(
+            [
+                sys.executable, *options, '-c', PROBE,
+                settings.SETTINGS_MODULE,
+                settings.WSGI_APPLICATION.rpartition('.')[0],
+                str(int(preload)), url,
+            ],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise RuntimeError(result.stderr)
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        for preload in (False, True):
+            runs = [
+                self.run(options['url'], preload)[0]
+                for _ in range(options['repeat'])
+            ]
+            imported, first, second = (
+                statistics.median(timing) for timing in zip(
+                    *(run['timings'] for run in runs)
+                )
+            )
+            self.stdout.write(
+                f'{"с предзагрузкой" if preload else "без предзагрузки"}: '
+                f'импорт {imported * 1000:.0f} мс, первый запрос '
+                f'{first * 1000:.0f} мс, второй {second * 1000:.0f} мс, '
+                f'до первого ответа {(imported + first) * 1000:.0f} мс '
+                f'({runs[0]["status"]})'
+            )
+        if options['modules']:
+            self.modules(options['url'], options['modules'])
+
+    def modules(self, url, limit):
+        _, stderr = self.run(url, True, '-X', 'importtime')
+        imports = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            _, cumulative, name = line.split('|')
+            # Вложенные импорты отмечены отступом и уже учтены в
+            # импорте верхнего уровня.
+            if not name.startswith('  ') and cumulative.strip().isdigit():
+                imports.append((int(cumulative), name.strip()))
+        self.stdout.write('Самые долгие импорты:')
+        for cumulative, name in sorted(imports, reverse=True)[:limit]:
+            self.stdout.write(f'  {name}: {cumulative / 1000:.1f} мс')
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.querylog import aggregate, read_log
+
+
+class Command(BaseCommand):
+    help = 'Отчёт по журналу медленных запросов: отпечатки по общему времени.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=settings.SLOW_QUERY_LOG_FILE,
+            help='Путь к журналу медленных запросов.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Сколько отпечатков показать.',
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Показать EXPLAIN QUERY PLAN для каждого отпечатка.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = aggregate(read_log(options['file']))
+        except FileNotFoundError:
+            raise CommandError(f'Журнал {options["file"]} не найден.')
+        for rank, row in enumerate(report[:options['limit']], start=1):
+            self.stdout.write(
+                f'{rank}. {row["fingerprint"]} '
+                f'total={row["total"] * 1000:.1f}ms '
+                f'count={row["count"]} '
+                f'avg={row["total"] / row["count"] * 1000:.1f}ms '
+                f'max={row["max"] * 1000:.1f}ms'
+            )
+            self.stdout.write(f'   {row["normalized"]}')
+            self.stdout.write(f'   views: {", ".join(sorted(row["views"]))}')
+            for site in sorted(row['call_sites']):
+                self.stdout.write(f'   at {site}')
+            if options['plans'] and row['plan']:
+                for line in row['plan']:
+                    self.stdout.write(f'   | {line}')
@@ -0,0 +1,127 @@
+import threading
+from contextlib import ExitStack
+
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from core import holes, identity, pagecache, profiling, sessions
+from core.querylog import QueryLogger
+
+
+class SamplingProfilerMiddleware:
+    """Профилирует view из ``PROFILER_VIEWS`` и запросы сотрудников
+    с заголовком ``PROFILER_HEADER``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            sampler = getattr(request, 'profiler', None)
+            if sampler is not None:
+                sampler.stop()
+                profiling.save(request.resolver_match.view_name, sampler)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if profiling.is_requested(request, request.resolver_match.view_name):
+            request.profiler = profiling.StackSampler(
+                threading.get_ident()
+            ).start()
+
+
+class SlowQueryLogMiddleware:
+    """Логирует медленные запросы к БД, выполненные за время запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_logger = QueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(query_logger)
+                )
+            return self.get_response(request)
+
+
+class IdentityMapMiddleware:
+    """Открывает карту объектов ``core.identity`` на время запроса и
+    очищает её в конце. Ставится после ``AuthenticationMiddleware``:
+    пользователь запроса тоже попадает в карту.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        identity.activate(request)
+        request.user = SimpleLazyObject(
+            lambda: identity.remember(sessions.get_user(request))
+        )
+        try:
+            return self.get_response(request)
+        finally:
+            identity.deactivate()
+
+
+class HoleMiddleware:
+    """Вставляет в HTML-ответ личные блоки на место меток, см.
+    ``core.holes``. Ставится перед ``PageCacheMiddleware``: в кеш
+    попадает заготовка, а блоки рисуются для каждого запроса.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not response.streaming
+            and response.get('Content-Type', '').startswith('text/html')
+            and holes.has_holes(response.content)
+        ):
+            response.content = holes.splice(
+                request, response.content, response.charset
+            )
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = str(len(response.content))
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """``AuthenticationMiddleware``, который берёт пользователя запроса
+    из кеша, см. ``core.sessions``.
+    """
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: sessions.get_user(request))
+
+
+class PageCacheMiddleware:
+    """Отдаёт анонимам страницы из кеша без вызова view, см.
+    ``core.pagecache``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+            if getattr(request, 'page_cache_key', None) and (
+                pagecache.cacheable_response(request, response)
+            ):
+                pagecache.store(request, response)
+            return response
+        finally:
+            pagecache.release(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if pagecache.cacheable_request(request):
+            return pagecache.lookup(request, view_kwargs)
+        return None
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfiledView',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Например, posts:index', max_length=200, unique=True, verbose_name='Имя view')),
+            ],
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class ProfiledView(models.Model):
+    """View, профилирование которой включено через core:profiler."""
+    name = models.CharField(
+        max_length=200,
+        unique=True,
+        verbose_name='Имя view',
+        help_text='Например, posts:index'
+    )
+
+    def __str__(self):
+        return self.name
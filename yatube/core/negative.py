@@ -0,0 +1,165 @@
+"""Негативный кеш: быстрый отказ по ключам, которых нет в БД.
+
+``NegativeCache`` держит в памяти процесса фильтр Блума существующих
+ключей — имён пользователей, слагов групп, id постов. Ключа, которого
+нет в фильтре, точно нет в БД, и view отвечает 404 без запроса. Ложные
+срабатывания фильтра (около ``NEGATIVE_CACHE_ERROR_RATE``) лишь
+пропускают запрос к БД, как без кеша.
+
+Фильтр строится при первом обращении в процессе и перестраивается раз
+в ``NEGATIVE_CACHE_REBUILD_INTERVAL`` секунд, тогда из него уходят
+удалённые ключи. Строит его один поток, остальные запросы его не ждут:
+они проверяют ключи по прежнему фильтру, а пока фильтра нет —
+пропускают все ключи в БД.
+
+Новый ключ ``add()`` кладёт в фильтр своего процесса и метку в кеш:
+по ней его находят процессы, чей фильтр построен раньше.
+
+Метке можно верить, только если кеш общий (memcached, redis). С
+``LocMemCache`` её видит лишь процесс, который её поставил, поэтому
+ключ, которого нет в фильтре, проверяется одним запросом ``exists``:
+найденный ключ попадает в фильтр, а отказ кешируется на
+``NEGATIVE_CACHE_MISS_TIMEOUT`` секунд. Ключи, записанные в обход
+``add()``, в общем кеше видны после перестройки.
+
+Отказ негативного кеша — ``Unknown``; для анонимов страница 404 на
+него отдаётся из кеша, см. ``core.views.page_not_found``.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from core.caches import is_shared
+
+
+class Unknown(Http404):
+    """Ключа нет в негативном кеше."""
+
+
+class BloomFilter:
+    """Фильтр Блума на ``capacity`` ключей с долей ложных срабатываний
+    ``error_rate``.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class NegativeCache:
+    """Существующие ключи вида ``name``; ``load`` отдаёт их все из БД,
+    ``exists(key)`` проверяет один ключ.
+    """
+
+    def __init__(self, name, load, exists):
+        self.name = name
+        self.load = load
+        self.exists = exists
+        self._bloom = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def _digest(self, key):
+        # Ключ приходит из URL: пробелы, управляющие символы и длина
+        # не должны попасть в ключ memcached.
+        return hashlib.md5(str(key).encode()).hexdigest()
+
+    def _marker(self, key):
+        return f'negative:{self.name}:{self._digest(key)}'
+
+    def _miss(self, key):
+        return f'negative:{self.name}:miss:{self._digest(key)}'
+
+    def rebuild(self):
+        started = time.monotonic()
+        keys = list(self.load())
+        # Запас под ключи, добавленные до следующей перестройки.
+        bloom = BloomFilter(
+            2 * len(keys) + 1000, settings.NEGATIVE_CACHE_ERROR_RATE
+        )
+        for key in keys:
+            bloom.add(key)
+        self._bloom, self._built_at = bloom, started
+
+    def _current(self):
+        """Фильтр или None, пока его строит другой поток."""
+        bloom = self._bloom
+        if (bloom is None or (
+            time.monotonic() - self._built_at
+            > settings.NEGATIVE_CACHE_REBUILD_INTERVAL
+        )) and self._lock.acquire(blocking=False):
+            try:
+                # Фильтр мог перестроить поток, который только что
+                # отпустил блокировку.
+                if self._bloom is bloom:
+                    self.rebuild()
+            finally:
+                self._lock.release()
+            bloom = self._bloom
+        return bloom
+
+    def add(self, key):
+        """Отмечает новый ключ во всех процессах."""
+        if self._bloom is not None:
+            self._bloom.add(key)
+        cache.delete(self._miss(key))
+        # Метка живёт дольше, чем любой процесс ждёт перестройки.
+        cache.set(
+            self._marker(key), True,
+            2 * settings.NEGATIVE_CACHE_REBUILD_INTERVAL,
+        )
+
+    def _probe(self, key):
+        if cache.get(self._miss(key), False):
+            return False
+        if self.exists(key):
+            bloom = self._current()
+            if bloom is not None:
+                bloom.add(key)
+            return True
+        cache.set(
+            self._miss(key), True, settings.NEGATIVE_CACHE_MISS_TIMEOUT
+        )
+        return False
+
+    def __contains__(self, key):
+        """False — ключа точно нет в БД."""
+        if not settings.NEGATIVE_CACHE_ENABLED:
+            return True
+        bloom = self._current()
+        if bloom is None or key in bloom:
+            return True
+        if is_shared():
+            return cache.get(self._marker(key), False)
+        return self._probe(key)
+
+    def reject_unknown(self, key):
+        """Отвечает 404 на ключ, которого точно нет в БД."""
+        if key not in self:
+            raise Unknown(f'Ключ {key} ({self.name}) не найден.')
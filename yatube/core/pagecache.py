@@ -0,0 +1,167 @@
+"""Кеш целых страниц.
+
+``PageCacheMiddleware`` отдаёт GET-ответы view из ``PAGE_CACHE_VIEWS``
+из кеша, не вызывая view. Ключ — путь с query string и язык. В кеш
+попадают только ответы 200 без CSRF-токена и без cookies. Личные блоки
+страницы в кеш не попадают: на их месте лежат метки ``core.holes``,
+поэтому одна заготовка страницы годится и анонимам, и пользователям.
+
+View помечает свою страницу тегами (``tag(request, ...)``), а записи
+увеличивают версии тегов (``invalidate(...)``): страница с устаревшей
+версией любого тега или старше ``PAGE_CACHE_TIMEOUT`` секунд считается
+несвежей. Несвежую страницу перерисовывает один запрос — тот, кто
+первым взял блокировку, — а остальные до его ответа получают старую,
+но не дольше ``PAGE_CACHE_STALE_TIMEOUT`` секунд после свежести.
+
+Версии тегов лежат в кеше ``default``, и ``invalidate`` в одном
+процессе видна остальным, только если кеш общий (memcached, redis).
+С ``LocMemCache`` кеш страниц выключен, даже если
+``PAGE_CACHE_ENABLED`` включён.
+
+Побочные эффекты view, которые нужны и при ответе из кеша (например,
+учёт просмотров), регистрируются через ``on_hit``.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import translation
+
+from core.caches import is_shared
+
+HIT_HANDLERS = {}
+
+
+def on_hit(view_name):
+    """Регистрирует функцию, которая вызывается с request и kwargs
+    view при ответе из кеша.
+    """
+    def register(func):
+        HIT_HANDLERS.setdefault(view_name, []).append(func)
+        return func
+    return register
+
+
+def _version_key(tag):
+    return f'pagecache:tag:{tag}'
+
+
+def versions(tags):
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # Как в core.querycache: вытесненная версия начинается с метки
+        # времени и не совпадёт со старой.
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate(*tags):
+    """Делает несвежими страницы с любым из тегов."""
+    for tag in tags:
+        try:
+            cache.incr(_version_key(tag))
+        except ValueError:
+            cache.set(_version_key(tag), time.time_ns(), None)
+
+
+def tag(request, *tags):
+    """Помечает страницу запроса тегами для ``invalidate``.
+
+    Версии тегов запоминаются сейчас, поэтому view зовёт ``tag`` до
+    чтения данных страницы: запись во время рисования оставит страницу
+    несвежей.
+    """
+    tagged = getattr(request, 'page_cache_versions', None)
+    if tagged is not None:
+        new = [tag for tag in tags if tag not in tagged]
+        tagged.update(versions(new))
+
+
+def _key(request):
+    raw = f'{translation.get_language()}:{request.get_full_path()}'
+    return 'pagecache:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def enabled():
+    """Включён ли кеш страниц: с кешем процесса сброс по тегам не дошёл
+    бы до других воркеров.
+    """
+    return settings.PAGE_CACHE_ENABLED and is_shared()
+
+
+def cacheable_request(request):
+    return (
+        enabled()
+        and request.method in ('GET', 'HEAD')
+        and request.resolver_match.view_name in settings.PAGE_CACHE_VIEWS
+    )
+
+
+def cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _response(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = state
+    return response
+
+
+def lookup(request, view_kwargs):
+    """Ответ из кеша или None, если view нужно вызвать."""
+    key = _key(request)
+    entry = cache.get(key)
+    if entry is not None:
+        fresh = time.time() < entry['fresh_until'] and (
+            versions(entry['tags']) == entry['versions']
+        )
+        # Несвежую страницу перерисовывает только взявший блокировку.
+        if fresh or not cache.add(
+            f'{key}:lock', 1, settings.PAGE_CACHE_LOCK_TIMEOUT
+        ):
+            for handler in HIT_HANDLERS.get(
+                request.resolver_match.view_name, ()
+            ):
+                handler(request, **view_kwargs)
+            return _response(entry, 'hit' if fresh else 'stale')
+        request.page_cache_lock = f'{key}:lock'
+    request.page_cache_key = key
+    request.page_cache_versions = {}
+    return None
+
+
+def store(request, response):
+    tagged = request.page_cache_versions
+    cache.set(
+        request.page_cache_key,
+        {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': [
+                (header, value) for header, value in response.items()
+                if header != 'X-Page-Cache'
+            ],
+            'tags': sorted(tagged),
+            'versions': tagged,
+            'fresh_until': time.time() + settings.PAGE_CACHE_TIMEOUT,
+        },
+        settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE_TIMEOUT,
+    )
+
+
+def release(request):
+    lock = getattr(request, 'page_cache_lock', None)
+    if lock is not None:
+        cache.delete(lock)
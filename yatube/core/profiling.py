@@ -0,0 +1,180 @@
+"""Сэмплирующий профайлер запросов.
+
+Пока обрабатывается запрос, фоновый поток с заданным интервалом снимает
+стек потока-обработчика через ``sys._current_frames()``. Накопленные
+стеки сохраняются в ``PROFILER_DIR``: в общий файл ``<view>.folded``
+(формат collapsed stacks для flamegraph.pl) и в отдельный
+``<view>-<время>.speedscope.json`` на каждый запрос.
+
+Кроме ``PROFILER_VIEWS`` из настроек, view включают и выключают на ходу
+через ``core:profiler``. Такой список хранится в БД, а запросы читают
+его копию в процессе: её обновляют ``core:profiler`` и поток ``watch()``,
+который ``yatube.wsgi`` запускает в каждом воркере.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from .models import ProfiledView
+
+logger = logging.getLogger('yatube.profiling')
+
+# Копия списка из БД: запросы читают только её.
+_enabled = frozenset()
+
+
+def refresh():
+    """Перечитывает из БД view, включённые через ``core:profiler``."""
+    global _enabled
+    _enabled = frozenset(
+        ProfiledView.objects.values_list('name', flat=True)
+    )
+
+
+def enabled_views():
+    """Имена view, для которых профилирование включено."""
+    return _enabled | set(settings.PROFILER_VIEWS)
+
+
+def enable_view(view_name):
+    # Строка на view: одновременные включения не затирают друг друга.
+    ProfiledView.objects.get_or_create(name=view_name)
+    refresh()
+
+
+def disable_view(view_name):
+    ProfiledView.objects.filter(name=view_name).delete()
+    refresh()
+
+
+def _watch():
+    while True:
+        try:
+            refresh()
+        except DatabaseError:
+            logger.exception('Не удалось прочитать список view')
+        finally:
+            close_old_connections()
+        time.sleep(settings.PROFILER_VIEWS_REFRESH)
+
+
+def watch():
+    """Перечитывает список раз в ``PROFILER_VIEWS_REFRESH`` секунд
+    в фоновом потоке.
+    """
+    thread = threading.Thread(
+        target=_watch, name='profiler-views', daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def is_requested(request, view_name):
+    """Нужно ли профилировать этот запрос."""
+    if view_name in enabled_views():
+        return True
+    return (
+        settings.PROFILER_HEADER in request.META
+        and request.user.is_staff
+    )
+
+
+def frame_name(code):
+    filename = code.co_filename
+    if filename.startswith(settings.BASE_DIR):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Снимает стек одного потока, пока не будет вызван ``stop()``."""
+
+    def __init__(self, thread_id, interval=None):
+        self.thread_id = thread_id
+        self.interval = interval or settings.PROFILER_INTERVAL
+        self.samples = Counter()
+        self.started = self.finished = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.finished = time.perf_counter()
+        return self.samples
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+
+def file_prefix(view_name):
+    return os.path.join(
+        settings.PROFILER_DIR, view_name.replace(':', '.')
+    )
+
+
+def write_collapsed(path, samples):
+    with open(path, 'a', encoding='utf-8') as output:
+        for stack, count in samples.items():
+            output.write(f'{";".join(stack)} {count}\n')
+
+
+def write_speedscope(path, name, sampler):
+    frames = {}
+    stacks = []
+    weights = []
+    for stack, count in sampler.samples.items():
+        stacks.append(
+            [frames.setdefault(frame, len(frames)) for frame in stack]
+        )
+        weights.append(count * sampler.interval)
+    profile = {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'yatube',
+        'shared': {'frames': [{'name': frame} for frame in frames]},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sampler.finished - sampler.started,
+            'samples': stacks,
+            'weights': weights,
+        }],
+    }
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(profile, output)
+
+
+def save(view_name, sampler):
+    """Дописывает сэмплы в ``.folded`` и пишет speedscope-файл запроса."""
+    if not sampler.samples:
+        return
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    prefix = file_prefix(view_name)
+    write_collapsed(f'{prefix}.folded', sampler.samples)
+    write_speedscope(
+        f'{prefix}-{time.time_ns()}.speedscope.json', view_name, sampler
+    )
@@ -0,0 +1,212 @@
+"""Кеш результатов ORM-запросов.
+
+``CachedQuerySet.cached()`` включает кеш у выборки: строки, объекты
+или ``count()`` берутся из кеша по ключу из SQL, параметров и версий
+всех таблиц запроса, включая таблицы соединений и подзапросов. Любая
+запись в таблицу увеличивает её версию, и старые результаты больше не
+находятся, а сами вытесняются по ``QUERY_CACHE_TIMEOUT``.
+
+Версию увеличивают сигналы сохранения любой модели и удаления моделей
+с ``CachedQuerySet``, а также массовые ``update()``, ``delete()`` и
+``bulk_create()`` этих моделей. Таблицы, которые меняются в обход
+сигналов и ``CachedQuerySet``, в кешируемые запросы попадать не должны.
+
+Версии и результаты лежат в кеше ``default``, поэтому процессы видят
+записи друг друга, только если кеш общий (memcached, redis). С
+``LocMemCache`` у каждого процесса свои версии, и запись в одном
+воркере не сбросила бы результаты в остальных: там ``cached()``
+ничего не меняет, запросы идут в БД. Состояние отдельного пользователя
+(подписки, реакции) кешировать не стоит: его записи должны быть видны
+сразу.
+
+Попадания и промахи считаются по моделям в кеше; отчёт процесса, который
+обслуживает запросы, отдаёт сотрудникам страница ``core:query_cache``.
+"""
+import hashlib
+import re
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from core.caches import is_shared
+
+TABLES = re.compile(r'(?:FROM|JOIN) "([^"]+)"')
+SPACES = re.compile(r'\s+')
+STATS_KEY = 'querycache:stats'
+
+
+def _version_key(using, table):
+    return f'querycache:version:{using}:{table}'
+
+
+def versions(using, tables):
+    """Текущие версии таблиц базы ``using``."""
+    keys = {_version_key(using, table): table for table in tables}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        # Версия, вытесненная из кеша, начинается заново с метки
+        # времени, а не с единицы: старые результаты не совпадут.
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump(using, table):
+    """Сбрасывает кешированные результаты запросов к таблице."""
+    def incr():
+        try:
+            cache.incr(_version_key(using, table))
+        except ValueError:
+            cache.set(_version_key(using, table), time.time_ns(), None)
+
+    incr()
+    # Повтор после коммита: запрос, прочитавший старые строки до
+    # коммита, положил их под уже увеличенную версию.
+    transaction.on_commit(incr, using=using)
+
+
+def record(model, hit):
+    key = f'{STATS_KEY}:{model._meta.label}:{"hits" if hit else "misses"}'
+    cache.add(key, 0, None)
+    cache.incr(key)
+
+
+def stats():
+    """Попадания и промахи по моделям: {label: (hits, misses)}."""
+    labels = [
+        model._meta.label for model in apps.get_models()
+        if isinstance(model._default_manager.all(), CachedQuerySet)
+    ]
+    counters = cache.get_many([
+        f'{STATS_KEY}:{label}:{kind}'
+        for label in labels for kind in ('hits', 'misses')
+    ])
+    return {
+        label: (
+            counters.get(f'{STATS_KEY}:{label}:hits', 0),
+            counters.get(f'{STATS_KEY}:{label}:misses', 0),
+        )
+        for label in labels
+    }
+
+
+def reset_stats():
+    cache.delete_many([
+        f'{STATS_KEY}:{label}:{kind}'
+        for label in stats() for kind in ('hits', 'misses')
+    ])
+
+
+class CachedQuerySet(models.QuerySet):
+    """QuerySet, который после ``cached()`` читает результаты из кеша."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+
+    def cached(self, timeout=None):
+        clone = self._chain()
+        if not is_shared():
+            return clone
+        clone._cache_timeout = (
+            settings.QUERY_CACHE_TIMEOUT if timeout is None else timeout
+        )
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _result_key(self, kind):
+        try:
+            sql, params = self.query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        sql = SPACES.sub(' ', sql)
+        tables = sorted(set(TABLES.findall(sql)))
+        raw = repr((
+            kind, self.db, self._iterable_class.__name__, sql, params,
+            sorted(versions(self.db, tables).items()),
+        ))
+        return 'querycache:result:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def _cached(self, kind, compute):
+        key = self._result_key(kind)
+        if key is None:
+            return compute()
+        value = cache.get(key)
+        record(self.model, value is not None)
+        if value is None:
+            value = compute()
+            cache.set(key, value, self._cache_timeout)
+        return value
+
+    def _fetch_all(self):
+        if self._cache_timeout is None or self._result_cache is not None:
+            return super()._fetch_all()
+
+        def fetch():
+            super(CachedQuerySet, self)._fetch_all()
+            return self._result_cache
+
+        self._result_cache = self._cached('rows', fetch)
+        # Объекты из кеша сохранены вместе с подгруженными связями.
+        self._prefetch_done = True
+
+    def count(self):
+        if self._cache_timeout is None or self._result_cache is not None:
+            return super().count()
+        return self._cached('count', super().count)
+
+    def _bump(self):
+        bump(self.db, self.model._meta.db_table)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        self._bump()
+        return rows
+
+    def delete(self):
+        deleted = super().delete()
+        self._bump()
+        return deleted
+
+    def _raw_delete(self, using):
+        rows = super()._raw_delete(using)
+        bump(using, self.model._meta.db_table)
+        return rows
+
+    def _insert(self, *args, **kwargs):
+        result = super()._insert(*args, **kwargs)
+        bump(kwargs.get('using') or self.db, self.model._meta.db_table)
+        return result
+
+
+def _changed(sender, using, **kwargs):
+    bump(using, sender._meta.db_table)
+
+
+def connect():
+    """Подключает сброс версий к сигналам моделей."""
+    post_save.connect(_changed, dispatch_uid='querycache_save')
+    m2m_changed.connect(_changed, dispatch_uid='querycache_m2m')
+    # Удаления — только у кешируемых моделей и пользователей: общий
+    # приёмник отключил бы быстрое каскадное удаление у всех моделей.
+    user_model = get_user_model()
+    for model in apps.get_models():
+        if model is user_model or isinstance(
+            model._default_manager.all(), CachedQuerySet
+        ):
+            post_delete.connect(
+                _changed, sender=model,
+                dispatch_uid=f'querycache_delete_{model._meta.label}',
+            )
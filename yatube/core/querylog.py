@@ -0,0 +1,176 @@
+"""Журнал медленных SQL-запросов.
+
+Обёртка над ``connection.execute_wrapper`` замеряет каждый запрос и
+пишет в логгер ``yatube.slow_queries`` запросы дольше
+``SLOW_QUERY_THRESHOLD`` секунд: view, место вызова в коде проекта,
+SQL, параметры и вывод ``EXPLAIN QUERY PLAN`` (для SQLite).
+Запросы одной формы (отпечатка) логируются не чаще раза в
+``SLOW_QUERY_LOG_INTERVAL`` секунд, пропущенные учитываются в полях
+``count`` и ``total`` следующей записи.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.slow_queries')
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'IN \((?:%s, )*%s\)')
+SPACES = re.compile(r'\s+')
+# Обёртки над ORM: место вызова ищется в коде, который их вызвал.
+WRAPPERS = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('querylog.py', 'querycache.py')
+}
+
+
+def normalize(sql):
+    """SQL без литералов и с схлопнутыми списками ``IN``."""
+    sql = LITERALS.sub('%s', sql)
+    sql = IN_LISTS.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:12]
+
+
+def call_site():
+    """Ближайший к запросу кадр стека из кода проекта."""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename in WRAPPERS or not filename.startswith(
+            settings.BASE_DIR
+        ):
+            continue
+        path = os.path.relpath(filename, settings.BASE_DIR)
+        return f'{path}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class RateLimiter:
+    """Пропускает одну запись на отпечаток за интервал и копит
+    количество и время пропущенных.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_logged = {}
+        self.suppressed = {}
+
+    def add(self, key, duration, now=None):
+        """Возвращает ``(count, total)`` для записи или ``None``."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            count, total = self.suppressed.pop(key, (0, 0.0))
+            count, total = count + 1, total + duration
+            last = self.last_logged.get(key)
+            if (
+                last is not None
+                and now - last < settings.SLOW_QUERY_LOG_INTERVAL
+            ):
+                self.suppressed[key] = (count, total)
+                return None
+            self.last_logged[key] = now
+            return count, total
+
+
+rate_limiter = RateLimiter()
+
+
+class QueryLogger:
+    """Обёртка для ``execute_wrapper``, привязанная к запросу."""
+
+    def __init__(self, request):
+        self.request = request
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= settings.SLOW_QUERY_THRESHOLD:
+                self.log(sql, params, many, context, duration)
+
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else self.request.path
+
+    def explain(self, connection, sql, params):
+        if connection.vendor != 'sqlite' or not sql.lstrip().upper(
+        ).startswith('SELECT'):
+            return None
+        self.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                return [row[-1] for row in cursor.fetchall()]
+        except Exception as error:
+            return [f'EXPLAIN failed: {error}']
+        finally:
+            self.explaining = False
+
+    def log(self, sql, params, many, context, duration):
+        key = fingerprint(sql)
+        limited = rate_limiter.add(key, duration)
+        if limited is None:
+            return
+        count, total = limited
+        entry = {
+            'fingerprint': key,
+            'view': self.view_name(),
+            'call_site': call_site(),
+            'duration': duration,
+            'count': count,
+            'total': total,
+            'sql': sql,
+            'normalized': normalize(sql),
+            'params': None if many else params,
+            'plan': None if many else self.explain(
+                context['connection'], sql, params
+            ),
+        }
+        logger.warning(json.dumps(entry, default=str, ensure_ascii=False))
+
+
+def read_log(path):
+    """Записи журнала из файла, построчно в JSON."""
+    with open(path, encoding='utf-8') as log_file:
+        for line in log_file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def aggregate(entries):
+    """Суммирует записи по отпечаткам, от самых затратных к дешёвым."""
+    report = {}
+    for entry in entries:
+        row = report.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'normalized': entry['normalized'],
+            'count': 0,
+            'total': 0.0,
+            'max': 0.0,
+            'views': set(),
+            'call_sites': set(),
+            'plan': entry['plan'],
+        })
+        row['count'] += entry['count']
+        row['total'] += entry['total']
+        row['max'] = max(row['max'], entry['duration'])
+        row['views'].add(entry['view'])
+        if entry['call_site']:
+            row['call_sites'].add(entry['call_site'])
+    return sorted(report.values(), key=lambda row: -row['total'])
@@ -0,0 +1,156 @@
+"""Сессии и пользователь запроса из кеша.
+
+``SessionStore`` (``SESSION_ENGINE = 'core.sessions'``) — сессии в БД
+с кешем, как ``cached_db``, но без записи в БД, если данные сессии не
+изменились: повторный ``request.session[key] = value`` с тем же
+значением БД не трогает.
+
+``get_user`` заменяет ``django.contrib.auth.get_user`` в
+``core.middleware.CachedAuthenticationMiddleware``: снимок полей
+пользователя без пароля и хеш для проверки сессии лежат в кеше
+``AUTH_USER_CACHE_TIMEOUT`` секунд. Пароль в снимке отложен и читается
+из БД, только если он нужен. Снимок сбрасывают сохранение и удаление
+пользователя (в том числе смена пароля и вход) и выход; изменения
+через ``update()`` видны по истечении срока.
+
+Кеш сессий и снимков работает, только если он общий (memcached,
+redis): с ``LocMemCache`` выход, смена пароля или блокировка сбросили
+бы кеш лишь одного процесса. Тогда сессии читаются из БД, как у
+``django.contrib.sessions.backends.db``, а пользователь загружается
+заново на каждый запрос; об этом предупреждает ``check --deploy``.
+"""
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model,
+    user_logged_out
+)
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore
+)
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.utils.crypto import constant_time_compare
+
+from core.caches import is_shared
+
+
+class SessionStore(CachedDBStore):
+    """Сессии в БД и кеше, запись в БД — только при изменении.
+
+    С кешем, который не общий, сессии только в БД.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded = None
+        self._shared = is_shared(settings.SESSION_CACHE_ALIAS)
+
+    def load(self):
+        data = super().load() if self._shared else DBStore.load(self)
+        self._loaded = dict(data)
+        return data
+
+    def exists(self, session_key):
+        if self._shared:
+            return super().exists(session_key)
+        return DBStore.exists(self, session_key)
+
+    def save(self, must_create=False):
+        if must_create or self._loaded is None or (
+            self._get_session(no_load=must_create) != self._loaded
+        ):
+            if self._shared:
+                super().save(must_create)
+            else:
+                DBStore.save(self, must_create)
+            self._loaded = dict(self._session)
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _snapshot(user):
+    return {
+        'fields': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname != 'password'
+        },
+        'hash': user.get_session_auth_hash(),
+    }
+
+
+def _from_snapshot(snapshot):
+    fields = snapshot['fields']
+    # Пароль отложен, как в .defer('password').
+    return get_user_model().from_db(
+        DEFAULT_DB_ALIAS, list(fields), list(fields.values())
+    )
+
+
+def _resolve(request):
+    try:
+        user_id = get_user_model()._meta.pk.to_python(
+            request.session[SESSION_KEY]
+        )
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if not is_shared():
+        return auth.get_user(request)
+    if backend_path in settings.AUTHENTICATION_BACKENDS:
+        snapshot = cache.get(_key(user_id))
+        session_hash = request.session.get(HASH_SESSION_KEY)
+        if snapshot is not None and session_hash and constant_time_compare(
+            session_hash, snapshot['hash']
+        ):
+            user = _from_snapshot(snapshot)
+            # Как ModelBackend.get_user: заблокированный пользователь
+            # не входит, даже если его снимок ещё в кеше.
+            backend = auth.load_backend(backend_path)
+            can_authenticate = getattr(
+                backend, 'user_can_authenticate', None
+            )
+            if can_authenticate is None or can_authenticate(user):
+                return user
+    # Промах или сессия не сходится с паролем: решает Django, он же
+    # сбросит чужую сессию.
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(
+            _key(user.pk), _snapshot(user), settings.AUTH_USER_CACHE_TIMEOUT
+        )
+    return user
+
+
+def get_user(request):
+    """Пользователь запроса, загруженный один раз за запрос."""
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = _resolve(request)
+    return request._cached_user
+
+
+def _invalidate(sender, instance, **kwargs):
+    cache.delete(_key(instance.pk))
+
+
+def _logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        cache.delete(_key(user.pk))
+
+
+def connect():
+    """Подключает сброс снимков пользователей к сигналам."""
+    user_model = get_user_model()
+    post_save.connect(
+        _invalidate, sender=user_model, dispatch_uid='sessions_user_save'
+    )
+    post_delete.connect(
+        _invalidate, sender=user_model, dispatch_uid='sessions_user_delete'
+    )
+    user_logged_out.connect(_logged_out, dispatch_uid='sessions_logout')
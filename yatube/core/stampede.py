@@ -0,0 +1,69 @@
+"""Заполнение кеша без давки.
+
+``fill(key, compute, timeout)`` — как ``cache.get_or_set``, но когда
+значение устаревает, его пересчитывает один воркер: тот, кто взял
+блокировку. Остальные отдают старое значение, а если его нет —
+ждут пересчёта до ``STAMPEDE_WAIT`` секунд.
+
+Старое значение лежит в кеше ещё ``STAMPEDE_GRACE`` секунд после
+срока. Пересчёт начинается раньше срока с вероятностью, которая растёт
+к сроку и со временем пересчёта (XFetch: Vattani, Chierichetti,
+Lowenstein, «Optimal Probabilistic Cache Stampede Prevention»), —
+поэтому под нагрузкой значение обычно обновляется до того, как
+истечёт.
+
+В шаблонах то же даёт ``{% cache %}`` из библиотеки ``stampede``.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+
+def _expired(entry, now):
+    _, delta, expiry = entry
+    # 1 - random() лежит в (0, 1], логарифм не бывает бесконечным.
+    early = delta * settings.STAMPEDE_BETA * -math.log(1 - random.random())
+    return now + early >= expiry
+
+
+def _compute(key, compute, timeout, cache):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if timeout is None:
+        cache.set(key, (value, delta, math.inf), None)
+    else:
+        cache.set(
+            key,
+            (value, delta, time.time() + timeout),
+            timeout + settings.STAMPEDE_GRACE,
+        )
+    return value
+
+
+def fill(key, compute, timeout, cache=default_cache):
+    """Значение ``key`` из кеша; при промахе его вычисляет ``compute``
+    ровно в одном воркере. ``timeout`` None — без срока.
+    """
+    entry = cache.get(key)
+    if entry is not None and not _expired(entry, time.time()):
+        return entry[0]
+    lock_key = f'{key}:fill-lock'
+    if cache.add(lock_key, 1, settings.STAMPEDE_LOCK_TIMEOUT):
+        try:
+            return _compute(key, compute, timeout, cache)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        return entry[0]
+    deadline = time.monotonic() + settings.STAMPEDE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(settings.STAMPEDE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    # Пересчёт затянулся: не держим запрос дольше, считаем сами.
+    return _compute(key, compute, timeout, cache)
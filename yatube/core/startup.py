@@ -0,0 +1,91 @@
+"""Быстрый старт воркера.
+
+``preload()`` делает до первого запроса то, что Django иначе делает на
+нём: строит таблицы URL, компилирует шаблоны проекта, загружает
+переводы и бэкенд миниатюр. ``yatube.wsgi`` вызывает его при импорте,
+поэтому с ``gunicorn --preload`` всё это делается один раз в мастере и
+достаётся воркерам после fork.
+
+``warm_after_start(application, get_urls)`` запускает прогрев кеша
+(``core.warmup``) в процессе, который обслуживает запросы: при первом
+запросе воркера, а не при импорте. Поток, запущенный в мастере до fork,
+в воркеры не попадает, а блокировки, которые он держит, в воркере
+остаются занятыми навсегда. Так же, через ``after_start``, в воркере
+запускаются и другие фоновые потоки.
+
+Сколько занимает старт, показывает команда ``benchmark_startup``.
+"""
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.template import engines
+from django.urls import get_resolver
+from django.utils import translation
+from sorl.thumbnail import default as thumbnail
+
+from core import warmup
+
+
+def _populate(resolver):
+    resolver.reverse_dict
+    for _, namespace in resolver.namespace_dict.values():
+        _populate(namespace)
+
+
+def preload_urls():
+    # В Django 2.2 запрос и reverse() берут резолвер по имени
+    # ROOT_URLCONF, а не по None: это разные записи lru_cache.
+    _populate(get_resolver(settings.ROOT_URLCONF))
+
+
+def preload_templates():
+    """Компилирует шаблоны из ``DIRS`` в кеширующий загрузчик."""
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        # Без кеширующего загрузчика (DEBUG) шаблоны всё равно
+        # читаются заново на каждый запрос.
+        if engine is None or engine.debug:
+            continue
+        for directory in engine.dirs:
+            for path in sorted(Path(directory).rglob('*.html')):
+                engine.get_template(
+                    path.relative_to(directory).as_posix()
+                )
+
+
+def preload():
+    """Загружает то, что иначе загружается на первом запросе."""
+    preload_urls()
+    preload_templates()
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+    for lazy in (thumbnail.backend, thumbnail.kvstore, thumbnail.engine):
+        # Ленивые объекты sorl: движок при создании импортирует PIL.
+        lazy._setup()
+
+
+def after_start(application, start):
+    """WSGI-приложение, которое при первом запросе в процессе вызывает
+    ``start()``.
+    """
+    lock = threading.Lock()
+    started = set()
+
+    def wrapper(environ, start_response):
+        if os.getpid() not in started:
+            with lock:
+                if os.getpid() not in started:
+                    started.add(os.getpid())
+                    start()
+        return application(environ, start_response)
+
+    return wrapper
+
+
+def warm_after_start(application, get_urls):
+    """WSGI-приложение, которое при первом запросе в процессе
+    запускает прогрев страниц ``get_urls()``.
+    """
+    return after_start(application, lambda: warmup.start(get_urls))
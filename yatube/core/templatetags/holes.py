@@ -0,0 +1,47 @@
+from django import template
+from django.template.base import token_kwargs
+
+from core import holes
+
+register = template.Library()
+
+
+class HoleNode(template.Node):
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        params = {
+            key: value.resolve(context) for key, value in self.params.items()
+        }
+        block = context.template.engine.get_template(holes.HOLES[name][0])
+
+        def render():
+            with context.push(**params):
+                return block.render(context)
+
+        request = context.get('request')
+        if request is None:
+            return render()
+        return holes.stash(request, name, params, render)
+
+
+@register.tag('hole')
+def do_hole(parser, token):
+    """Личный блок страницы, см. ``core.holes``:
+    ``{% hole 'name' key=value ... %}``. Значения параметров — строки,
+    числа, логические значения или None.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag requires a block name.'
+        )
+    params = token_kwargs(bits[2:], parser)
+    if len(params) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag takes only key=value parameters.'
+        )
+    return HoleNode(parser.compile_filter(bits[1]), params)
@@ -0,0 +1,67 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode, do_cache
+
+from core import stampede
+
+register = template.Library()
+
+
+class StampedeCacheNode(CacheNode):
+    """``{% cache %}``, который пересчитывает фрагмент в одном воркере,
+    см. ``core.stampede``.
+    """
+
+    def _resolve(self, var, context):
+        try:
+            return var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: {var.var!r}'
+            )
+
+    def render(self, context):
+        expire_time = self._resolve(self.expire_time_var, context)
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    '"cache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}'
+                )
+        if self.cache_name:
+            cache_name = self._resolve(self.cache_name, context)
+            try:
+                fragment_cache = caches[cache_name]
+            except InvalidCacheBackendError:
+                raise template.TemplateSyntaxError(
+                    f'Invalid cache name specified for cache tag: '
+                    f'{cache_name!r}'
+                )
+        else:
+            try:
+                fragment_cache = caches['template_fragments']
+            except InvalidCacheBackendError:
+                fragment_cache = caches['default']
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = 'stampede:' + make_template_fragment_key(
+            self.fragment_name, vary_on
+        )
+        return stampede.fill(
+            key, lambda: self.nodelist.render(context), expire_time,
+            cache=fragment_cache,
+        )
+
+
+@register.tag('cache')
+def do_stampede_cache(parser, token):
+    """Замена ``{% cache %}`` с тем же синтаксисом:
+    ``{% load stampede %}{% cache 20 name var %}...{% endcache %}``.
+    """
+    node = do_cache(parser, token)
+    return StampedeCacheNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name,
+    )
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('profiler/', views.profiler, name='profiler'),
+    path('query-cache/', views.query_cache, name='query_cache'),
+]
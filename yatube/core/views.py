@@ -1,10 +1,40 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from core import profiling, querycache
+from core.negative import Unknown
+
+PATH_PLACEHOLDER = '__not_found_path__'
 
 
 def page_not_found(request, exception):
+    if isinstance(exception, Unknown) and not request.user.is_authenticated:
+        return cached_not_found(request)
     return render(request, 'core/404.html', {'path': request.path}, status=404)
 
 
+def cached_not_found(request):
+    """Страница 404 для анонимов, отрисованная один раз на view."""
+    match = request.resolver_match
+    key = f'not_found:{match.view_name if match else ""}'
+    content = cache.get(key)
+    if content is None:
+        content = render_to_string(
+            'core/404.html', {'path': PATH_PLACEHOLDER}, request
+        )
+        cache.set(key, content, settings.NOT_FOUND_CACHE_TIMEOUT)
+    return HttpResponse(
+        content.replace(PATH_PLACEHOLDER, escape(request.path)), status=404
+    )
+
+
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
 
@@ -15,3 +45,27 @@ def permission_denied(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def profiler(request):
+    """Включает и выключает профилирование view по имени."""
+    view_name = request.POST.get('view')
+    if view_name:
+        if request.POST.get('enable') == '0':
+            profiling.disable_view(view_name)
+        else:
+            profiling.enable_view(view_name)
+    return JsonResponse({'views': sorted(profiling.enabled_views())})
+
+
+@staff_member_required
+def query_cache(request):
+    """Попадания и промахи кеша запросов, как их видит этот процесс."""
+    report = {
+        label: {'hits': hits, 'misses': misses}
+        for label, (hits, misses) in sorted(querycache.stats().items())
+    }
+    if request.method == 'POST':
+        querycache.reset_stats()
+    return JsonResponse({'pid': os.getpid(), 'models': report})
@@ -0,0 +1,172 @@
+"""Прогрев кеша после деплоя.
+
+``warm(urls)`` прогоняет GET-запросы анонима через весь стек
+middleware, как обычные запросы: страницы попадают в кеш страниц
+(``core.pagecache``), а по пути заполняются кеш запросов, фрагменты
+шаблонов и миниатюры. Запросы идут в ``concurrency`` потоков, новые не
+начинаются после ``budget`` секунд.
+
+Прогревать имеет смысл только общий кеш (memcached, redis): с
+``LocMemCache`` кеш страниц и кеш запросов выключены. Кроме команды
+``warm_cache``, прогрев после старта запускает ``start(get_urls)`` в
+фоновом потоке воркера, см. ``WARM_CACHE_ON_STARTUP`` и
+``core.startup.warm_after_start``. Из воркеров, стартовавших вместе,
+прогревает только тот, кто первым поставил метку в общем кеше;
+остальные не нагружают БД теми же страницами.
+"""
+import io
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import unquote_to_bytes
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+
+from core.caches import is_shared
+
+logger = logging.getLogger('yatube.warmup')
+
+Result = namedtuple('Result', 'warmed failed skipped')
+
+LOCK_KEY = 'warmup:started'
+
+
+def is_warmup(request):
+    """Запрос прогрева: его не нужно учитывать как просмотр."""
+    return getattr(request, 'cache_warmup', False)
+
+
+def _handler():
+    handler = BaseHandler()
+    handler.load_middleware()
+    return handler
+
+
+def environ(url):
+    """WSGI-окружение GET-запроса анонима к ``url``."""
+    path, _, query = url.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        # В WSGI путь уже раскодирован и передаётся как latin-1.
+        'PATH_INFO': unquote_to_bytes(path).decode('iso-8859-1'),
+        'QUERY_STRING': query,
+        'SERVER_NAME': settings.WARM_CACHE_HOST,
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': 'http',
+    }
+
+
+def _request(url):
+    request = WSGIRequest(environ(url))
+    request.cache_warmup = True
+    return request
+
+
+def _fetch(handler, url):
+    request = _request(url)
+    started = time.monotonic()
+    try:
+        status = handler.get_response(request).status_code
+    except Exception as error:
+        return url, error, time.monotonic() - started
+    return url, status, time.monotonic() - started
+
+
+def _fetch_in_thread(handler, url):
+    try:
+        return _fetch(handler, url)
+    finally:
+        # Поток пула живёт дольше запроса: закрываем его соединения
+        # так же, как это делает request_finished.
+        close_old_connections()
+
+
+def _results(handler, urls, concurrency, deadline):
+    if concurrency == 1:
+        # Без пула страницы рисуются в вызывающем потоке.
+        for url in urls:
+            if time.monotonic() >= deadline:
+                return
+            yield _fetch(handler, url)
+        return
+    with ThreadPoolExecutor(concurrency) as pool:
+        pending = set()
+        for url in urls:
+            if time.monotonic() >= deadline:
+                break
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_fetch_in_thread, handler, url))
+        for future in wait(pending).done:
+            yield future.result()
+
+
+def warm(urls, concurrency=None, budget=None, progress=None):
+    """Прогревает страницы ``urls`` по порядку.
+
+    ``progress(url, status, elapsed)`` вызывается после каждой страницы;
+    ``status`` — код ответа или исключение. Возвращает ``Result``:
+    сколько страниц прогрето, сколько ответили ошибкой и сколько не
+    успели за ``budget`` секунд.
+    """
+    urls = list(urls)
+    concurrency = concurrency or settings.WARM_CACHE_CONCURRENCY
+    budget = settings.WARM_CACHE_BUDGET if budget is None else budget
+    warmed = failed = 0
+    for url, status, elapsed in _results(
+        _handler(), urls, concurrency, time.monotonic() + budget
+    ):
+        if status == 200:
+            warmed += 1
+        else:
+            failed += 1
+        if progress is not None:
+            progress(url, status, elapsed)
+    return Result(warmed, failed, len(urls) - warmed - failed)
+
+
+def _log(url, status, elapsed):
+    logger.info('%s %s %.0f мс', url, status, elapsed * 1000)
+
+
+def _run(get_urls):
+    started = time.monotonic()
+    try:
+        result = warm(get_urls(), progress=_log)
+    except Exception:
+        logger.exception('Прогрев кеша прерван')
+        return
+    finally:
+        close_old_connections()
+    logger.info(
+        'Прогрев за %.1f с: страниц %d, ошибок %d, пропущено %d',
+        time.monotonic() - started, *result,
+    )
+
+
+def start(get_urls):
+    """Прогревает страницы ``get_urls()`` в фоновом потоке.
+
+    Возвращает поток или None, если кеш не общий или прогрев уже
+    запустил другой воркер.
+    """
+    if not is_shared():
+        return None
+    if not cache.add(LOCK_KEY, True, settings.WARM_CACHE_LOCK_TIMEOUT):
+        return None
+    thread = threading.Thread(
+        target=_run, args=(get_urls,), name='cache-warmup', daemon=True
+    )
+    thread.start()
+    return thread
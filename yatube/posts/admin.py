@@ -1,9 +1,42 @@
 from django.contrib import admin
 
+from core.compression import MARKER
+
 from .models import Group, Post
 
 
-class PostAdmin(admin.ModelAdmin):
+class CompressedSearchMixin:
+    """Поиск по сжатым текстовым полям.
+
+    Сжатые строки в БД подстрокой не найти, поэтому после обычного
+    поиска строки из ``compressed_search_fields`` со сжатым значением
+    распаковываются и проверяются в Python. Сжимаются только длинные
+    тексты, и таких строк немного.
+    """
+    compressed_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        results, use_distinct = super().get_search_results(
+            request, queryset, search_term
+        )
+        terms = search_term.casefold().split()
+        if not terms:
+            return results, use_distinct
+        matched = []
+        for field in self.compressed_search_fields:
+            rows = queryset.filter(
+                **{f'{field}__startswith': MARKER}
+            ).values_list('pk', field)
+            for pk, text in rows.iterator():
+                text = text.casefold()
+                if all(term in text for term in terms):
+                    matched.append(pk)
+        if matched:
+            results = results | queryset.filter(pk__in=matched)
+        return results, use_distinct
+
+
+class PostAdmin(CompressedSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,6 +46,7 @@ class PostAdmin(admin.ModelAdmin):
     )
     list_editable = ('group',)
     search_fields = ('text',)
+    compressed_search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
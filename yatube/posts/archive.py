@@ -0,0 +1,125 @@
+"""Архив старых постов.
+
+Посты старше ``POST_ARCHIVE_AFTER_DAYS`` дней команда
+``archive_posts`` пачками переносит из ``Post`` в ``ArchivedPost`` с
+теми же id. Индексы и ``COUNT`` горячей таблицы остаются размером с
+последние месяцы. Архив каждого автора лежит в его шарде рядом с
+горячими постами, см. ``posts.sharding``.
+
+Все посты архива старше всех горячих, поэтому лента — это горячая
+выборка, за которой идёт архивная: первые страницы читают только
+горячую таблицу, в архив попадают лишь глубокие. Число постов архива
+в ленте кешируется на ``ARCHIVE_COUNT_CACHE_TIMEOUT`` секунд: перенос
+сбрасывает кеш только своего процесса, остальные увидят новое число
+по истечении этого срока.
+
+При удалении поста из архива вместе с ним удаляются его комментарии,
+реакции, теги, упоминания и просмотры, см. ``posts.signals``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import sharding
+from .models import ArchivedPost, Post
+
+VERSION_KEY = 'archive:version'
+FIELDS = [field.attname for field in Post._meta.concrete_fields]
+
+
+def get_post(post_id, *related):
+    """Пост по id из горячей таблицы, а если его там нет — из архива."""
+    return sharding.get_post(
+        post_id, *related, models=(Post, ArchivedPost)
+    )
+
+
+def archived_count(queryset, key):
+    """Число постов архивной выборки, закешированное под ``key``."""
+    cache.add(VERSION_KEY, 1, None)
+    count_key = (
+        f'archive:count:{cache.get(VERSION_KEY)}:{queryset.db}:{key}'
+    )
+    return cache.get_or_set(
+        count_key, queryset.count, settings.ARCHIVE_COUNT_CACHE_TIMEOUT
+    )
+
+
+def invalidate_counts():
+    """Сбрасывает закешированные числа постов архива."""
+    cache.add(VERSION_KEY, 1, None)
+    cache.incr(VERSION_KEY)
+
+
+def author_post_count(author_id):
+    alias = sharding.shard_for(author_id)
+    archived = ArchivedPost.objects.using(alias).filter(author_id=author_id)
+    return Post.objects.using(alias).filter(
+        author_id=author_id
+    ).count() + archived_count(archived, f'author:{author_id}')
+
+
+class FallThrough:
+    """Горячая выборка, за ней архивная, как один список для Paginator."""
+
+    def __init__(self, hot, archived, hot_count, archived_count):
+        self.hot = hot
+        self.archived = archived
+        self.hot_count = hot_count
+        self.archived_count = archived_count
+
+    def count(self):
+        return self.hot_count + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        posts = []
+        if start < self.hot_count:
+            posts += self.hot[start:min(stop, self.hot_count)]
+        if stop > self.hot_count:
+            posts += self.archived[
+                max(start - self.hot_count, 0):stop - self.hot_count
+            ]
+        return posts
+
+
+def fall_through(hot, archived, key):
+    """Лента из горячей и архивной выборок; ``key`` — ключ кеша для
+    числа постов в архивной выборке.
+    """
+    return FallThrough(
+        hot, archived, hot.count(), archived_count(archived, key)
+    )
+
+
+def archive_posts(cutoff=None, batch_size=500, using=DEFAULT_DB_ALIAS):
+    """Переносит в архив шарда ``using`` пачку постов старше ``cutoff``.
+
+    Возвращает число перенесённых постов; 0 — переносить больше нечего.
+    """
+    if cutoff is None:
+        cutoff = timezone.now() - timedelta(
+            days=settings.POST_ARCHIVE_AFTER_DAYS
+        )
+    with transaction.atomic(using=using):
+        rows = list(
+            Post.objects.using(using).filter(pub_date__lt=cutoff).order_by(
+                'pub_date'
+            ).values(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedPost.objects.using(using).bulk_create(
+            ArchivedPost(**row) for row in rows
+        )
+        # Комментарии, реакции, теги и просмотры остаются и теперь
+        # ссылаются на пост в архиве.
+        sharding.delete_copies(Post, using, [row['id'] for row in rows])
+    invalidate_counts()
+    return len(rows)
@@ -0,0 +1,120 @@
+"""Отложенная запись счётчиков.
+
+``CounterBuffer`` копит приращения счётчика в памяти процесса и
+сбрасывает их в БД одной транзакцией: по таймеру ``interval`` секунд
+после первого приращения или сразу, как только в буфере набралось
+``max_size`` разных строк (при ``max_size`` None — только по таймеру, не
+в запросе). Так частые клики превращаются в редкие
+пакетные ``UPDATE`` и не упираются в единственного писателя SQLite.
+Строки разных баз (шардов) пишутся каждая в свою базу: их раскладывает
+``locate``, а записывает ``write(alias, pks, deltas)`` — по умолчанию
+``UPDATE`` поля ``field`` модели ``model``.
+
+Буфер, не записанный к выходу процесса, пропадает, поэтому сервер
+регистрирует ``flush_all`` в ``atexit`` (см. ``yatube.wsgi``). Сами
+буферы этого не делают: при выходе из тестов база уже удалена.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from . import sharding
+from .models import Post
+
+
+class CounterBuffer:
+    def __init__(
+        self, model, field, max_size, interval, locate=None, write=None
+    ):
+        self.model = model
+        self.field = field
+        self.locate = locate or (lambda pks: {DEFAULT_DB_ALIAS: list(pks)})
+        self.write = write or self._update
+        self.max_size = max_size
+        self.interval = interval
+        self.deltas = Counter()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, pk, delta=1):
+        with self.lock:
+            self.deltas[pk] += delta
+            full = (
+                self.max_size is not None
+                and len(self.deltas) >= self.max_size
+            )
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def pending(self, pk):
+        """Ещё не записанное в БД приращение для строки."""
+        with self.lock:
+            return self.deltas[pk]
+
+    def _schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(
+                self.interval, self._flush_from_timer
+            )
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, Counter()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        written = set()
+        try:
+            for alias, pks in self.locate(deltas).items():
+                with transaction.atomic(using=alias):
+                    self.write(alias, pks, deltas)
+                written.update(pks)
+        except Exception:
+            # Например, «database is locked»: незаписанные приращения
+            # возвращаются в буфер и уйдут со следующим сбросом.
+            with self.lock:
+                self.deltas.update({
+                    pk: delta for pk, delta in deltas.items()
+                    if pk not in written
+                })
+                self._schedule()
+            raise
+
+    def _update(self, alias, pks, deltas):
+        for pk in pks:
+            self.model.objects.using(alias).filter(pk=pk).update(
+                **{self.field: F(self.field) + deltas[pk]}
+            )
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+reaction_counts = CounterBuffer(
+    Post,
+    'reaction_count',
+    max_size=settings.REACTION_FLUSH_SIZE,
+    interval=settings.REACTION_FLUSH_INTERVAL,
+    locate=sharding.locate,
+)
+
+BUFFERS = [reaction_counts]
+
+
+def flush_all():
+    """Записывает все буферы; вызывается при выходе процесса сервера."""
+    for buffer in BUFFERS:
+        buffer.flush()
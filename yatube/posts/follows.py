@@ -0,0 +1,60 @@
+"""Счётчики подписчиков и подписок и состояние подписки на авторов."""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Follow, FollowCounts
+
+
+def _add(user_id, field, delta):
+    rows = FollowCounts.objects.filter(user_id=user_id)
+    if delta < 0:
+        rows.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if rows.update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            FollowCounts.objects.create(user_id=user_id, **{field: delta})
+    except IntegrityError:
+        FollowCounts.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta}
+        )
+
+
+def adjust(user_id, author_id, delta):
+    """Меняет счётчики подписчиков автора и подписок пользователя.
+
+    Вызывается в одной транзакции с созданием или удалением ``Follow``.
+    """
+    _add(author_id, 'followers', delta)
+    _add(user_id, 'following', delta)
+
+
+def counts(user):
+    """Подписчики и подписки пользователя.
+
+    Сами счётчики стоит выбирать вместе с пользователем через
+    ``select_related('follow_counts')``, тогда лишнего запроса не будет.
+    """
+    try:
+        follow_counts = user.follow_counts
+    except FollowCounts.DoesNotExist:
+        return 0, 0
+    return follow_counts.followers, follow_counts.following
+
+
+def follow_states(user, author_ids):
+    """Id авторов из ``author_ids``, на которых подписан ``user``.
+
+    Не кешируется: подписка или отписка должна быть видна сразу.
+    """
+    author_ids = set(author_ids)
+    if not user.is_authenticated or not author_ids:
+        return set()
+    return set(
+        Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True)
+    )
@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Comment, Post
+from .tags import index_post
 
 
 class PostForm(forms.ModelForm):
@@ -8,11 +9,20 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def _save_m2m(self):
+        # Вызывается и из save(), и из save_m2m() после save(commit=False),
+        # когда у поста уже есть id.
+        super()._save_m2m()
+        index_post(self.instance)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
-        fields = ('text',)
+        fields = ('text', 'parent')
+        widgets = {
+            'parent': forms.HiddenInput,
+        }
         labels = {
             'text': 'Текст комментария'
         }
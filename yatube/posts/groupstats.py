@@ -0,0 +1,195 @@
+"""Сводка по группам для каталога групп.
+
+Число постов, дата последнего поста и самые активные авторы группы
+хранятся в ``GroupStats`` и пересчитываются сигналами при создании,
+удалении и переносе поста в другую группу. Посты по авторам внутри
+группы считает ``GroupAuthorCount``: из него берутся и сумма, и
+лидеры, без группировки постов. Посты в архиве (``ArchivedPost``)
+остаются в сводке: перенос в архив её не меняет.
+
+Каталог листается по слагу: страница — это слаги групп после
+последнего слага предыдущей страницы. В кеше лежат списки слагов
+страниц и строки групп по слагу. Изменение сводки удаляет только
+строку своей группы; списки страниц сбрасываются при создании,
+удалении и переименовании групп.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from core import stampede
+
+from . import sharding
+from .models import ArchivedPost, Group, GroupAuthorCount, GroupStats, Post
+
+TOP_AUTHORS = 3
+VERSION_KEY = 'groups:version'
+
+
+def row_key(slug):
+    return f'groups:row:{slug}'
+
+
+def _page_key(after):
+    cache.add(VERSION_KEY, 1, None)
+    return f'groups:page:{cache.get(VERSION_KEY)}:{after or ""}'
+
+
+def add_post(group_id, author_id):
+    """Учитывает пост автора в группе."""
+    updated = GroupAuthorCount.objects.filter(
+        group_id=group_id, author_id=author_id
+    ).update(count=F('count') + 1)
+    if not updated:
+        try:
+            with transaction.atomic():
+                GroupAuthorCount.objects.create(
+                    group_id=group_id, author_id=author_id, count=1
+                )
+        except IntegrityError:
+            GroupAuthorCount.objects.filter(
+                group_id=group_id, author_id=author_id
+            ).update(count=F('count') + 1)
+    refresh(group_id)
+
+
+def remove_post(group_id, author_id):
+    """Убирает пост автора из сводки группы."""
+    GroupAuthorCount.objects.filter(
+        group_id=group_id, author_id=author_id, count__gt=0
+    ).update(count=F('count') - 1)
+    GroupAuthorCount.objects.filter(
+        group_id=group_id, author_id=author_id, count=0
+    ).delete()
+    refresh(group_id)
+
+
+def refresh(group_id):
+    """Пересчитывает сводку группы и сбрасывает её строку в кеше."""
+    slug = Group.objects.filter(pk=group_id).values_list(
+        'slug', flat=True
+    ).first()
+    if slug is None:
+        return
+    counts = GroupAuthorCount.objects.filter(group_id=group_id)
+    post_count = counts.aggregate(total=Sum('count'))['total'] or 0
+    top_authors = counts.order_by('-count').values_list(
+        'author__username', flat=True
+    )[:TOP_AUTHORS]
+    last_pub_date = max(
+        (
+            pub_date for pub_date in (
+                model.objects.using(alias).filter(
+                    group_id=group_id
+                ).order_by('-pub_date').values_list(
+                    'pub_date', flat=True
+                ).first()
+                for alias in sharding.shards()
+                for model in (Post, ArchivedPost)
+            ) if pub_date
+        ),
+        default=None,
+    )
+    GroupStats.objects.update_or_create(
+        group_id=group_id,
+        defaults={
+            'post_count': post_count,
+            'last_pub_date': last_pub_date,
+            'top_authors': ','.join(top_authors),
+        },
+    )
+    cache.delete(row_key(slug))
+
+
+def invalidate_directory(*slugs):
+    """Сбрасывает списки страниц каталога и строки перечисленных групп."""
+    cache.add(VERSION_KEY, 1, None)
+    cache.incr(VERSION_KEY)
+    cache.delete_many([row_key(slug) for slug in slugs])
+
+
+def _rows():
+    return Group.objects.annotate(
+        post_count=Coalesce('stats__post_count', 0),
+        last_pub_date=F('stats__last_pub_date'),
+        top_authors=F('stats__top_authors'),
+    ).order_by('slug').values(
+        'slug', 'title', 'description',
+        'post_count', 'last_pub_date', 'top_authors',
+    )
+
+
+def _row(values):
+    values['top_authors'] = [
+        username for username in (values['top_authors'] or '').split(',')
+        if username
+    ]
+    return values
+
+
+def _load_page(after):
+    per_page = settings.GROUPS_PER_PAGE
+    rows = _rows()
+    if after:
+        rows = rows.filter(slug__gt=after)
+    rows = [_row(values) for values in rows[:per_page + 1]]
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = rows[-1]['slug']
+    cache.set_many({row_key(row['slug']): row for row in rows})
+    return [row['slug'] for row in rows], next_cursor
+
+
+def directory_page(after=None):
+    """Строки групп после слага ``after`` и курсор следующей страницы."""
+    # Страницу после сброса каталога пересчитывает один воркер.
+    slugs, next_cursor = stampede.fill(
+        _page_key(after),
+        lambda: _load_page(after),
+        settings.GROUPS_PAGE_CACHE_TIMEOUT,
+    )
+    cached = cache.get_many([row_key(slug) for slug in slugs])
+    missing = [slug for slug in slugs if row_key(slug) not in cached]
+    if missing:
+        loaded = {
+            row_key(values['slug']): _row(values)
+            for values in _rows().filter(slug__in=missing)
+        }
+        cache.set_many(loaded)
+        cached.update(loaded)
+    return [
+        cached[row_key(slug)] for slug in slugs if row_key(slug) in cached
+    ], next_cursor
+
+
+def rebuild():
+    """Пересчитывает сводки всех групп по постам."""
+    with transaction.atomic():
+        GroupAuthorCount.objects.all().delete()
+        # Посты автора лежат в одном шарде, поэтому пары группа — автор
+        # в разных шардах не повторяются; горячие посты и архив шарда
+        # складываются.
+        for alias in sharding.shards():
+            counts = Counter()
+            for model in (Post, ArchivedPost):
+                for row in model.objects.using(alias).exclude(
+                    group=None
+                ).values('group', 'author').annotate(
+                    total=Count('id')
+                ).order_by().iterator():
+                    counts[row['group'], row['author']] += row['total']
+            GroupAuthorCount.objects.bulk_create(
+                GroupAuthorCount(
+                    group_id=group_id, author_id=author_id, count=total
+                )
+                for (group_id, author_id), total in counts.items()
+            )
+        GroupStats.objects.all().delete()
+        for group_id in list(Group.objects.values_list('pk', flat=True)):
+            refresh(group_id)
+    invalidate_directory()
@@ -0,0 +1,53 @@
+"""Личные блоки страниц постов, см. ``core.holes``."""
+from core import holes
+
+from . import follows, suggestions
+from .forms import CommentForm
+from .models import Reaction
+
+
+def _follow_states(request, params_list):
+    followed = follows.follow_states(
+        request.user, (params['author_id'] for params in params_list)
+    )
+    return [
+        {'followed': followed, 'following': params['author_id'] in followed}
+        for params in params_list
+    ]
+
+
+def _suggestions(request, params_list):
+    found = suggestions.for_user(request.user)
+    return [{'suggestions': found} for _ in params_list]
+
+
+def _post_actions(request, params_list):
+    liked = set()
+    if request.user.is_authenticated:
+        liked = set(Reaction.objects.filter(
+            user=request.user,
+            post_id__in=[params['post_id'] for params in params_list],
+        ).values_list('post_id', flat=True))
+    return [{'liked': params['post_id'] in liked} for params in params_list]
+
+
+def _comment_form(request, params_list):
+    form = CommentForm(initial={'parent': request.GET.get('reply_to')})
+    return [{'form': form} for _ in params_list]
+
+
+holes.register('switcher', 'includes/holes/switcher.html')
+holes.register(
+    'follow_link', 'includes/holes/follow_link.html', _follow_states
+)
+holes.register(
+    'follow_button', 'includes/holes/follow_button.html', _follow_states
+)
+holes.register('suggestions', 'includes/suggestions.html', _suggestions)
+holes.register(
+    'post_actions', 'includes/holes/post_actions.html', _post_actions
+)
+holes.register(
+    'comment_form', 'includes/holes/comment_form.html', _comment_form
+)
+holes.register('reply_link', 'includes/holes/reply_link.html')
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_posts
+from posts.sharding import shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше заданного числа дней в архивную таблицу. '
+        'Запускается периодически, например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.POST_ARCHIVE_AFTER_DAYS,
+            help='Возраст поста в днях, после которого он уходит в архив.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов переносить за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        for alias in shards():
+            while True:
+                moved = archive_posts(cutoff, options['batch_size'], alias)
+                if not moved:
+                    break
+                total += moved
+                self.stdout.write(f'Перенесено постов: {total}')
+        self.stdout.write(f'Готово, в архив перенесено постов: {total}.')
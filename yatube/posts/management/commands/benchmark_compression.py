@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.compression import MARKER, decode
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает объём текстов постов и комментариев и время их чтения '
+        'со сжатием и без.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample', type=int, default=200,
+            help='Сколько сжатых строк читать в замере времени.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз повторить замер времени.',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Post, Comment):
+            self.benchmark(model, options['sample'], options['repeat'])
+
+    def benchmark(self, model, sample, repeat):
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id, text FROM {table}')
+            rows = cursor.fetchall()
+        plain = {pk: decode(text) for pk, text in rows}
+        stored_size = sum(len(text.encode()) for _, text in rows)
+        plain_size = sum(len(text.encode()) for text in plain.values())
+        ids = [pk for pk, text in rows if text.startswith(MARKER)]
+        self.stdout.write(
+            f'{model.__name__}: строк {len(rows)}, сжато {len(ids)}; '
+            f'тексты без сжатия {plain_size} Б, со сжатием {stored_size} Б'
+            + (f' ({stored_size / plain_size:.1%})' if plain_size else '')
+        )
+        if not ids:
+            return
+        ids = ids[:sample]
+        before, after = self.read_latency(table, ids, plain, repeat)
+        self.stdout.write(
+            f'  чтение {len(ids)} сжатых строк: без сжатия {before:.2f} мс, '
+            f'со сжатием и распаковкой {after:.2f} мс'
+        )
+
+    def read_latency(self, table, ids, plain, repeat):
+        """Среднее время чтения строк: несжатых из временной таблицы и
+        сжатых из рабочей с распаковкой.
+        """
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE benchmark_plain '
+                '(id integer PRIMARY KEY, text text)'
+            )
+            try:
+                cursor.executemany(
+                    'INSERT INTO benchmark_plain (id, text) VALUES (%s, %s)',
+                    [(pk, plain[pk]) for pk in ids],
+                )
+                before = self.timed(
+                    cursor, repeat, lambda rows: rows,
+                    'SELECT text FROM benchmark_plain '
+                    f'WHERE id IN ({placeholders})', ids,
+                )
+                after = self.timed(
+                    cursor, repeat,
+                    lambda rows: [decode(text) for text, in rows],
+                    f'SELECT text FROM {table} WHERE id IN ({placeholders})',
+                    ids,
+                )
+            finally:
+                cursor.execute('DROP TABLE benchmark_plain')
+        return before, after
+
+    def timed(self, cursor, repeat, process, sql, params):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            cursor.execute(sql, params)
+            process(cursor.fetchall())
+        return (time.perf_counter() - started) / repeat * 1000
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.sharding import shards
+from posts.tags import index_posts
+
+
+class Command(BaseCommand):
+    help = 'Заполняет теги и упоминания для уже написанных постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов разбирать за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for alias in shards():
+            posts = Post.objects.using(alias).order_by('pk').only('pk', 'text')
+            last_id = 0
+            while True:
+                batch = list(
+                    posts.filter(pk__gt=last_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                index_posts(batch)
+                last_id = batch[-1].pk
+                indexed += len(batch)
+                self.stdout.write(f'Разобрано постов: {indexed}')
+        self.stdout.write(f'Готово, разобрано постов: {indexed}.')
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.archive import invalidate_counts
+from posts.sharding import move_author, purge_author, shard_for
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты, архив и комментарии к постам автора в другой '
+        'шард. Автор может писать во время переноса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Имя автора.')
+        parser.add_argument('alias', help='Шард из POST_SHARDS.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько строк копировать и удалять за один запрос.',
+        )
+        parser.add_argument(
+            '--purge-delay',
+            type=float,
+            default=None,
+            help=(
+                'Через сколько секунд после переключения удалять копии '
+                'в старом шарде. По умолчанию SHARD_MAP_CACHE_TIMEOUT: '
+                'раньше процессы со старой картой ещё читают старый шард.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(username=options['username']).first()
+        if author is None:
+            raise CommandError(f'Автора {options["username"]} нет.')
+        source = shard_for(author.pk)
+        try:
+            moved = move_author(
+                author.pk, options['alias'], options['batch_size']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        invalidate_counts()
+        self.stdout.write(
+            f'Перенесено постов из {source} в {options["alias"]}: {moved}.'
+        )
+        if source == options['alias']:
+            return
+        delay = options['purge_delay']
+        if delay is None:
+            delay = settings.SHARD_MAP_CACHE_TIMEOUT
+        self.stdout.write(f'Копии в {source} удаляются через {delay:g} с.')
+        time.sleep(delay)
+        copied = purge_author(author.pk, source, options['batch_size'])
+        invalidate_counts()
+        self.stdout.write(
+            f'Копии в {source} удалены, докопировано постов: {copied}.'
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.groupstats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки групп для каталога по постам.'
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write('Сводки групп пересчитаны.')
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.rendering import RENDER_VERSION
+from posts.sharding import shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново отрисовывает HTML и отрывки постов, отрисованных '
+        'по устаревшим правилам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Отрисовать заново все посты, а не только устаревшие.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов отрисовывать за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        rendered = 0
+        for alias in shards():
+            rendered += self.rerender(alias, options)
+        self.stdout.write(f'Отрисовано постов: {rendered}.')
+
+    def rerender(self, alias, options):
+        posts = Post.objects.using(alias).order_by('pk').only('pk', 'text')
+        if not options['all']:
+            posts = posts.exclude(render_version=RENDER_VERSION)
+        last_id = 0
+        rendered = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_id)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            with transaction.atomic(using=alias):
+                for post in batch:
+                    post.render()
+                    Post.objects.using(alias).filter(pk=post.pk).update(
+                        text_html=post.text_html,
+                        excerpt_html=post.excerpt_html,
+                        render_version=post.render_version,
+                    )
+            last_id = batch[-1].pk
+            rendered += len(batch)
+        return rendered
@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.suggestions import refresh
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «кого почитать» для пользователей, '
+        'у которых изменились подписки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рекомендации всем пользователям.',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Повторять пересчёт с этим интервалом.',
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            user_ids = None
+            if full:
+                user_ids = list(User.objects.values_list('pk', flat=True))
+            refreshed = refresh(user_ids)
+            self.stdout.write(
+                f'Рекомендации пересчитаны для {refreshed} пользователей.'
+            )
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['loop'])
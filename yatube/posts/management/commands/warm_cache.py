@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm
+from posts.warmup import urls
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кеш после деплоя: рисует первые страницы ленты, '
+        'самые большие группы, популярные профили и посты. Имеет смысл '
+        'только для общего кеша.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index-pages', type=int,
+            default=settings.WARM_CACHE_INDEX_PAGES,
+            help='Сколько первых страниц ленты прогреть.',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=settings.WARM_CACHE_GROUPS,
+            help='Сколько групп с наибольшим числом постов прогреть.',
+        )
+        parser.add_argument(
+            '--profiles', type=int, default=settings.WARM_CACHE_PROFILES,
+            help='Сколько профилей авторов популярных постов прогреть.',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=settings.WARM_CACHE_POSTS,
+            help='Сколько самых просматриваемых постов прогреть.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.WARM_CACHE_CONCURRENCY,
+            help='Сколько страниц рисовать одновременно.',
+        )
+        parser.add_argument(
+            '--budget', type=float, default=settings.WARM_CACHE_BUDGET,
+            help='Через сколько секунд не начинать новые страницы.',
+        )
+
+    def handle(self, *args, **options):
+        pages = urls(
+            options['index_pages'], options['groups'],
+            options['profiles'], options['posts'],
+        )
+        total = len(pages)
+        done = 0
+
+        def progress(url, status, elapsed):
+            nonlocal done
+            done += 1
+            self.stdout.write(
+                f'[{done}/{total}] {url} {status} {elapsed * 1000:.0f} мс'
+            )
+
+        result = warm(
+            pages, options['concurrency'], options['budget'], progress
+        )
+        self.stdout.write(
+            f'Прогрето страниц: {result.warmed}, ошибок: {result.failed}, '
+            f'не успели за {options["budget"]:g} с: {result.skipped}.'
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_comment_count(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.annotate(
+        comments_total=Count('comments')
+    ).filter(comments_total__gt=0).values_list('pk', 'comments_total')
+    for pk, comments_total in posts.iterator():
+        Post.objects.filter(pk=pk).update(comment_count=comments_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
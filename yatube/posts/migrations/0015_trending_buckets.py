@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_view_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('group', 'Новые посты в группе'), ('post', 'Новые комментарии к посту'), ('author', 'Новые подписчики автора')], max_length=10, verbose_name='Счётчик')),
+                ('key', models.PositiveIntegerField(verbose_name='Id объекта')),
+                ('bucket', models.DateTimeField(verbose_name='Начало интервала')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Событий за интервал')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendingbucket',
+            index=models.Index(fields=['kind', 'bucket'], name='trending_kind_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.UniqueConstraint(fields=('kind', 'key', 'bucket'), name='unique_trending_bucket'),
+        ),
+    ]
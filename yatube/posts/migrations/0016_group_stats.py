@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+TOP_AUTHORS = 3
+
+
+def fill_group_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorCount = apps.get_model('posts', 'GroupAuthorCount')
+    counts = Post.objects.exclude(group=None).values(
+        'group', 'author'
+    ).annotate(total=Count('id')).order_by()
+    GroupAuthorCount.objects.bulk_create(
+        GroupAuthorCount(
+            group_id=row['group'], author_id=row['author'], count=row['total']
+        )
+        for row in counts.iterator()
+    )
+    groups = Post.objects.exclude(group=None).values('group').annotate(
+        total=Count('id'), last=Max('pub_date')
+    ).order_by()
+    for row in groups.iterator():
+        top = GroupAuthorCount.objects.filter(
+            group_id=row['group']
+        ).order_by('-count').values_list('author__username', flat=True)
+        GroupStats.objects.create(
+            group_id=row['group'],
+            post_count=row['total'],
+            last_pub_date=row['last'],
+            top_authors=','.join(top[:TOP_AUTHORS]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_trending_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Количество постов')),
+                ('last_pub_date', models.DateTimeField(blank=True, null=True, verbose_name='Дата последнего поста')),
+                ('top_authors', models.CharField(blank=True, default='', help_text='Имена пользователей через запятую', max_length=500, verbose_name='Самые активные авторы')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupAuthorCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество постов')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_counts', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='author_counts', to='posts.Group', verbose_name='Группа')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorcount',
+            index=models.Index(fields=['group', '-count'], name='group_author_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthorcount',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
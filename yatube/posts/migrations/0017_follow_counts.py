@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_follow_counts(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    FollowCounts = apps.get_model('posts', 'FollowCounts')
+    counts = {}
+    for field, column in (('followers', 'author'), ('following', 'user')):
+        totals = Follow.objects.values(column).annotate(
+            total=Count('id')
+        ).order_by()
+        for row in totals.iterator():
+            counts.setdefault(row[column], {})[field] = row['total']
+    FollowCounts.objects.bulk_create(
+        FollowCounts(user_id=user_id, **fields)
+        for user_id, fields in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowCounts',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='follow_counts', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчики')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='Подписки')),
+            ],
+        ),
+        migrations.RunPython(fill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def render_posts(apps, schema_editor):
+    from posts.rendering import RENDER_VERSION, render
+
+    Post = apps.get_model('posts', 'Post')
+    last_id = 0
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk').only(
+                'pk', 'text'
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for post in batch:
+            text_html, excerpt_html = render(post.text)
+            Post.objects.filter(pk=post.pk).update(
+                text_html=text_html,
+                excerpt_html=excerpt_html,
+                render_version=RENDER_VERSION,
+            )
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_tags_and_mentions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(default='', editable=False, verbose_name='Отрывок для лент в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия правил отрисовки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='Текст поста в HTML'),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def convert(apps, codec):
+    for model_name in ('Post', 'Comment'):
+        model = apps.get_model('posts', model_name)
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                    'pk', 'text'
+                )[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for pk, text in batch:
+                converted = codec(text)
+                if converted != text:
+                    model.objects.filter(pk=pk).update(text=converted)
+            last_id = batch[-1][0]
+
+
+def compress_texts(apps, schema_editor):
+    from core.compression import encode
+
+    convert(apps, encode)
+
+
+def decompress_texts(apps, schema_editor):
+    from core.compression import decode
+
+    convert(apps, decode)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_rendered_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shard_map(apps, schema_editor):
+    PostLocation = apps.get_model('posts', 'PostLocation')
+    AuthorShard = apps.get_model('posts', 'AuthorShard')
+    for name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('posts', name)
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                    'pk', 'author_id'
+                )[:1000]
+            )
+            if not rows:
+                break
+            PostLocation.objects.bulk_create(
+                PostLocation(id=pk, author_id=author_id)
+                for pk, author_id in rows
+            )
+            AuthorShard.objects.bulk_create(
+                (
+                    AuthorShard(author_id=author_id, alias='default')
+                    for author_id in {author_id for _, author_id in rows}
+                ),
+                ignore_conflicts=True,
+            )
+            last_id = rows[-1][0]
+    # Новые комментарии получат id после уже выданных.
+    Comment = apps.get_model('posts', 'Comment')
+    last_comment_id = Comment.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first()
+    if last_comment_id:
+        apps.get_model('posts', 'CommentId').objects.create(id=last_comment_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0022_archived_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorShard',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('alias', models.CharField(help_text='Псевдоним из POST_SHARDS', max_length=100, verbose_name='База данных')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CommentId',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='group',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, help_text='Выберите группу', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.CreateModel(
+            name='PostLocation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+        ),
+        migrations.RunPython(fill_shard_map, migrations.RunPython.noop),
+    ]
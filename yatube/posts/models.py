@@ -1,10 +1,18 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
 
 from django.conf import settings
 
+from core.compression import compressed
+from core.querycache import CachedQuerySet
+
+from .rendering import RENDER_VERSION, render
+
 User = get_user_model()
 
+COMMENT_PATH_DIGITS = 10
+COMMENT_PATH_END = '~'
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -17,6 +25,8 @@ class Group(models.Model):
     )
     description = models.TextField('Описание')
 
+    objects = CachedQuerySet.as_manager()
+
     class Meta:
         default_related_name = 'groups'
 
@@ -25,20 +35,24 @@ class Group(models.Model):
 
 
 class Post(models.Model):
-    text = models.TextField(
+    text = compressed(models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
-    )
+    ))
     pub_date = models.DateTimeField(
         auto_now_add=True,
         db_index=True,
         verbose_name='Дата публикации'
     )
+    # Пользователи и группы живут в default, а пост — в шарде автора,
+    # поэтому внешние ключи без ограничений, см. posts.sharding.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False,
+        db_constraint=False,
     )
     group = models.ForeignKey(
         Group,
@@ -47,7 +61,9 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False,
+        db_constraint=False,
     )
     image = models.ImageField(
         verbose_name='Картинка',
@@ -55,40 +71,307 @@ class Post(models.Model):
         blank=True,
         help_text='Добавьте картинку',
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+    reaction_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество реакций'
+    )
+    text_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='Текст поста в HTML'
+    )
+    excerpt_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='Отрывок для лент в HTML'
+    )
+    render_version = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия правил отрисовки'
+    )
+
+    objects = CachedQuerySet.as_manager()
+
+    archived = False
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:settings.LIMIT_TEXT]
+
+    def render(self):
+        self.text_html, self.excerpt_html = render(self.text)
+        self.render_version = RENDER_VERSION
+
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            # Id выдаёт PostLocation: он уникален во всех шардах, и по
+            # нему находится автор, а значит и шард поста.
+            self.pk = PostLocation.objects.create(
+                author_id=self.author_id
+            ).pk
+            kwargs['force_insert'] = True
+            # В шард автора, даже если objects.create() передал свою базу.
+            kwargs['using'] = router.db_for_write(Post, instance=self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields,
+                    'text_html', 'excerpt_html', 'render_version',
+                }
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Группа на момент загрузки: по ней сигналы узнают о переносе
+        # поста в другую группу.
+        instance = super().from_db(db, field_names, values)
+        if 'group_id' in instance.__dict__:
+            instance._loaded_group_id = instance.group_id
+        return instance
+
+
+class ArchivedPost(models.Model):
+    """Пост старше ``POST_ARCHIVE_AFTER_DAYS`` дней.
+
+    Та же форма, что у ``Post``, и тот же id: комментарии, реакции,
+    теги и просмотры ссылаются на пост по id без ограничения внешнего
+    ключа и не переносятся. В архив посты переносит команда
+    ``archive_posts``; там они только читаются.
+    """
+    id = models.IntegerField(primary_key=True)
+    text = compressed(models.TextField(verbose_name='Текст поста'))
+    pub_date = models.DateTimeField(
+        db_index=True,
+        verbose_name='Дата публикации'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор',
+        db_index=False,
+        db_constraint=False,
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа',
+        db_index=False,
+        db_constraint=False,
+    )
+    image = models.ImageField(
+        verbose_name='Картинка',
+        upload_to='posts/',
+        blank=True,
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество комментариев'
+    )
+    reaction_count = models.IntegerField(
+        default=0,
+        verbose_name='Количество реакций'
+    )
+    text_html = models.TextField(
+        default='',
+        verbose_name='Текст поста в HTML'
+    )
+    excerpt_html = models.TextField(
+        default='',
+        verbose_name='Отрывок для лент в HTML'
+    )
+    render_version = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Версия правил отрисовки'
+    )
+
+    archived = True
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Пост в архиве'
+        verbose_name_plural = 'Посты в архиве'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='archive_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='archive_group_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.LIMIT_TEXT]
 
 
 class Comment(models.Model):
+    # Пост может быть в архиве, см. ArchivedPost.
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
         blank=True,
-        null=True
+        null=True,
+        db_index=False,
+        db_constraint=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='comments',
         blank=True,
-        null=True
+        null=True,
+        db_constraint=False,
     )
-    text = models.TextField(
+    text = compressed(models.TextField(
         verbose_name='Комментарий',
         help_text='Введите комментарий'
-    )
+    ))
     created = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        blank=True,
+        null=True,
+        verbose_name='Ответ на'
+    )
+    path = models.CharField(
+        max_length=255,
+        editable=False,
+        default='',
+        verbose_name='Путь в ветке'
+    )
+    depth = models.PositiveSmallIntegerField(
+        editable=False,
+        default=0,
+        verbose_name='Уровень вложенности'
+    )
+
+    objects = CachedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'path'],
+                name='comment_post_path_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        """Путь комментария — пути предков и его собственный id,
+        дополненные нулями до одной ширины. Сортировка по пути даёт
+        ветку в порядке обхода в глубину, а поддерево — диапазон путей.
+        """
+        creating = self._state.adding
+        if creating and self.parent_id:
+            while self.parent.depth >= settings.COMMENT_MAX_DEPTH:
+                self.parent = self.parent.parent
+        if self.pk is None:
+            # Уникальный во всех шардах id: комментарии переезжают между
+            # шардами вместе с постом, не меняя id и путей.
+            self.pk = CommentId.objects.create().pk
+            kwargs['force_insert'] = True
+            kwargs['using'] = router.db_for_write(Comment, instance=self)
+        using = kwargs.get('using') or router.db_for_write(
+            Comment, instance=self
+        )
+        # Комментарий без пути выпал бы из ветки: вставка и путь пишутся
+        # вместе или никак.
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if creating and not self.path:
+                self._set_path()
+
+    def _set_path(self):
+        segment = f'{self.pk:0{COMMENT_PATH_DIGITS}d}'
+        if self.parent_id:
+            self.path = f'{self.parent.path}.{segment}'
+            self.depth = self.parent.depth + 1
+        else:
+            self.path = segment
+        Comment.objects.using(self._state.db).filter(pk=self.pk).update(
+            path=self.path, depth=self.depth
+        )
+
+    def subtree(self):
+        """Комментарий со всеми ответами в порядке обхода ветки."""
+        return Comment.objects.using(self._state.db).filter(
+            post_id=self.post_id,
+            path__gte=self.path,
+            path__lt=f'{self.path}{COMMENT_PATH_END}',
+        ).order_by('path')
+
+
+class AuthorShard(models.Model):
+    """Шард, в котором лежат посты и архив автора, см. posts.sharding."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    alias = models.CharField(
+        max_length=100,
+        verbose_name='База данных',
+        help_text='Псевдоним из POST_SHARDS'
+    )
+
+    def __str__(self):
+        return f'{self.author_id}: {self.alias}'
+
+
+class PostLocation(models.Model):
+    """Id поста и его автор: выдаёт постам id, уникальные во всех шардах."""
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+
+    def __str__(self):
+        return f'{self.pk}: {self.author_id}'
+
+
+class CommentId(models.Model):
+    """Выдаёт комментариям id, уникальные во всех шардах."""
+
+    def __str__(self):
+        return str(self.pk)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -96,14 +379,18 @@ class Follow(models.Model):
         verbose_name='Пользователь',
         on_delete=models.CASCADE,
         related_name='follower',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
         on_delete=models.CASCADE,
         related_name='following',
+        db_index=False,
     )
 
+    objects = CachedQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.user} {self.author}'
 
@@ -114,3 +401,315 @@ class Follow(models.Model):
                 name='unique_follow'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class FollowCounts(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='follow_counts',
+        verbose_name='Пользователь'
+    )
+    followers = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчики'
+    )
+    following = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписки'
+    )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.followers}/{self.following}'
+
+
+class FollowSuggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+        db_index=False,
+    )
+    score = models.FloatField(verbose_name='Вес рекомендации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow_suggestion'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.author_id}: {self.score}'
+
+
+class StaleSuggestions(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    marked = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Граф подписок изменён'
+    )
+
+    def __str__(self):
+        return f'{self.user_id} {self.marked}'
+
+
+class Tag(models.Model):
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Тег',
+        help_text='В нижнем регистре, без решётки'
+    )
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Тег',
+        db_index=False,
+    )
+    # Пост может быть в архиве, см. ArchivedPost.
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Пост',
+        db_constraint=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'],
+                name='unique_post_tag'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id} {self.post_id}'
+
+
+class Mention(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Упомянутый пользователь',
+        db_index=False,
+    )
+    # Пост может быть в архиве, см. ArchivedPost.
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Пост',
+        db_constraint=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_mention'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.post_id}'
+
+
+class Reaction(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='reactions',
+        db_index=False,
+    )
+    # Пост может быть в архиве, см. ArchivedPost.
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='reactions',
+        db_index=False,
+        db_constraint=False,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_reaction'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['post', 'user'],
+                name='reaction_post_user_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.post_id}'
+
+
+class PostViewCount(models.Model):
+    # Пост может быть в архиве, см. ArchivedPost.
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='view_count',
+        verbose_name='Пост',
+        db_constraint=False,
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Просмотры'
+    )
+
+    def __str__(self):
+        return f'{self.post_id}: {self.count}'
+
+
+class TrendingBucket(models.Model):
+    GROUP = 'group'
+    POST = 'post'
+    AUTHOR = 'author'
+    KINDS = (
+        (GROUP, 'Новые посты в группе'),
+        (POST, 'Новые комментарии к посту'),
+        (AUTHOR, 'Новые подписчики автора'),
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name='Счётчик'
+    )
+    key = models.PositiveIntegerField(verbose_name='Id объекта')
+    bucket = models.DateTimeField(verbose_name='Начало интервала')
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Событий за интервал'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'key', 'bucket'],
+                name='unique_trending_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['kind', 'bucket'],
+                name='trending_kind_bucket_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.key} {self.bucket} {self.count}'
+
+
+class GroupStats(models.Model):
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    last_pub_date = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Дата последнего поста'
+    )
+    top_authors = models.CharField(
+        max_length=500,
+        blank=True,
+        default='',
+        verbose_name='Самые активные авторы',
+        help_text='Имена пользователей через запятую'
+    )
+
+    def __str__(self):
+        return f'{self.group_id}: {self.post_count}'
+
+
+class GroupAuthorCount(models.Model):
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_counts',
+        verbose_name='Группа',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_counts',
+        verbose_name='Автор',
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'author'],
+                name='unique_group_author'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['group', '-count'],
+                name='group_author_count_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.group_id} {self.author_id}: {self.count}'
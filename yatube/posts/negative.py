@@ -0,0 +1,46 @@
+"""Негативный кеш пользователей, групп и постов, см. ``core.negative``.
+
+Id постов собираются и проверяются по горячим и архивным таблицам всех
+шардов. Новые ключи добавляют сигналы сохранения в ``posts.signals``.
+"""
+from core.negative import NegativeCache
+
+from . import sharding
+from .models import ArchivedPost, Group, Post, User
+
+
+def _usernames():
+    return User.objects.values_list('username', flat=True).iterator()
+
+
+def _slugs():
+    return Group.objects.values_list('slug', flat=True).iterator()
+
+
+def _post_ids():
+    for alias in sharding.shards():
+        for model in (Post, ArchivedPost):
+            yield from model.objects.using(alias).order_by().values_list(
+                'pk', flat=True
+            ).iterator()
+
+
+def _user_exists(username):
+    return User.objects.filter(username=username).exists()
+
+
+def _group_exists(slug):
+    return Group.objects.filter(slug=slug).exists()
+
+
+def _post_exists(post_id):
+    return any(
+        model.objects.using(alias).filter(pk=post_id).exists()
+        for alias in sharding.shards()
+        for model in (Post, ArchivedPost)
+    )
+
+
+users = NegativeCache('user', _usernames, _user_exists)
+groups = NegativeCache('group', _slugs, _group_exists)
+posts = NegativeCache('post', _post_ids, _post_exists)
@@ -0,0 +1,57 @@
+"""Отрисовка текста поста в HTML.
+
+HTML поста и его отрывок для лент считаются один раз при сохранении и
+лежат в ``Post.text_html`` и ``Post.excerpt_html``: шаблоны выводят их
+как есть, а ленты не загружают полный текст. Текст экранируется
+целиком, поэтому в HTML нет ничего, кроме переносов строк и ссылок на
+теги и профили.
+
+При изменении правил отрисовки нужно увеличить ``RENDER_VERSION`` и
+запустить команду ``rerender_posts``.
+"""
+import re
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.text import Truncator, normalize_newlines
+
+RENDER_VERSION = 1
+
+TAG_RE = re.compile(r'(?<![\w#&])#(\w{1,100})')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+
+
+def normalize_tag(name):
+    return name.casefold()
+
+
+def _tag_link(match):
+    url = reverse(
+        'posts:tag_posts', kwargs={'tag': normalize_tag(match.group(1))}
+    )
+    return format_html('<a href="{}">#{}</a>', url, match.group(1))
+
+
+def _mention_link(match):
+    username = match.group(1)
+    # Точка в конце обычно закрывает предложение, а не входит в имя.
+    tail = username[len(username.rstrip('.')):]
+    username = username.rstrip('.')
+    if not username:
+        return match.group(0)
+    url = reverse('posts:profile', kwargs={'username': username})
+    return format_html('<a href="{}">@{}</a>{}', url, username, tail)
+
+
+def render_html(text):
+    html = escape(normalize_newlines(text))
+    html = TAG_RE.sub(_tag_link, html)
+    html = MENTION_RE.sub(_mention_link, html)
+    return html.replace('\n', '<br>')
+
+
+def render(text):
+    """HTML поста и отрывок не длиннее ``POST_EXCERPT_LENGTH`` знаков."""
+    excerpt = Truncator(text).chars(settings.POST_EXCERPT_LENGTH)
+    return render_html(text), render_html(excerpt)
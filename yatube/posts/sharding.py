@@ -0,0 +1,447 @@
+"""Посты по шардам.
+
+Посты, архив и комментарии раскладываются по базам данных из
+``POST_SHARDS`` по автору поста: всё, что относится к постам автора,
+лежит в одной базе — шарде автора. Остальные таблицы (пользователи,
+группы, подписки, реакции, теги, счётчики) живут только в ``default``
+и ссылаются на посты по id без внешних ключей.
+
+Карта шардов — ``AuthorShard`` в ``default``, закешированная по
+автору на ``SHARD_MAP_CACHE_TIMEOUT`` секунд. Автора закрепляет за
+шардом его первый пост: шард выбирается по остатку от деления id
+автора на число шардов. Id постов и
+комментариев выдают таблицы в ``default``, поэтому они уникальны во
+всех шардах, а по ``PostLocation`` находится автор, а значит и шард
+поста.
+
+``ShardRouter`` направляет запросы к постам в шард автора или той
+базы, откуда объект загружен, остальные — в ``default``. Ленты всех
+постов и групп собирает ``merge``: из каждого шарда берутся первые
+посты страницы по ``pub_date`` и сливаются кучей. Профиль, пост и
+запись читают и пишут один шард. С одним шардом (по умолчанию) всё
+работает как с одной базой.
+
+Новую базу мигрируют (``migrate --database=...``; миграции данных в
+шардах не выполняются), добавляют в ``POST_SHARDS`` и переносят на неё
+авторов командой ``move_author``. Кеш карты у каждого процесса свой,
+поэтому после переключения процессы ещё до ``SHARD_MAP_CACHE_TIMEOUT``
+секунд читают и пишут старый шард: копии в нём удаляет
+``purge_author`` не раньше, чем истечёт этот срок.
+"""
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.http import Http404
+
+from core.querycache import bump
+
+from .models import (
+    ArchivedPost, AuthorShard, Comment, Post, PostLocation, User
+)
+
+SHARDED = {'posts.post', 'posts.archivedpost', 'posts.comment'}
+
+
+def shards():
+    return settings.POST_SHARDS
+
+
+def is_sharded():
+    return len(settings.POST_SHARDS) > 1
+
+
+def _key(author_id):
+    return f'shards:author:{author_id}'
+
+
+def shard_map(author_ids):
+    """Шарды авторов: словарь id автора — псевдоним базы."""
+    author_ids = set(author_ids)
+    if not is_sharded():
+        return dict.fromkeys(author_ids, shards()[0])
+    keys = {_key(author_id): author_id for author_id in author_ids}
+    found = {
+        keys[key]: alias for key, alias in cache.get_many(keys).items()
+    }
+    missing = author_ids - found.keys()
+    if missing:
+        loaded = dict(
+            AuthorShard.objects.filter(author_id__in=missing).values_list(
+                'author_id', 'alias'
+            )
+        )
+        cache.set_many(
+            {_key(author_id): alias for author_id, alias in loaded.items()},
+            settings.SHARD_MAP_CACHE_TIMEOUT,
+        )
+        found.update(loaded)
+        # Автор без записи ещё ничего не написал, искать его посты
+        # можно где угодно.
+        found.update(dict.fromkeys(missing - loaded.keys(), shards()[0]))
+    return found
+
+
+def shard_for(author_id):
+    """Шард, в котором лежат посты автора."""
+    return shard_map([author_id])[author_id]
+
+
+def place(author_id):
+    """Шард для нового поста автора; нового автора закрепляет за шардом."""
+    alias = cache.get(_key(author_id))
+    if alias is None:
+        shard, _ = AuthorShard.objects.get_or_create(
+            author_id=author_id,
+            defaults={'alias': shards()[author_id % len(shards())]},
+        )
+        alias = shard.alias
+        cache.set(_key(author_id), alias, settings.SHARD_MAP_CACHE_TIMEOUT)
+    return alias
+
+
+def authors_by_shard(author_ids):
+    """Раскладывает id авторов по их шардам."""
+    found = {}
+    for author_id, alias in shard_map(author_ids).items():
+        found.setdefault(alias, []).append(author_id)
+    return found
+
+
+def locate(post_ids):
+    """Раскладывает id постов по шардам, в которых их искать."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    if not is_sharded():
+        return {shards()[0]: post_ids}
+    authors = dict(
+        PostLocation.objects.filter(pk__in=post_ids).values_list(
+            'pk', 'author_id'
+        )
+    )
+    aliases = shard_map(authors.values())
+    found = {}
+    for post_id in post_ids:
+        # Пост, созданный в обход save(), ищется во всех шардах.
+        where = [aliases[authors[post_id]]] if post_id in authors else shards()
+        for alias in where:
+            found.setdefault(alias, []).append(post_id)
+    return found
+
+
+def related(queryset, *fields):
+    """``select_related`` там, где рядом лежат пользователи и группы,
+    и ``prefetch_related`` из ``default`` в остальных шардах.
+    """
+    if not fields:
+        return queryset
+    if queryset.db == DEFAULT_DB_ALIAS:
+        return queryset.select_related(*fields)
+    return queryset.prefetch_related(*fields)
+
+
+def get_post(post_id, *related_fields, models=(Post,)):
+    """Пост по id из его шарда: ищется в таблицах ``models`` по очереди."""
+    for alias in locate([post_id]):
+        for model in models:
+            post = related(
+                model.objects.using(alias), *related_fields
+            ).filter(id=post_id).first()
+            if post is not None:
+                return post
+    raise Http404('Пост не найден.')
+
+
+def in_bulk(queryset, post_ids, *related_fields):
+    """Посты выборки по id из всех шардов, где они лежат."""
+    found = {}
+    for alias, ids in locate(post_ids).items():
+        found.update(
+            related(queryset.using(alias), *related_fields).in_bulk(ids)
+        )
+    return found
+
+
+class Merged:
+    """Ленты шардов, слитые по убыванию ``pub_date``, как один список
+    для Paginator.
+    """
+
+    def __init__(self, parts):
+        self.parts = list(parts)
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if len(self.parts) == 1:
+            return self.parts[0][index]
+        start, stop = index.start or 0, index.stop
+        # Страница по stop — не дальше первых stop постов каждого шарда.
+        merged = heapq.merge(
+            *(part[:stop] for part in self.parts),
+            key=attrgetter('pub_date'),
+            reverse=True,
+        )
+        return list(islice(_unique(merged), start, stop))
+
+
+def _unique(posts):
+    # Пока автор переезжает, его посты есть в обоих шардах.
+    seen = set()
+    for post in posts:
+        if post.pk not in seen:
+            seen.add(post.pk)
+            yield post
+
+
+def merge(parts):
+    """Одна лента из лент шардов, каждая по убыванию ``pub_date``."""
+    return Merged(parts)
+
+
+class ShardRouter:
+    """Направляет запросы к постам, архиву и комментариям в их шард."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if model._meta.label_lower not in SHARDED:
+            # Автор и группа поста из шарда — в default, а в остальном
+            # решает база объекта, как без роутера.
+            if instance is not None and (
+                instance._meta.label_lower in SHARDED
+            ):
+                return DEFAULT_DB_ALIAS
+            return None
+        if instance is None:
+            return shards()[0]
+        if instance._meta.label_lower not in SHARDED:
+            if isinstance(instance, User) and not issubclass(model, Comment):
+                # Посты пользователя, например ``author.posts``.
+                return shard_for(instance.pk)
+            return shards()[0]
+        if not instance._state.adding:
+            return instance._state.db
+        if isinstance(instance, Comment):
+            if Comment.post.is_cached(instance):
+                return self.db_for_read(Post, instance=instance.post)
+            return next(iter(locate([instance.post_id])), shards()[0])
+        if instance.author_id is None:
+            return shards()[0]
+        return place(instance.author_id)
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._meta.label_lower, obj2._meta.label_lower} & SHARDED:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Шарды получают всю схему, но не миграции данных: те пишут в
+        # default, где лежит всё, кроме постов.
+        if db == DEFAULT_DB_ALIAS or model_name is not None:
+            return None
+        return False
+
+
+FIELDS = {
+    model: [field.attname for field in model._meta.concrete_fields]
+    for model in (Post, ArchivedPost, Comment)
+}
+
+
+def _batches(queryset, batch_size):
+    """Строки выборки пачками по возрастанию id."""
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values(
+                *FIELDS[queryset.model]
+            )[:batch_size]
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def _insert(model, rows, using, batch_size):
+    # Как loaddata: без save() и сигналов — строки переезжают как есть.
+    objs = [model(**row) for row in rows]
+    model.objects.using(using).bulk_create(objs, batch_size)
+    # bulk_create проставляет auto_now_add, прежние даты
+    # возвращаются отдельным запросом.
+    dated = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    if objs and dated:
+        for obj, row in zip(objs, rows):
+            for attname in dated:
+                setattr(obj, attname, row[attname])
+        model.objects.using(using).bulk_update(objs, dated, batch_size)
+    return len(objs)
+
+
+def delete_copies(model, using, pks):
+    """Удаляет строки постов или комментариев ``model``, переехавшие в
+    другую таблицу или шард, одним DELETE без каскада и сигналов.
+
+    Строка продолжает жить в копии, поэтому ``delete()`` не подходит:
+    каскад удалил бы реакции, теги, упоминания и просмотры поста,
+    а сигналы сняли бы пост со сводки группы и уменьшили бы счётчик
+    комментариев у копии поста. Из сигналов нужен только сброс кеша
+    запросов к таблице, он вызывается здесь.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            pks,
+        )
+    bump(using, model._meta.db_table)
+
+
+def _copy_missing(queryset, target, batch_size):
+    """Копирует в ``target`` строки выборки, которых там ещё нет."""
+    model = queryset.model
+    copied = 0
+    for rows in _batches(queryset, batch_size):
+        present = set(
+            model.objects.using(target).filter(
+                pk__in=[row['id'] for row in rows]
+            ).values_list('pk', flat=True)
+        )
+        copied += _insert(
+            model,
+            [row for row in rows if row['id'] not in present],
+            target,
+            batch_size,
+        )
+    return copied
+
+
+def _delete_missing(queryset, source, batch_size):
+    """Удаляет строки выборки, которых больше нет в ``source``."""
+    model = queryset.model
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return
+        gone = set(ids) - set(
+            model.objects.using(source).filter(pk__in=ids).values_list(
+                'pk', flat=True
+            )
+        )
+        if gone:
+            delete_copies(model, queryset.db, gone)
+        last_id = ids[-1]
+
+
+def _purge(queryset, batch_size):
+    while True:
+        # С конца: ответ удаляется раньше комментария, на который он
+        # ссылается.
+        ids = list(
+            queryset.order_by('-pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        delete_copies(queryset.model, queryset.db, ids)
+
+
+def _author_rows(author_id, alias):
+    posts = Post.objects.using(alias).filter(author_id=author_id)
+    archived = ArchivedPost.objects.using(alias).filter(author_id=author_id)
+    comments = Comment.objects.using(alias).filter(
+        Q(post_id__in=posts.values('pk'))
+        | Q(post_id__in=archived.values('pk'))
+    )
+    return posts, archived, comments
+
+
+def move_author(author_id, target, batch_size=500):
+    """Переносит посты, архив и комментарии к постам автора в шард
+    ``target``. Возвращает число перенесённых постов.
+
+    Сначала строки копируются пачками, а автор и комментаторы пишут в
+    старый шард. Затем под блокировкой записи старого шарда докопируется
+    то, что изменилось за это время, и карта переключается на новый
+    шард. Копии в старом шарде остаются: их удаляет ``purge_author``.
+    """
+    if target not in shards():
+        raise ValueError(f'Базы {target} нет в POST_SHARDS.')
+    source = shard_for(author_id)
+    if source == target:
+        return 0
+    posts, archived, comments = _author_rows(author_id, source)
+    target_posts, target_archived, target_comments = _author_rows(
+        author_id, target
+    )
+    _copy_missing(archived, target, batch_size)
+    _copy_missing(posts, target, batch_size)
+    _copy_missing(comments, target, batch_size)
+    with transaction.atomic(using=source), transaction.atomic(using=target):
+        # Первая запись берёт блокировку записи SQLite: до конца
+        # транзакции новые посты и комментарии в старом шарде ждут.
+        posts.filter(pk__lt=0).update(comment_count=0)
+        _copy_missing(archived, target, batch_size)
+        # Горячие посты могли измениться: правки, счётчики, перенос в
+        # архив. Их немного, они копируются заново.
+        _purge(target_posts, batch_size)
+        moved = _copy_missing(posts, target, batch_size)
+        _delete_missing(target_comments, source, batch_size)
+        # Комментарий мог скопироваться до того, как ему записали путь.
+        _purge(target_comments.filter(path=''), batch_size)
+        _copy_missing(comments, target, batch_size)
+        AuthorShard.objects.update_or_create(
+            author_id=author_id, defaults={'alias': target}
+        )
+        cache.set(_key(author_id), target, settings.SHARD_MAP_CACHE_TIMEOUT)
+    return moved + target_archived.count()
+
+
+def purge_author(author_id, source, batch_size=500):
+    """Удаляет копии постов, архива и комментариев автора, оставшиеся
+    в шарде ``source`` после ``move_author``. Возвращает число постов,
+    которые докопированы в шард автора.
+
+    Вызывается не раньше, чем через ``SHARD_MAP_CACHE_TIMEOUT`` секунд
+    после переноса: до этого процессы со старой картой ещё читают
+    ``source`` и пишут в него. Посты и комментарии, которые они успели
+    записать, сначала докопируются.
+    """
+    target = AuthorShard.objects.filter(author_id=author_id).values_list(
+        'alias', flat=True
+    ).first()
+    if target is None or target == source:
+        raise ValueError(f'Посты автора по-прежнему в {source}.')
+    posts, archived, comments = _author_rows(author_id, source)
+    copied = _copy_missing(archived, target, batch_size)
+    copied += _copy_missing(posts, target, batch_size)
+    _copy_missing(comments, target, batch_size)
+    _purge(comments, batch_size)
+    _purge(posts, batch_size)
+    _purge(archived, batch_size)
+    return copied
@@ -0,0 +1,153 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core import pagecache
+
+from . import archive, groupstats, negative, sharding, trending
+from .models import (
+    ArchivedPost, Comment, Follow, Group, Mention, Post, PostTag,
+    PostViewCount, Reaction, TrendingBucket, User
+)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def invalidate_post_pages(sender, instance, **kwargs):
+    # Раньше update_group_stats: _loaded_group_id ещё прежняя группа.
+    groups = {instance.group_id, getattr(instance, '_loaded_group_id', None)}
+    pagecache.invalidate(
+        'posts', f'post:{instance.pk}', f'author:{instance.author_id}',
+        *(f'group:{group_id}' for group_id in groups if group_id),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    pagecache.invalidate(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Reaction)
+@receiver(post_delete, sender=Reaction)
+def invalidate_post_detail(sender, instance, **kwargs):
+    pagecache.invalidate(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    pagecache.invalidate(
+        f'author:{instance.author_id}', f'author:{instance.user_id}'
+    )
+
+
+@receiver(post_save, sender=Post)
+def record_group_post(sender, instance, created, **kwargs):
+    if created and instance.group_id:
+        trending.record(TrendingBucket.GROUP, instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def update_group_stats(sender, instance, created, **kwargs):
+    if created:
+        previous = None
+    elif hasattr(instance, '_loaded_group_id'):
+        previous = instance._loaded_group_id
+    else:
+        return
+    if previous != instance.group_id:
+        if previous:
+            groupstats.remove_post(previous, instance.author_id)
+        if instance.group_id:
+            groupstats.add_post(instance.group_id, instance.author_id)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def remove_from_group_stats(sender, instance, **kwargs):
+    if instance.group_id:
+        groupstats.remove_post(instance.group_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_directory(sender, instance, **kwargs):
+    groupstats.invalidate_directory(instance.slug)
+
+
+@receiver(post_save, sender=User)
+def add_known_user(sender, instance, created, update_fields, **kwargs):
+    # Вход пользователя сохраняет только last_login.
+    if created or update_fields is None or 'username' in update_fields:
+        negative.users.add(instance.username)
+
+
+@receiver(post_save, sender=Group)
+def add_known_group(sender, instance, **kwargs):
+    negative.groups.add(instance.slug)
+
+
+@receiver(post_save, sender=Post)
+def add_known_post(sender, instance, created, **kwargs):
+    if created:
+        negative.posts.add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_rows_in_default(sender, instance, using, **kwargs):
+    # Каскад удаления идёт по базе поста, а реакции, теги, упоминания и
+    # просмотры лежат в default.
+    if using != DEFAULT_DB_ALIAS:
+        for model in (Reaction, PostTag, Mention, PostViewCount):
+            model.objects.filter(post_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def delete_archived_post_rows(sender, instance, using, **kwargs):
+    # Зависимые строки ссылаются на модель Post, и каскад удаления
+    # поста из архива их не находит. Комментарии лежат в базе поста,
+    # остальное — в default.
+    Comment.objects.using(using).filter(post_id=instance.pk).delete()
+    for model in (Reaction, PostTag, Mention, PostViewCount):
+        model.objects.filter(post_id=instance.pk).delete()
+    archive.invalidate_counts()
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_posts(sender, instance, **kwargs):
+    # Каскад из default не видит постов в других шардах.
+    alias = sharding.shard_for(instance.pk)
+    if alias != DEFAULT_DB_ALIAS:
+        for model in (Post, ArchivedPost):
+            model.objects.using(alias).filter(author_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, using, **kwargs):
+    if created and instance.post_id:
+        Post.objects.using(using).filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1
+        )
+        trending.record(TrendingBucket.POST, instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, using, **kwargs):
+    if instance.post_id:
+        Post.objects.using(using).filter(
+            pk=instance.post_id, comment_count__gt=0
+        ).update(
+            comment_count=F('comment_count') - 1
+        )
+
+
+@receiver(post_save, sender=Follow)
+def record_follow(sender, instance, created, **kwargs):
+    if created:
+        trending.record(TrendingBucket.AUTHOR, instance.author_id)
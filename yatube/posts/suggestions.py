@@ -0,0 +1,169 @@
+"""Рекомендации «кого почитать».
+
+Кандидаты для пользователя — авторы, на которых подписаны его
+подписки (друзья друзей), и самые активные авторы групп, где он сам
+пишет. Считать это на каждый запрос дорого, поэтому рекомендации
+раз в какое-то время пересчитывает команда ``suggest_follows`` и
+складывает по ``FOLLOW_SUGGESTIONS`` штук на пользователя в
+``FollowSuggestion``.
+
+Граф подписок загружается в память целиком: id пользователей
+заменяются плотными номерами, а списки смежности лежат в двух
+массивах — смещения и соседи подряд. Подписка или отписка помечает в
+``StaleSuggestions`` самого пользователя и его подписчиков, у которых
+от этого поменялись друзья друзей; обычный запуск команды
+пересчитывает только их.
+"""
+import heapq
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Follow, FollowSuggestion, GroupAuthorCount, StaleSuggestions
+)
+
+FRIEND_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+GROUP_FANOUT = 20
+WRITE_BATCH = 500
+
+
+class Adjacency:
+    """Списки смежности в двух массивах: соседи вершины ``i`` лежат в
+    ``targets`` с ``offsets[i]`` по ``offsets[i + 1]``.
+    """
+
+    def __init__(self, pairs, index):
+        neighbours = {}
+        for source, target in pairs:
+            neighbours.setdefault(index(source), []).append(target)
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        for number in range(len(index.ids)):
+            self.targets.extend(neighbours.get(number, ()))
+            self.offsets.append(len(self.targets))
+
+    def __getitem__(self, number):
+        # Вершины, получившие номер позже построения, соседей не имеют.
+        if number is None or number + 1 >= len(self.offsets):
+            return ()
+        return self.targets[self.offsets[number]:self.offsets[number + 1]]
+
+
+class Index:
+    """Плотные номера для id пользователей и групп."""
+
+    def __init__(self):
+        self.ids = []
+        self.numbers = {}
+
+    def __call__(self, key):
+        number = self.numbers.get(key)
+        if number is None:
+            number = self.numbers[key] = len(self.ids)
+            self.ids.append(key)
+        return number
+
+    def get(self, key):
+        return self.numbers.get(key)
+
+
+class Graph:
+    def __init__(self):
+        users = Index()
+        follows = list(Follow.objects.values_list('user_id', 'author_id'))
+        self.following = Adjacency(
+            ((user, users(author)) for user, author in follows), users
+        )
+        groups = Index()
+        activity = GroupAuthorCount.objects.order_by(
+            'group_id', '-count'
+        ).values_list('group_id', 'author_id')
+        member_of, top_authors, taken = [], [], {}
+        for group, author in activity.iterator():
+            member_of.append((author, groups(group)))
+            if taken.get(group, 0) < GROUP_FANOUT:
+                taken[group] = taken.get(group, 0) + 1
+                top_authors.append((group, users(author)))
+        self.groups = Adjacency(member_of, users)
+        self.group_authors = Adjacency(top_authors, groups)
+        self.users = users
+
+    def suggest(self, user_id, limit):
+        """``limit`` лучших авторов для пользователя: пары (id, вес)."""
+        me = self.users.get(user_id)
+        followed = set(self.following[me])
+        scores = {}
+        for friend in followed:
+            for author in self.following[friend]:
+                scores[author] = scores.get(author, 0) + FRIEND_WEIGHT
+        for group in self.groups[me]:
+            for author in self.group_authors[group]:
+                scores[author] = scores.get(author, 0) + GROUP_WEIGHT
+        scores.pop(me, None)
+        for author in followed:
+            scores.pop(author, None)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.users.ids[author], score) for author, score in best]
+
+
+def mark_stale(user_id, author_id):
+    """Помечает к пересчёту пользователя, сменившего подписку на автора,
+    и его подписчиков. Самого автора из рекомендаций убирает сразу.
+    """
+    FollowSuggestion.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+    user_ids = [user_id, *Follow.objects.filter(
+        author_id=user_id
+    ).values_list('user_id', flat=True)]
+    StaleSuggestions.objects.filter(user_id__in=user_ids).update(
+        marked=timezone.now()
+    )
+    StaleSuggestions.objects.bulk_create(
+        (StaleSuggestions(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+
+
+def refresh(user_ids=None):
+    """Пересчитывает рекомендации пользователей ``user_ids`` или, если
+    они не заданы, помеченных к пересчёту. Возвращает их число.
+    """
+    started = timezone.now()
+    if user_ids is None:
+        user_ids = list(
+            StaleSuggestions.objects.values_list('user_id', flat=True)
+        )
+    if not user_ids:
+        return 0
+    graph = Graph()
+    limit = settings.FOLLOW_SUGGESTIONS
+    for start in range(0, len(user_ids), WRITE_BATCH):
+        batch = user_ids[start:start + WRITE_BATCH]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create(
+                FollowSuggestion(user_id=user_id, author_id=author_id,
+                                 score=score)
+                for user_id in batch
+                for author_id, score in graph.suggest(user_id, limit)
+            )
+            StaleSuggestions.objects.filter(
+                user_id__in=batch, marked__lte=started
+            ).delete()
+    return len(user_ids)
+
+
+def for_user(user):
+    """Рекомендации пользователю одним запросом."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        FollowSuggestion.objects.filter(user=user).select_related(
+            'author'
+        ).order_by('-score')[:settings.FOLLOW_SUGGESTIONS]
+    )
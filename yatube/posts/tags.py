@@ -0,0 +1,72 @@
+"""Хештеги и упоминания в тексте постов.
+
+``#тег`` и ``@username`` разбираются при записи поста и раскладываются
+по таблицам ``PostTag`` и ``Mention``: страницы тега и упоминаний
+читают только их индексы, а не ищут подстроку в текстах. Теги
+приводятся к нижнему регистру; упоминания сохраняются только для
+существующих пользователей.
+
+``PostForm`` индексирует пост сам. Код, создающий посты в обход формы
+(импорт, ``bulk_create``), должен вызвать ``index_posts`` для
+созданных постов.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Mention, PostTag, Tag
+from .rendering import MENTION_RE, TAG_RE, normalize_tag
+
+User = get_user_model()
+
+
+def find_tags(text):
+    return {normalize_tag(name) for name in TAG_RE.findall(text)}
+
+
+def find_mentions(text):
+    # Точка в конце обычно закрывает предложение, а не входит в имя.
+    return {name.rstrip('.') for name in MENTION_RE.findall(text)} - {''}
+
+
+def index_post(post):
+    index_posts([post])
+
+
+def index_posts(posts):
+    """Пересобирает теги и упоминания постов пачкой запросов."""
+    posts = [post for post in posts if post.pk]
+    if not posts:
+        return
+    found_tags = {post.pk: find_tags(post.text) for post in posts}
+    found_mentions = {post.pk: find_mentions(post.text) for post in posts}
+    names = set().union(*found_tags.values())
+    usernames = set().union(*found_mentions.values())
+    with transaction.atomic():
+        PostTag.objects.filter(post_id__in=found_tags).delete()
+        Mention.objects.filter(post_id__in=found_mentions).delete()
+        tag_ids = {}
+        if names:
+            Tag.objects.bulk_create(
+                (Tag(name=name) for name in names), ignore_conflicts=True
+            )
+            tag_ids = dict(
+                Tag.objects.filter(name__in=names).values_list('name', 'pk')
+            )
+        user_ids = {}
+        if usernames:
+            user_ids = dict(
+                User.objects.filter(username__in=usernames).values_list(
+                    'username', 'pk'
+                )
+            )
+        PostTag.objects.bulk_create(
+            PostTag(post_id=post_id, tag_id=tag_ids[name])
+            for post_id, post_names in found_tags.items()
+            for name in post_names
+        )
+        Mention.objects.bulk_create(
+            Mention(post_id=post_id, user_id=user_ids[username])
+            for post_id, post_usernames in found_mentions.items()
+            for username in post_usernames
+            if username in user_ids
+        )
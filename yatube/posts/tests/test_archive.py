@@ -0,0 +1,167 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.querycache import bump
+from posts.archive import FIELDS
+from posts.models import (
+    ArchivedPost, Comment, Follow, Group, Post, PostTag, PostViewCount,
+    Reaction, Tag, User
+)
+
+
+@override_settings(NUMBER_OF_POSTS_PER_PAGE=3)
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        now = timezone.now()
+        for i in range(5):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=500 - i * 100)
+            )
+        cls.old_post = Post.objects.order_by('pub_date').first()
+        Comment.objects.create(
+            post=cls.old_post, author=cls.reader, text='Старый комментарий'
+        )
+        PostViewCount.objects.create(post=cls.old_post, count=7)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def archive(self):
+        call_command(
+            'archive_posts', days=365, batch_size=1, stdout=StringIO()
+        )
+
+    def texts(self, client, url):
+        texts = []
+        page = 1
+        while True:
+            response = client.get(url, {'page': page})
+            page_obj = response.context['page_obj']
+            texts += [post.text for post in page_obj]
+            if not page_obj.has_next():
+                return texts
+            page += 1
+
+    def test_shapes_match(self):
+        """Архивная таблица повторяет форму таблицы постов."""
+        self.assertEqual(
+            FIELDS,
+            [field.attname for field in ArchivedPost._meta.concrete_fields],
+        )
+
+    def test_old_posts_move_with_same_ids(self):
+        """Старые посты переносятся с теми же id, зависимые остаются."""
+        self.archive()
+        self.assertEqual(Post.objects.count(), 3)
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual(archived.text, 'Пост 0')
+        self.assertEqual(archived.group, self.group)
+        self.assertTrue(
+            Comment.objects.filter(post_id=self.old_post.pk).exists()
+        )
+        self.assertTrue(
+            PostViewCount.objects.filter(post_id=self.old_post.pk).exists()
+        )
+
+    def test_lists_fall_through_to_archive(self):
+        """Ленты показывают архив после горячих постов."""
+        self.archive()
+        expected = [f'Пост {i}' for i in range(4, -1, -1)]
+        urls = (
+            (self.client, reverse('posts:index')),
+            (self.client, reverse(
+                'posts:group_posts', kwargs={'slug': 'test-slug'}
+            )),
+            (self.client, reverse(
+                'posts:profile', kwargs={'username': 'author'}
+            )),
+            (self.reader_client, reverse('posts:follow_index')),
+        )
+        for client, url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertEqual(self.texts(client, url), expected)
+
+    def test_first_page_reads_only_hot_table(self):
+        """Первая страница не выбирает посты из архива."""
+        self.archive()
+        url = reverse('posts:index')
+        self.client.get(url)
+        # Горячая страница — заново из БД, число постов архива — из кеша.
+        bump(DEFAULT_DB_ALIAS, Post._meta.db_table)
+        with self.assertNumQueries(3) as queries:
+            self.client.get(url, {'page': 1})
+        self.assertFalse(any(
+            'posts_archivedpost' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_detail_finds_archived_post(self):
+        """Страница поста находит пост в архиве вместе с комментариями."""
+        self.archive()
+        response = self.reader_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.old_post.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['post'].archived)
+        self.assertEqual(response.context['count'], 5)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Старый комментарий'],
+        )
+        self.assertNotContains(response, 'id="comment-form"')
+
+    def test_deleting_author_deletes_archived_post_rows(self):
+        """Удаление автора удаляет архив вместе с зависимыми строками."""
+        self.archive()
+        author = User.objects.create_user(username='gone')
+        post = Post.objects.create(text='Пост', author=author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=500)
+        )
+        tag = Tag.objects.create(name='старое')
+        PostTag.objects.create(tag=tag, post=post)
+        Reaction.objects.create(user=self.reader, post=post)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        PostViewCount.objects.create(post=post, count=3)
+        self.archive()
+        self.assertTrue(ArchivedPost.objects.filter(pk=post.pk).exists())
+        self.assertEqual(
+            len(self.texts(self.client, reverse('posts:index'))), 6
+        )
+        author.delete()
+        self.assertFalse(ArchivedPost.objects.filter(pk=post.pk).exists())
+        for model in (Comment, Reaction, PostTag, PostViewCount):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(
+                    model.objects.filter(post_id=post.pk).exists()
+                )
+        self.assertTrue(
+            Comment.objects.filter(post_id=self.old_post.pk).exists()
+        )
+        self.assertEqual(
+            self.texts(self.client, reverse('posts:index')),
+            [f'Пост {i}' for i in range(4, -1, -1)],
+        )
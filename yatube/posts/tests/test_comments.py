@@ -0,0 +1,179 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.querycache import bump
+from posts.models import Comment, Post, User
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentsPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        for i in range(7):
+            commenter = User.objects.create_user(username=f'user{i}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def test_comment_count_maintained(self):
+        """Счётчик комментариев растёт при создании и падает при удалении."""
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 7)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 8)
+        Comment.objects.filter(text='Новый комментарий').get().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 7)
+
+    def test_detail_shows_first_page(self):
+        """На странице поста первая порция комментариев и курсор."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'],
+        )
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_fragment_continues_after_cursor(self):
+        """Фрагмент отдаёт следующие комментарии без повторов."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        texts = []
+        cursor = None
+        while True:
+            data = {'after': cursor} if cursor else {}
+            response = self.client.get(url, data)
+            texts += [comment.text for comment in response.context['comments']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(texts, [f'Комментарий {i}' for i in range(7)])
+        self.assertTemplateUsed(response, 'includes/comments.html')
+
+    def test_bad_cursor_returns_404(self):
+        """Некорректный курсор даёт 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': 'garbage'},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_queries_do_not_grow_with_thread(self):
+        """Число запросов страницы поста не зависит от размера ветки."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        # Ветка — заново из БД, как после нового комментария.
+        bump(DEFAULT_DB_ALIAS, Comment._meta.db_table)
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        for i in range(5):
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Ещё {i}'
+            )
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+
+@override_settings(COMMENTS_PER_PAGE=20, COMMENT_MAX_DEPTH=2)
+class CommentThreadsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.author, text=text, parent=parent
+        )
+
+    def test_replies_follow_their_parents(self):
+        """Ответы выводятся сразу под своими комментариями."""
+        first = self.comment('1')
+        second = self.comment('2')
+        reply = self.comment('1.1', parent=first)
+        self.comment('2.1', parent=second)
+        self.comment('1.1.1', parent=reply)
+        self.comment('1.2', parent=first)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [(comment.text, comment.depth) for comment in comments],
+            [('1', 0), ('1.1', 1), ('1.1.1', 2), ('1.2', 1),
+             ('2', 0), ('2.1', 1)],
+        )
+
+    def test_subtree(self):
+        """Поддерево содержит только комментарий и его потомков."""
+        first = self.comment('1')
+        reply = self.comment('1.1', parent=first)
+        self.comment('1.1.1', parent=reply)
+        self.comment('2')
+        self.assertEqual(
+            [comment.text for comment in reply.subtree()], ['1.1', '1.1.1']
+        )
+
+    def test_reply_depth_is_limited(self):
+        """Ответ глубже предела становится соседом родителя."""
+        first = self.comment('1')
+        reply = self.comment('1.1', parent=first)
+        deep = self.comment('1.1.1', parent=reply)
+        deeper = self.comment('1.1.1.1', parent=deep)
+        self.assertEqual(deeper.depth, 2)
+        self.assertEqual(deeper.parent, reply)
+
+    def test_failed_path_update_rolls_back_insert(self):
+        """Без пути комментарий не сохраняется."""
+        with mock.patch.object(
+            Comment, '_set_path', side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                self.comment('1')
+        self.assertFalse(Comment.objects.filter(text='1').exists())
+
+    def test_reply_via_form(self):
+        """Ответ через форму прикрепляется к родителю."""
+        first = self.comment('1')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Ответ', 'parent': first.id},
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, first)
+        self.assertTrue(reply.path.startswith(first.path + '.'))
+
+    def test_reply_to_other_post_rejected(self):
+        """Нельзя ответить на комментарий к другому посту."""
+        other_post = Post.objects.create(text='Другой', author=self.author)
+        foreign = Comment.objects.create(
+            post=other_post, author=self.author, text='Чужой'
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Ответ', 'parent': foreign.id},
+        )
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
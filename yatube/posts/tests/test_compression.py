@@ -0,0 +1,84 @@
+import random
+from base64 import b85encode
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.compression import MARKER, decode, encode
+from posts.models import Comment, Post, User
+
+LONG_TEXT = 'Очень длинный пост про иголку в стоге сена. ' * 20
+
+
+@override_settings(TEXT_COMPRESSION_THRESHOLD=100)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def stored(self, model, pk):
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT text FROM {table} WHERE id = %s', [pk])
+            return cursor.fetchone()[0]
+
+    def test_codec(self):
+        """Длинное сжимается, короткое и несжимаемое остаются как есть."""
+        noise = b85encode(random.Random(0).randbytes(300)).decode()
+        self.assertEqual(encode('коротко'), 'коротко')
+        self.assertEqual(encode(noise), noise)
+        self.assertTrue(encode(LONG_TEXT).startswith(MARKER))
+        self.assertLess(len(encode(LONG_TEXT)), len(LONG_TEXT.encode()))
+        for text in (LONG_TEXT, f'{MARKER}не сжатый'):
+            with self.subTest(text=text[:20]):
+                self.assertEqual(decode(encode(text)), text)
+
+    def test_orm_round_trip(self):
+        """Длинные тексты хранятся сжатыми и читаются ORM как строки."""
+        post = Post.objects.create(text=LONG_TEXT, author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.author, text=LONG_TEXT
+        )
+        for model, pk in ((Post, post.pk), (Comment, comment.pk)):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(self.stored(model, pk).startswith(MARKER))
+                self.assertEqual(model.objects.get(pk=pk).text, LONG_TEXT)
+                self.assertEqual(
+                    model.objects.filter(pk=pk).values_list(
+                        'text', flat=True
+                    ).get(),
+                    LONG_TEXT,
+                )
+        Post.objects.filter(pk=post.pk).update(text='Коротко')
+        self.assertEqual(self.stored(Post, post.pk), 'Коротко')
+
+    def test_admin_search_finds_compressed(self):
+        """Поиск в админке находит и сжатые, и обычные посты."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        long_post = Post.objects.create(text=LONG_TEXT, author=self.author)
+        short_post = Post.objects.create(
+            text='Короткий про иголку', author=self.author
+        )
+        Post.objects.create(text='Про другое', author=self.author)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'иголку'}
+        )
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {long_post.pk, short_post.pk},
+        )
+
+    def test_benchmark_command(self):
+        """Бенчмарк сообщает объём и время чтения."""
+        Post.objects.create(text=LONG_TEXT, author=self.author)
+        out = StringIO()
+        call_command('benchmark_compression', repeat=1, stdout=out)
+        self.assertIn('Post: строк 1, сжато 1', out.getvalue())
+        self.assertIn('чтение 1 сжатых строк', out.getvalue())
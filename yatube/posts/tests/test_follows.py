@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.querycache import stats
+from posts.follows import follow_states
+from posts.models import Follow, FollowCounts, Group, Post, User
+
+
+class FollowCountsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for user in (cls.author, cls.other):
+            Post.objects.create(text='Пост', author=user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self, username):
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': username})
+        )
+
+    def unfollow(self, username):
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': username})
+        )
+
+    def counts(self, user):
+        counts = FollowCounts.objects.filter(user=user).first()
+        return (counts.followers, counts.following) if counts else (0, 0)
+
+    def test_counters_follow_subscriptions(self):
+        """Счётчики меняются вместе с подписками и не уходят в минус."""
+        self.follow('author')
+        self.follow('author')
+        self.follow('other')
+        self.assertEqual(self.counts(self.author), (1, 0))
+        self.assertEqual(self.counts(self.reader), (0, 2))
+        self.unfollow('author')
+        self.unfollow('author')
+        self.assertEqual(self.counts(self.author), (0, 0))
+        self.assertEqual(self.counts(self.reader), (0, 1))
+
+    def test_profile_shows_counts_and_state(self):
+        """Профиль показывает счётчики и подписан ли зритель."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertFalse(self.reader_client.get(url).context['following'])
+        self.follow('author')
+        response = self.reader_client.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 1)
+        self.assertEqual(response.context['following_count'], 0)
+
+    def test_follow_states_is_one_query(self):
+        """Состояние подписки на набор авторов — один запрос."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(1):
+            followed = follow_states(
+                self.reader, [self.author.pk, self.other.pk]
+            )
+        self.assertEqual(followed, {self.author.pk})
+
+    def test_group_page_marks_followed_authors(self):
+        """Страница группы знает, на кого из авторов подписан зритель."""
+        self.follow('author')
+        response = self.reader_client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+        )
+        self.assertEqual(response.context['followed'], {self.author.pk})
+
+    def test_follow_states_skip_query_cache(self):
+        """Состояние подписки не берётся из кеша запросов: другие
+        процессы не видят сброса его версии.
+        """
+        before = stats()['posts.Follow']
+        for _ in range(2):
+            follow_states(self.reader, [self.author.pk])
+        self.assertEqual(stats()['posts.Follow'], before)
@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.archive import archive_posts
+from posts.models import ArchivedPost, Group, GroupStats, Post, User
+
+
+@override_settings(GROUPS_PER_PAGE=2)
+class GroupDirectoryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group-{i}',
+                description='Тестовое описание',
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_stats_follow_post_changes(self):
+        """Сводка группы меняется при создании, переносе и удалении поста."""
+        first, second = self.groups[:2]
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=first
+        )
+        Post.objects.create(text='Ещё', author=self.other, group=first)
+        Post.objects.create(text='И ещё', author=self.other, group=first)
+        stats = self.stats(first)
+        self.assertEqual(stats.post_count, 3)
+        self.assertEqual(stats.top_authors, 'other,author')
+        post = Post.objects.get(pk=post.pk)
+        post.group = second
+        post.save()
+        self.assertEqual(self.stats(first).post_count, 2)
+        self.assertEqual(self.stats(first).top_authors, 'other')
+        self.assertEqual(self.stats(second).post_count, 1)
+        self.assertEqual(self.stats(second).last_pub_date, post.pub_date)
+        post.delete()
+        self.assertEqual(self.stats(second).post_count, 0)
+        self.assertIsNone(self.stats(second).last_pub_date)
+
+    def test_directory_is_one_query_and_paginated_by_slug(self):
+        """Страница каталога — один запрос, дальше листается по слагу."""
+        url = reverse('posts:group_index')
+        slugs = []
+        after = None
+        while True:
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    url, {'after': after} if after else {}
+                )
+            slugs += [group['slug'] for group in response.context['groups']]
+            after = response.context['next_cursor']
+            if after is None:
+                break
+        self.assertEqual(slugs, [group.slug for group in self.groups])
+
+    def test_stats_change_invalidates_only_its_row(self):
+        """Новый пост сбрасывает в кеше только строку своей группы."""
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Post.objects.create(
+            text='Пост', author=self.author, group=self.groups[0]
+        )
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(url)
+        self.assertIn("IN ('group-0')", queries.captured_queries[0]['sql'])
+        self.assertEqual(response.context['groups'][0]['post_count'], 1)
+        self.assertEqual(response.context['groups'][1]['post_count'], 0)
+
+    def test_new_group_resets_pages(self):
+        """Новая группа появляется в каталоге сразу."""
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        Group.objects.create(title='Первая', slug='a-first', description='')
+        response = self.client.get(url)
+        self.assertEqual(response.context['groups'][0]['slug'], 'a-first')
+
+    def test_bad_cursor_returns_404(self):
+        """Курсор не похожий на слаг даёт 404."""
+        response = self.client.get(
+            reverse('posts:group_index'), {'after': 'не слаг!'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает сводки по постам."""
+        group = self.groups[0]
+        Post.objects.create(text='Пост', author=self.author, group=group)
+        GroupStats.objects.all().delete()
+        call_command('rebuild_group_stats', stdout=None)
+        self.assertEqual(self.stats(group).post_count, 1)
+        self.assertEqual(self.stats(group).top_authors, 'author')
+
+    def test_rebuild_agrees_with_archiving(self):
+        """Перенос в архив и пересчёт дают одну и ту же сводку."""
+        group = self.groups[0]
+        old = Post.objects.create(
+            text='Старый', author=self.author, group=group
+        )
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=1000)
+        )
+        Post.objects.create(text='Новый', author=self.author, group=group)
+        Post.objects.create(text='Ещё', author=self.other, group=group)
+        archive_posts()
+        self.assertTrue(ArchivedPost.objects.filter(pk=old.pk).exists())
+        incremental = self.stats(group)
+        call_command('rebuild_group_stats', stdout=None)
+        rebuilt = self.stats(group)
+        self.assertEqual(incremental.post_count, 3)
+        self.assertEqual(rebuilt.post_count, 3)
+        self.assertEqual(rebuilt.top_authors, 'author,other')
+        self.assertEqual(rebuilt.top_authors, incremental.top_authors)
+        ArchivedPost.objects.get(pk=old.pk).delete()
+        self.assertEqual(self.stats(group).post_count, 2)
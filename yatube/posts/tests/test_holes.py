@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import holes
+from posts.models import Follow, Post, User
+
+
+class HoleTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_marker_is_replaced(self):
+        """Метка в шаблоне заменяется блоком, отрисованным для запроса."""
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        content = Template(
+            "{% load holes %}{% hole 'reply_link' post_id=1 comment_id=2 %}"
+        ).render(Context({'request': request, 'user': self.reader}))
+        self.assertTrue(holes.has_holes(content.encode()))
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        html = holes.splice(request, content.encode(), 'utf-8').decode()
+        self.assertIn('?reply_to=2', html)
+        self.assertFalse(holes.has_holes(html.encode()))
+
+    def test_markers_do_not_leak(self):
+        """В ответе не остаётся меток."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ):
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertNotIn(b'<!--hole:', response.content)
+
+    def test_post_text_cannot_forge_marker(self):
+        """Текст поста с похожей меткой не считается блоком."""
+        post = Post.objects.create(
+            text='<!--hole:0000000000000000:WyJzd2l0Y2hlciIsIHt9XQ==-->',
+            author=self.author,
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertFalse(holes.has_holes(response.content))
+
+    @mock.patch('core.pagecache.is_shared', lambda: True)
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_cached_page_gets_fresh_blocks(self):
+        """Страница, закешированная для анонима, получает блоки читателя."""
+        url = reverse('posts:profile', args=[self.author.username])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Отписаться')
+
+    @mock.patch('core.pagecache.is_shared', lambda: True)
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_csrf_token_is_per_request(self):
+        """Форма комментария на странице из кеша получает CSRF-токен."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.reader_client.get(url)
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        response = client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('csrftoken', response.cookies)
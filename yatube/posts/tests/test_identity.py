@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import identity
+from posts import negative
+from posts.models import Group, Post, User
+
+
+class IdentityMapTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        # Фильтры негативного кеша строятся заранее, не в замере.
+        for keys in (negative.users, negative.groups, negative.posts):
+            keys.rebuild()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def queries_to(self, table, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum(
+            f'FROM "{table}"' in query['sql']
+            for query in queries.captured_queries
+        )
+
+    def test_pages_load_user_and_group_once(self):
+        """Автор, он же пользователь запроса, и группа грузятся раз."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+        ):
+            with self.subTest(url=url):
+                self.assertLessEqual(self.queries_to('auth_user', url), 1)
+                self.assertLessEqual(self.queries_to('posts_group', url), 1)
+
+    def test_lookups_reuse_mapped_objects(self):
+        """Поиск по pk и уникальным полям отдаёт объект из карты."""
+        identity.activate(None)
+        self.addCleanup(identity.deactivate)
+        group = identity.get_object_or_404(Group, slug=self.group.slug)
+        post = Post.objects.filter(group=group).first()
+        with self.assertNumQueries(0):
+            self.assertIs(post.group, group)
+            self.assertIs(
+                identity.get_object_or_404(Group, pk=str(group.pk)), group
+            )
+
+    def test_map_is_cleared_after_request(self):
+        """После запроса карта закрыта и объекты грузятся заново."""
+        self.client.get(reverse('posts:index'))
+        post = Post.objects.first()
+        other = Post.objects.exclude(pk=post.pk).first()
+        with self.assertNumQueries(2):
+            self.assertIsNot(post.author, other.author)
@@ -0,0 +1,161 @@
+import warnings
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.negative import BloomFilter
+from posts import negative
+from posts.models import Group, Post, User
+
+
+class NegativeCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        for keys in (negative.users, negative.groups, negative.posts):
+            keys.rebuild()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Фильтр находит все ключи и редко ошибается на чужих."""
+        bloom = BloomFilter(1000, 0.01)
+        for key in range(1000):
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in range(1000)))
+        false_positives = sum(
+            f'other-{key}' in bloom for key in range(10000)
+        )
+        self.assertLess(false_positives, 300)
+
+    def unknown_urls(self):
+        return (
+            reverse('posts:profile', args=['no-such-user']),
+            reverse('posts:group_list', args=['no-such-group']),
+            reverse('posts:post_detail', args=[self.post.pk + 10 ** 9]),
+        )
+
+    def test_unknown_keys_are_rejected_without_queries(self):
+        """С общим кешем неизвестные автор, группа и пост дают 404 без
+        запросов.
+        """
+        with mock.patch('core.negative.is_shared', return_value=True):
+            for url in self.unknown_urls():
+                with self.subTest(url=url):
+                    with self.assertNumQueries(0):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 404)
+
+    def test_local_cache_probes_unknown_key_once(self):
+        """С кешем процесса неизвестный ключ проверяется в БД, а отказ
+        запоминается.
+        """
+        for url in self.unknown_urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+
+    def test_known_keys_are_served(self):
+        """Существующие автор, группа и пост открываются."""
+        urls = (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_new_keys_are_known_before_rebuild(self):
+        """Новые ключи видны сразу, в том числе процессам без метки в
+        своём кеше.
+        """
+        author = User.objects.create_user(username='newcomer')
+        group = Group.objects.create(title='Новая', slug='new-slug')
+        post = Post.objects.create(text='Новый пост', author=author)
+        # Другой процесс: фильтр построен до записи, меток в кеше нет.
+        cache.clear()
+        for keys in (negative.users, negative.groups, negative.posts):
+            keys._bloom = BloomFilter(1000, 0.01)
+        urls = (
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:post_detail', args=[post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_cache_keys_are_safe_for_memcached(self):
+        """Пробелы, управляющие символы и длина адреса не попадают в
+        ключ кеша.
+        """
+        usernames = ('two words', 'tab\tname', 'x' * 300)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            for username in usernames:
+                with self.subTest(username=username[:20]):
+                    self.assertNotIn(username, negative.users)
+                    negative.users.add(username)
+                    with mock.patch(
+                        'core.negative.is_shared', return_value=True
+                    ):
+                        negative.users._bloom = BloomFilter(1000, 0.01)
+                        self.assertIn(username, negative.users)
+
+    def test_stale_filter_is_served_during_rebuild(self):
+        """Пока другой поток строит фильтр, запросы его не ждут."""
+        users = negative.users
+        users._built_at = 0
+        users._lock.acquire()
+        try:
+            with mock.patch('core.negative.is_shared', return_value=True):
+                with self.assertNumQueries(0):
+                    self.assertIn(self.author.username, users)
+                    self.assertNotIn('no-such-user', users)
+                self.assertEqual(users._built_at, 0)
+                # Фильтра ещё нет: ключ проверяет сама вьюха.
+                users._bloom = None
+                with self.assertNumQueries(0):
+                    self.assertIn('no-such-user', users)
+        finally:
+            users._lock.release()
+        self.assertNotIn('no-such-user', users)
+        self.assertGreater(users._built_at, 0)
+
+    def test_not_found_page_is_cached_for_anonymous(self):
+        """Страница 404 рисуется один раз и подставляет свой адрес."""
+        first = self.client.get(reverse('posts:profile', args=['first']))
+        self.assertTemplateUsed(first, 'core/404.html')
+        url = reverse('posts:profile', args=['<second>'])
+        second = self.client.get(url)
+        self.assertEqual(second.status_code, 404)
+        self.assertTemplateNotUsed(second, 'core/404.html')
+        self.assertContains(
+            second, '/profile/&lt;second&gt;/', status_code=404
+        )
+        self.assertContains(second, 'Custom 404', status_code=404)
+
+    def test_not_found_page_is_rendered_for_user(self):
+        """Авторизованному пользователю 404 рисуется с его меню."""
+        client = Client()
+        client.force_login(self.author)
+        for _ in range(2):
+            response = client.get(reverse('posts:profile', args=['nobody']))
+            self.assertTemplateUsed(response, 'core/404.html')
+            self.assertContains(response, 'author', status_code=404)
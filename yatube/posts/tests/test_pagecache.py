@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import pagecache
+from posts.models import Follow, Group, Post, User
+
+
+@mock.patch('core.pagecache.is_shared', lambda: True)
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_served_without_view(self):
+        """Повторная страница для анонима отдаётся из кеша без запросов."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('about:author'),
+        ):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second['X-Page-Cache'], 'hit')
+                self.assertTrue(all(
+                    template.name.startswith('includes/')
+                    for template in second.templates
+                ))
+                self.assertEqual(second.content, first.content)
+
+    def test_query_string_is_part_of_key(self):
+        """Разные query string — разные страницы."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url, {'page': 2})
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_authenticated_users_share_page(self):
+        """Пользователи получают общую страницу со своими блоками."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.client.get(url)
+        reader = Client()
+        reader.force_login(self.reader)
+        response = reader.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'reader')
+        self.assertContains(response, 'Подписаться')
+        author = Client()
+        author.force_login(self.author)
+        response = author.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertNotContains(response, 'Подписаться')
+
+    def test_writes_invalidate_affected_pages(self):
+        """Новый пост и подписка обновляют свои страницы."""
+        index = reverse('posts:index')
+        profile = reverse('posts:profile', args=[self.author.username])
+        group = reverse('posts:group_posts', args=[self.group.slug])
+        for url in (index, profile, group):
+            self.client.get(url)
+        Post.objects.create(text='Новый пост', author=self.reader)
+        self.assertFalse(self.client.get(index).has_header('X-Page-Cache'))
+        self.assertEqual(self.client.get(group)['X-Page-Cache'], 'hit')
+        reader = Client()
+        reader.force_login(self.reader)
+        reader.get(reverse('posts:profile_follow', args=['author']))
+        self.assertTrue(Follow.objects.filter(author=self.author).exists())
+        response = self.client.get(profile)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertEqual(response.context['followers_count'], 1)
+
+    def test_stale_page_is_served_while_revalidating(self):
+        """Пока один запрос перерисовывает страницу, другим отдаётся
+        старая.
+        """
+        url = reverse('posts:index')
+        self.client.get(url)
+        pagecache.invalidate('posts')
+        key = pagecache._key(RequestFactory().get(url))
+        cache.add(f'{key}:lock', 1)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'stale')
+        cache.delete(f'{key}:lock')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+
+    def test_cached_post_detail_counts_view(self):
+        """Просмотр поста из кеша тоже учитывается."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        seen_key = f'views:seen:ip:127.0.0.1:{self.post.pk}'
+        cache.delete(seen_key)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        self.assertIsNotNone(cache.get(seen_key))
+
+    def test_local_cache_disables_page_cache(self):
+        """С кешем процесса страницы рисуются заново: сброс по тегам
+        не дошёл бы до других воркеров.
+        """
+        url = reverse('posts:index')
+        with mock.patch('core.pagecache.is_shared', return_value=False):
+            self.client.get(url)
+            response = self.client.get(url)
+        self.assertNotIn('X-Page-Cache', response)
@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from core.models import ProfiledView
+from posts.models import Post, User
+
+TEMP_PROFILER_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@override_settings(PROFILER_DIR=TEMP_PROFILER_DIR, PROFILER_INTERVAL=0.001)
+class SamplingProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.user = User.objects.create(username='user')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILER_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        profiling.refresh()
+        shutil.rmtree(TEMP_PROFILER_DIR, ignore_errors=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+
+    def profile_files(self):
+        if not os.path.isdir(TEMP_PROFILER_DIR):
+            return []
+        return sorted(os.listdir(TEMP_PROFILER_DIR))
+
+    def test_sampler_collects_stacks(self):
+        """Сэмплер снимает стеки указанного потока."""
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_loop, args=(stop,))
+        thread.start()
+        sampler = profiling.StackSampler(thread.ident).start()
+        time.sleep(0.05)
+        samples = sampler.stop()
+        stop.set()
+        thread.join()
+        self.assertTrue(samples)
+        self.assertTrue(
+            any('busy_loop' in stack[-1] for stack in samples)
+        )
+
+    def test_save_writes_collapsed_and_speedscope(self):
+        """Сэмплы пишутся в .folded и speedscope-файл."""
+        sampler = profiling.StackSampler(threading.get_ident())
+        sampler.started, sampler.finished = 0, 0.01
+        sampler.samples[('index (posts/views.py:10)', 'render')] = 2
+        profiling.save('posts:index', sampler)
+        files = self.profile_files()
+        self.assertIn('posts.index.folded', files)
+        with open(os.path.join(TEMP_PROFILER_DIR, 'posts.index.folded')) as f:
+            self.assertEqual(
+                f.read(), 'index (posts/views.py:10);render 2\n'
+            )
+        speedscope = [f for f in files if f.endswith('.speedscope.json')]
+        self.assertEqual(len(speedscope), 1)
+        with open(os.path.join(TEMP_PROFILER_DIR, speedscope[0])) as f:
+            profile = json.load(f)
+        self.assertEqual(profile['profiles'][0]['type'], 'sampled')
+        self.assertEqual(profile['profiles'][0]['samples'], [[0, 1]])
+
+    def test_staff_header_enables_profiling(self):
+        """Заголовок от сотрудника включает профилирование."""
+        with mock.patch('core.profiling.save') as save:
+            self.staff_client.get(
+                reverse(
+                    'posts:post_detail', kwargs={'post_id': self.post.id}
+                ),
+                **{settings.PROFILER_HEADER: '1'}
+            )
+        save.assert_called_once()
+        self.assertEqual(save.call_args[0][0], 'posts:post_detail')
+
+    def test_header_ignored_for_regular_user(self):
+        """Заголовок от обычного пользователя игнорируется."""
+        with mock.patch('core.profiling.save') as save:
+            self.user_client.get(
+                reverse('posts:index'), **{settings.PROFILER_HEADER: '1'}
+            )
+        save.assert_not_called()
+
+    def test_staff_enables_view_by_name(self):
+        """Сотрудник включает профилирование view для всех запросов."""
+        response = self.staff_client.post(
+            reverse('core:profiler'), {'view': 'posts:profile'}
+        )
+        self.assertEqual(response.json()['views'], ['posts:profile'])
+        with mock.patch('core.profiling.save') as save:
+            self.client.get(
+                reverse('posts:profile', kwargs={'username': self.user})
+            )
+        save.assert_called_once()
+
+    def test_regular_user_cannot_enable_view(self):
+        """Обычный пользователь не может включить профилирование."""
+        self.user_client.post(
+            reverse('core:profiler'), {'view': 'posts:profile'}
+        )
+        self.assertNotIn('posts:profile', profiling.enabled_views())
+
+    def test_enabled_views_are_read_from_database(self):
+        """Запросы читают копию списка, а поток watch() перечитывает
+        его из БД.
+        """
+        profiling.enable_view('posts:index')
+        profiling.enable_view('posts:profile')
+        # Другой процесс выключает view.
+        ProfiledView.objects.filter(name='posts:index').delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                profiling.enabled_views(), {'posts:index', 'posts:profile'}
+            )
+        with mock.patch(
+            'core.profiling.time.sleep', side_effect=KeyboardInterrupt
+        ) as sleep, mock.patch('core.profiling.close_old_connections'):
+            with self.assertRaises(KeyboardInterrupt):
+                profiling._watch()
+        sleep.assert_called_once_with(settings.PROFILER_VIEWS_REFRESH)
+        self.assertEqual(profiling.enabled_views(), {'posts:profile'})
+
+    def test_enable_view_twice_keeps_one_row(self):
+        """Повторное включение не создаёт вторую запись."""
+        profiling.enable_view('posts:index')
+        profiling.enable_view('posts:index')
+        self.assertEqual(
+            ProfiledView.objects.filter(name='posts:index').count(), 1
+        )
+        profiling.disable_view('posts:index')
+        self.assertNotIn('posts:index', profiling.enabled_views())
@@ -0,0 +1,186 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import negative
+from posts.counters import reaction_counts
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tags import index_post
+
+FULL_SCAN = re.compile(r'^SCAN (?!.*\bINDEX\b)|USE TEMP B-TREE')
+
+
+class QueryPlanTests(TestCase):
+    """Запросы view не должны сканировать таблицы целиком
+    и сортировать во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост #тест для @reader',
+            author=cls.author,
+            group=cls.group,
+        )
+        index_post(cls.post)
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        # Фильтры негативного кеша перестраиваются по расписанию, а не
+        # в запросе view.
+        for keys in (negative.users, negative.groups, negative.posts):
+            keys.rebuild()
+        self.addCleanup(reaction_counts.flush)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_plans(self, client, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            getattr(client, method)(url, data or {})
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def test_views_use_indexes(self):
+        """Каждый запрос view обслуживается индексом."""
+        post_id = {'post_id': self.post.id}
+        author = {'username': self.author.username}
+        requests = {
+            'index': (self.client, 'get', reverse('posts:index'), None),
+            'group_index': (
+                self.client, 'get', reverse('posts:group_index'),
+                {'after': 'a'},
+            ),
+            'group_posts': (
+                self.client, 'get',
+                reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+                None,
+            ),
+            'profile': (
+                self.reader_client, 'get',
+                reverse('posts:profile', kwargs=author), None,
+            ),
+            'post_detail': (
+                self.reader_client, 'get',
+                reverse('posts:post_detail', kwargs=post_id), None,
+            ),
+            'post_comments': (
+                self.client, 'get',
+                reverse('posts:post_comments', kwargs=post_id),
+                {'after': self.comment.path},
+            ),
+            'trending': (
+                self.client, 'get', reverse('posts:trending'), None,
+            ),
+            'tag_posts': (
+                self.client, 'get',
+                reverse('posts:tag_posts', kwargs={'tag': 'тест'}),
+                {'after': self.post.id + 1},
+            ),
+            'mentions': (
+                self.reader_client, 'get', reverse('posts:mentions'),
+                {'after': self.post.id + 1},
+            ),
+            'post_create': (
+                self.author_client, 'post', reverse('posts:post_create'),
+                {'text': 'Новый пост', 'group': self.group.id},
+            ),
+            'post_edit': (
+                self.author_client, 'post',
+                reverse('posts:post_edit', kwargs=post_id),
+                {'text': 'Исправленный пост', 'group': self.group.id},
+            ),
+            'add_comment': (
+                self.reader_client, 'post',
+                reverse('posts:add_comment', kwargs=post_id),
+                {'text': 'Ещё комментарий'},
+            ),
+            'post_like': (
+                self.reader_client, 'post',
+                reverse('posts:post_like', kwargs=post_id), None,
+            ),
+            'post_unlike': (
+                self.reader_client, 'post',
+                reverse('posts:post_unlike', kwargs=post_id), None,
+            ),
+            'follow_index': (
+                self.reader_client, 'get', reverse('posts:follow_index'),
+                None,
+            ),
+            'profile_follow': (
+                self.reader_client, 'get',
+                reverse('posts:profile_follow', kwargs=author), None,
+            ),
+            'profile_unfollow': (
+                self.reader_client, 'get',
+                reverse('posts:profile_unfollow', kwargs=author), None,
+            ),
+        }
+        for view, (client, method, url, data) in requests.items():
+            for sql, plan in self.get_plans(client, method, url, data):
+                for step in plan:
+                    with self.subTest(view=view, sql=sql, step=step):
+                        self.assertIsNone(FULL_SCAN.search(step))
+
+    def test_comment_threads_use_path_index(self):
+        """Ветка и поддерево комментариев выбираются диапазоном по индексу."""
+        querysets = (
+            self.post.comments.order_by('path'),
+            self.comment.subtree(),
+        )
+        for queryset in querysets:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.assertIn('comment_post_path_idx', ' '.join(plan))
+            for step in plan:
+                self.assertIsNone(FULL_SCAN.search(step))
+
+    def test_follow_index_sorts_only_followed_posts(self):
+        """Лента подписок на нескольких авторов сортирует во временном
+        B-дереве только посты, найденные по индексу авторов.
+        """
+        other = User.objects.create_user(username='other')
+        Post.objects.create(text='Пост другого автора', author=other)
+        Follow.objects.create(user=self.reader, author=other)
+        sorted_queries = []
+        for sql, plan in self.get_plans(
+            self.reader_client, 'get', reverse('posts:follow_index')
+        ):
+            steps = [step for step in plan if FULL_SCAN.search(step)]
+            if steps:
+                sorted_queries.append((sql, plan, steps))
+        self.assertEqual(len(sorted_queries), 1)
+        sql, plan, steps = sorted_queries[0]
+        self.assertIn('FROM "posts_post"', sql)
+        self.assertEqual(steps, ['USE TEMP B-TREE FOR ORDER BY'])
+        self.assertIn(
+            'SEARCH posts_post USING INDEX post_author_pub_date_idx '
+            '(author_id=?)',
+            plan,
+        )
@@ -0,0 +1,130 @@
+import os
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.querycache import stats
+from posts.models import Follow, Group, Post, User
+
+
+class QueryCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Кеш запросов включается только с общим кешем.
+        patcher = mock.patch('core.querycache.is_shared', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_query_is_served_from_cache(self):
+        """Повтор того же запроса не ходит в БД."""
+        Group.objects.cached().get(slug='test-slug')
+        Post.objects.cached().count()
+        with self.assertNumQueries(0):
+            group = Group.objects.cached().get(slug='test-slug')
+            count = Post.objects.cached().count()
+        self.assertEqual(group, self.group)
+        self.assertEqual(count, 1)
+
+    def test_uncached_queryset_is_not_cached(self):
+        """Без cached() запрос выполняется каждый раз."""
+        list(Post.objects.all())
+        with self.assertNumQueries(1):
+            list(Post.objects.all())
+
+    def test_writes_invalidate_table(self):
+        """Запись в таблицу сбрасывает результаты запросов к ней."""
+        posts = Post.objects.filter(author=self.author)
+        writes = {
+            'save': lambda: Post.objects.create(
+                text='Ещё пост', author=self.author
+            ),
+            'update': lambda: posts.update(text='Новый текст'),
+            'delete': lambda: posts.filter(text='Ещё пост').delete(),
+        }
+        for name, write in writes.items():
+            with self.subTest(write=name):
+                list(posts.cached())
+                write()
+                with self.assertNumQueries(1):
+                    texts = [post.text for post in posts.only('text').cached()]
+                self.assertEqual(
+                    texts, list(posts.values_list('text', flat=True))
+                )
+
+    def test_joined_table_write_invalidates(self):
+        """Запись в таблицу соединения тоже сбрасывает результат."""
+        query = Post.objects.select_related('author').cached()
+        self.assertEqual(query.get().author.username, 'author')
+        self.author.username = 'renamed'
+        self.author.save()
+        self.assertEqual(
+            Post.objects.select_related('author').cached().get()
+            .author.username,
+            'renamed',
+        )
+
+    def test_other_table_write_keeps_cache(self):
+        """Запись в другую таблицу кеш не сбрасывает."""
+        reader = User.objects.create_user(username='reader')
+        list(Group.objects.cached())
+        Follow.objects.create(user=reader, author=self.author)
+        with self.assertNumQueries(0):
+            list(Group.objects.cached())
+
+    def test_local_cache_disables_query_cache(self):
+        """С кешем процесса cached() не кеширует: запись в другом
+        процессе не сбросила бы результат.
+        """
+        with mock.patch('core.querycache.is_shared', return_value=False):
+            list(Group.objects.cached())
+            with self.assertNumQueries(1):
+                list(Group.objects.cached())
+
+    def test_stats_report(self):
+        """Попадания и промахи считаются по моделям."""
+        for _ in range(3):
+            list(Group.objects.cached())
+        self.assertEqual(stats()['posts.Group'], (2, 1))
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(reverse('core:query_cache'))
+        self.assertEqual(response.json()['pid'], os.getpid())
+        self.assertEqual(
+            response.json()['models']['posts.Group'],
+            {'hits': 2, 'misses': 1},
+        )
+        self.assertEqual(stats()['posts.Group'], (0, 0))
+
+    def test_stats_are_staff_only(self):
+        """Отчёт о кеше запросов виден только сотрудникам."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('core:query_cache'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_deploy_check_warns_about_local_cache(self):
+        """check --deploy предупреждает о кеше запросов в LocMemCache."""
+        def ids():
+            return [
+                message.id
+                for message in run_checks(include_deployment_checks=True)
+            ]
+
+        self.assertIn('core.W001', ids())
+        with override_settings(QUERY_CACHE_TIMEOUT=0):
+            self.assertNotIn('core.W001', ids())
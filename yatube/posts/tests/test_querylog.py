@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import querylog
+from posts.models import Post, User
+
+
+class NormalizeTests(TestCase):
+    def test_literals_and_in_lists_are_normalized(self):
+        """Литералы и списки IN не влияют на отпечаток."""
+        first = "SELECT * FROM t WHERE a = 1 AND b = 'x' AND c IN (%s, %s)"
+        second = "SELECT * FROM t WHERE a = 25 AND b = 'y' AND c IN (%s)"
+        self.assertEqual(
+            querylog.normalize(first),
+            'SELECT * FROM t WHERE a = %s AND b = %s AND c IN (...)'
+        )
+        self.assertEqual(
+            querylog.fingerprint(first), querylog.fingerprint(second)
+        )
+
+    @override_settings(SLOW_QUERY_LOG_INTERVAL=60)
+    def test_rate_limiter_aggregates_suppressed(self):
+        """Повторы в пределах интервала копятся до следующей записи."""
+        limiter = querylog.RateLimiter()
+        self.assertEqual(limiter.add('q', 1.0, now=0), (1, 1.0))
+        self.assertIsNone(limiter.add('q', 2.0, now=10))
+        self.assertIsNone(limiter.add('q', 3.0, now=20))
+        self.assertEqual(limiter.add('q', 4.0, now=70), (3, 9.0))
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG_INTERVAL=60)
+class SlowQueryLogMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        patcher = mock.patch.object(
+            querylog, 'rate_limiter', querylog.RateLimiter()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_entries(self, url):
+        with self.assertLogs('yatube.slow_queries') as logs:
+            self.client.get(url)
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_entry_has_view_call_site_and_plan(self):
+        """Запись содержит view, место вызова, параметры и план."""
+        entries = self.get_entries(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        entry = next(
+            entry for entry in entries
+            if 'posts_post' in entry['sql'] and entry['params']
+        )
+        self.assertEqual(entry['view'], 'posts:post_detail')
+        self.assertTrue(entry['call_site'].startswith('posts/'))
+        self.assertIn(self.post.id, entry['params'])
+        self.assertTrue(entry['plan'])
+
+    def test_repeated_shape_is_rate_limited(self):
+        """Одинаковые по форме запросы логируются один раз за интервал."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.get_entries(url)
+        with mock.patch.object(querylog.logger, 'warning') as warning:
+            self.client.get(url)
+        warning.assert_not_called()
+
+    def test_report_ranks_by_total_time(self):
+        """Команда отчёта сортирует отпечатки по суммарному времени."""
+        entries = [
+            {'fingerprint': 'fast', 'normalized': 'SELECT 1',
+             'duration': 0.2, 'count': 5, 'total': 1.0, 'view': 'a',
+             'call_site': None, 'plan': None},
+            {'fingerprint': 'slow', 'normalized': 'SELECT 2',
+             'duration': 1.5, 'count': 2, 'total': 3.0, 'view': 'b',
+             'call_site': 'posts/views.py:1 in index', 'plan': None},
+        ]
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.log', delete=False
+        ) as log_file:
+            for entry in entries:
+                log_file.write(json.dumps(entry) + '\n')
+        self.addCleanup(os.remove, log_file.name)
+        out = StringIO()
+        call_command('slow_queries', file=log_file.name, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('1. slow total=3000.0ms'))
+        self.assertIn('2. fast total=1000.0ms', out.getvalue())
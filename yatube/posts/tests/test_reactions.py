@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.counters import CounterBuffer, reaction_counts
+from posts.models import Post, Reaction, User
+
+
+class CounterBufferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.other = Post.objects.create(text='Другой пост', author=cls.user)
+
+    def test_increments_are_coalesced(self):
+        """Приращения копятся и записываются одним UPDATE на строку."""
+        buffer = CounterBuffer(Post, 'reaction_count', 10, 60)
+        self.addCleanup(buffer.flush)
+        for _ in range(5):
+            buffer.add(self.post.id)
+        buffer.add(self.post.id, -2)
+        self.assertEqual(buffer.pending(self.post.id), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reaction_count, 0)
+        with self.assertNumQueries(3):
+            buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reaction_count, 3)
+        self.assertEqual(buffer.pending(self.post.id), 0)
+
+    def test_size_threshold_flushes(self):
+        """Буфер сбрасывается, когда набирается max_size строк."""
+        buffer = CounterBuffer(Post, 'reaction_count', 2, 60)
+        buffer.add(self.post.id)
+        self.assertIsNotNone(buffer.timer)
+        buffer.add(self.other.id)
+        self.assertIsNone(buffer.timer)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.reaction_count, 1)
+
+    def test_failed_flush_keeps_deltas(self):
+        """Если запись не удалась, приращения остаются в буфере."""
+        buffer = CounterBuffer(Post, 'reaction_count', 10, 60)
+        self.addCleanup(buffer.flush)
+        buffer.add(self.post.id, 2)
+        with mock.patch(
+            'django.db.models.query.QuerySet.update',
+            side_effect=OperationalError('database is locked'),
+        ):
+            with self.assertRaises(OperationalError):
+                buffer.flush()
+        self.assertEqual(buffer.pending(self.post.id), 2)
+        buffer.add(self.post.id)
+        buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reaction_count, 3)
+
+    def test_timer_flushes(self):
+        """По таймеру буфер сбрасывается сам."""
+        buffer = CounterBuffer(Post, 'reaction_count', 10, 60)
+        with mock.patch.object(buffer, 'flush') as flush, \
+                mock.patch('posts.counters.connections'):
+            buffer.add(self.post.id)
+            buffer.timer.cancel()
+            buffer.timer.function()
+        flush.assert_called_once()
+
+
+class ReactionViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        self.addCleanup(reaction_counts.flush)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_like_is_idempotent(self):
+        """Повторный лайк не создаёт реакцию и не меняет счётчик."""
+        url = reverse('posts:post_like', kwargs={'post_id': self.post.id})
+        self.authorized_client.post(url)
+        self.authorized_client.post(url)
+        reaction_counts.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(Reaction.objects.count(), 1)
+        self.assertEqual(self.post.reaction_count, 1)
+
+    def test_unlike(self):
+        """Снятие реакции уменьшает счётчик один раз."""
+        self.authorized_client.post(
+            reverse('posts:post_like', kwargs={'post_id': self.post.id})
+        )
+        url = reverse('posts:post_unlike', kwargs={'post_id': self.post.id})
+        self.authorized_client.post(url)
+        self.authorized_client.post(url)
+        reaction_counts.flush()
+        self.post.refresh_from_db()
+        self.assertFalse(Reaction.objects.exists())
+        self.assertEqual(self.post.reaction_count, 0)
+
+    def test_detail_includes_pending(self):
+        """Страница поста учитывает ещё не записанные реакции."""
+        self.authorized_client.post(
+            reverse('posts:post_like', kwargs={'post_id': self.post.id})
+        )
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertEqual(response.context['reaction_count'], 1)
+        self.assertTrue(response.context['liked'])
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.rendering import RENDER_VERSION, render
+
+
+@override_settings(POST_EXCERPT_LENGTH=20)
+class RenderingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_render_escapes_and_links(self):
+        """Разметка экранируется, теги и упоминания становятся ссылками."""
+        html, _ = render('<b>Привет</b>, @author.\n#Тег')
+        self.assertEqual(
+            html,
+            '&lt;b&gt;Привет&lt;/b&gt;, '
+            f'<a href="{reverse("posts:profile", args=["author"])}">'
+            '@author</a>.<br>'
+            f'<a href="{reverse("posts:tag_posts", args=["тег"])}">#Тег</a>'
+        )
+
+    def test_excerpt_is_bounded(self):
+        """Отрывок не длиннее заданного числа знаков."""
+        _, excerpt = render('слово ' * 100)
+        self.assertEqual(excerpt, 'слово ' * 3 + 'с…')
+
+    def test_save_renders_text(self):
+        """Сохранение поста обновляет HTML и отрывок."""
+        post = Post.objects.create(text='Первая\nверсия', author=self.author)
+        self.assertEqual(post.text_html, 'Первая<br>версия')
+        post.text = 'Вторая'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Вторая')
+        self.assertEqual(post.render_version, RENDER_VERSION)
+
+    def test_lists_do_not_load_full_text(self):
+        """Ленты выбирают отрывок и не выбирают полный текст."""
+        Post.objects.create(
+            text='Длинный текст ' * 50, author=self.author, group=self.group
+        )
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('"posts_post"."text"', sql)
+                self.assertNotIn('"posts_post"."text_html"', sql)
+                self.assertContains(response, 'Длинный текст Длинн…')
+
+    def test_rerender_command(self):
+        """Команда перерисовывает посты с устаревшей версией правил."""
+        post = Post.objects.create(text='#тег', author=self.author)
+        Post.objects.filter(pk=post.pk).update(
+            text_html='', excerpt_html='', render_version=0
+        )
+        call_command('rerender_posts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertIn('/tags/', post.text_html)
+        self.assertEqual(post.render_version, RENDER_VERSION)
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.sessions import SessionStore
+from posts.models import User
+
+
+class CachedSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Кеш сессий включается только с общим кешем.
+        patcher = mock.patch('core.sessions.is_shared', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(
+            username='author', password='old-password'
+        )
+        self.client = Client()
+        self.client.login(username='author', password='old-password')
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in queries.captured_queries
+            if '"django_session"' in query['sql']
+            or 'FROM "auth_user"' in query['sql']
+        ]
+
+    def test_user_and_session_come_from_cache(self):
+        """Повторный запрос не читает сессию и пользователя из БД."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        response, queries = self.auth_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_user_save_invalidates_snapshot(self):
+        """Сохранение пользователя сбрасывает снимок."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        response, queries = self.auth_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_change_logs_out(self):
+        """После смены пароля старая сессия больше не действует."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_deactivated_user_is_logged_out(self):
+        """Заблокированный пользователь не входит по снимку."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        snapshot = cache.get(f'auth:user:{self.user.pk}')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        snapshot['fields']['is_active'] = False
+        cache.set(f'auth:user:{self.user.pk}', snapshot)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_logout_drops_snapshot(self):
+        """Выход удаляет снимок пользователя."""
+        self.client.get(reverse('posts:follow_index'))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(f'auth:user:{self.user.pk}'))
+
+    def test_unchanged_session_is_not_written(self):
+        """Сессия без изменений не пишется в БД."""
+        session = SessionStore()
+        session['key'] = 'value'
+        session.save()
+        session = SessionStore(session.session_key)
+        session['key'] = 'value'
+        with self.assertNumQueries(0):
+            session.save()
+        session['key'] = 'other'
+        session.save()
+        self.assertEqual(
+            Session.objects.get(
+                session_key=session.session_key
+            ).get_decoded()['key'],
+            'other',
+        )
+
+
+class LocalCacheSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='author', password='password')
+        self.client = Client()
+        self.client.login(username='author', password='password')
+
+    def test_logout_in_other_process_is_seen(self):
+        """С кешем процесса сессия читается из БД: выход в другом
+        процессе виден сразу.
+        """
+        url = reverse('posts:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Другой процесс удалил сессию из БД и из своего кеша.
+        Session.objects.all().delete()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_deploy_check_warns_about_local_cache(self):
+        """check --deploy предупреждает о сессиях с LocMemCache."""
+        self.assertIn('core.W002', [
+            message.id
+            for message in run_checks(include_deployment_checks=True)
+        ])
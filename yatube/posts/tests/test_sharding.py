@@ -0,0 +1,218 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import (
+    ArchivedPost, AuthorShard, Comment, Group, Post, PostViewCount, Reaction,
+    User
+)
+from posts.sharding import _key, move_author, purge_author
+
+
+@override_settings(
+    POST_SHARDS=['default', 'posts_2'], NUMBER_OF_POSTS_PER_PAGE=3
+)
+class ShardingTests(TestCase):
+    databases = {'default', 'posts_2'}
+
+    def setUp(self):
+        cache.clear()
+        self.local = User.objects.create_user(username='local')
+        self.remote = User.objects.create_user(username='remote')
+        AuthorShard.objects.create(author=self.local, alias='default')
+        AuthorShard.objects.create(author=self.remote, alias='posts_2')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        now = timezone.now()
+        for i in range(3):
+            for author in (self.local, self.remote):
+                post = Post.objects.create(
+                    text=f'{author.username} {i}',
+                    author=author,
+                    group=self.group,
+                )
+                Post.objects.using(post._state.db).filter(
+                    pk=post.pk
+                ).update(pub_date=now - timedelta(hours=10 - i))
+        self.remote_post = Post.objects.using('posts_2').order_by(
+            '-pub_date'
+        ).first()
+        self.client = Client()
+        self.client.force_login(self.local)
+
+    def texts(self, url):
+        texts = []
+        page = 1
+        while True:
+            response = self.client.get(url, {'page': page})
+            page_obj = response.context['page_obj']
+            texts += [post.text for post in page_obj]
+            if not page_obj.has_next():
+                return texts
+            page += 1
+
+    def test_posts_are_stored_in_author_shard(self):
+        """Посты лежат в шарде автора, id уникальны во всех шардах."""
+        self.assertEqual(
+            Post.objects.using('default').filter(author=self.remote).count(),
+            0,
+        )
+        self.assertEqual(
+            Post.objects.using('posts_2').filter(author=self.remote).count(),
+            3,
+        )
+        ids = [
+            *Post.objects.using('default').values_list('pk', flat=True),
+            *Post.objects.using('posts_2').values_list('pk', flat=True),
+        ]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_new_author_is_pinned_to_shard(self):
+        """Первый пост закрепляет нового автора за шардом."""
+        author = User.objects.create_user(username='newcomer')
+        post = Post.objects.create(text='Первый пост', author=author)
+        alias = AuthorShard.objects.get(author=author).alias
+        self.assertEqual(alias, ['default', 'posts_2'][author.pk % 2])
+        self.assertEqual(post._state.db, alias)
+
+    def test_index_and_group_merge_shards(self):
+        """Лента и группа сливают шарды по убыванию даты."""
+        expected = [
+            f'{author} {i}' for i in (2, 1, 0) for author in (
+                'local', 'remote'
+            )
+        ]
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        ):
+            with self.subTest(url=url):
+                self.assertCountEqual(self.texts(url), expected)
+                page_obj = self.client.get(url).context['page_obj']
+                dates = [post.pub_date for post in page_obj]
+                self.assertEqual(dates, sorted(dates, reverse=True))
+                self.assertEqual(page_obj.paginator.count, 6)
+
+    def test_follow_index_merges_shards(self):
+        """Лента подписок собирает посты авторов из их шардов."""
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.remote.username])
+        )
+        self.assertEqual(
+            self.texts(reverse('posts:follow_index')),
+            ['remote 2', 'remote 1', 'remote 0'],
+        )
+
+    def test_profile_and_detail_read_one_shard(self):
+        """Профиль и пост читают только шард автора."""
+        for url in (
+            reverse('posts:profile', args=[self.remote.username]),
+            reverse('posts:post_detail', args=[self.remote_post.pk]),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connections['default']) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(any(
+                    '"posts_post"' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_comments_live_with_post(self):
+        """Комментарий пишется в шард поста и виден на его странице."""
+        self.client.post(
+            reverse('posts:add_comment', args=[self.remote_post.pk]),
+            {'text': 'Комментарий'},
+        )
+        comment = Comment.objects.using('posts_2').get()
+        self.assertEqual(comment.author, self.local)
+        self.assertFalse(Comment.objects.using('default').exists())
+        self.remote_post.refresh_from_db()
+        self.assertEqual(self.remote_post.comment_count, 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.remote_post.pk])
+        )
+        self.assertEqual(response.context['comments'], [comment])
+
+    def test_move_author(self):
+        """Команда переносит посты, архив и комментарии автора."""
+        Comment.objects.create(
+            post=self.remote_post, author=self.local, text='Комментарий'
+        )
+        call_command(
+            'archive_posts', days=0, batch_size=2, stdout=StringIO()
+        )
+        Post.objects.create(text='remote 3', author=self.remote)
+        call_command(
+            'move_author', 'remote', 'default', batch_size=2,
+            purge_delay=0, stdout=StringIO(),
+        )
+        self.assertEqual(
+            AuthorShard.objects.get(author=self.remote).alias, 'default'
+        )
+        for model in (Post, ArchivedPost, Comment):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.using('posts_2').exists())
+        self.assertEqual(
+            ArchivedPost.objects.using('default').filter(
+                author=self.remote
+            ).count(),
+            3,
+        )
+        comment = Comment.objects.using('default').get()
+        self.assertEqual(comment.post_id, self.remote_post.pk)
+        self.assertEqual(
+            self.texts(reverse('posts:profile', args=['remote'])),
+            ['remote 3', 'remote 2', 'remote 1', 'remote 0'],
+        )
+        new_post = Post.objects.create(text='remote 4', author=self.remote)
+        self.assertEqual(new_post._state.db, 'default')
+
+    def test_purge_waits_and_copies_stragglers(self):
+        """Копии в старом шарде удаляются отдельно, после докопирования
+        того, что туда записали процессы со старой картой.
+        """
+        Reaction.objects.create(user=self.local, post=self.remote_post)
+        PostViewCount.objects.create(post=self.remote_post, count=5)
+        move_author(self.remote.pk, 'default', batch_size=2)
+        self.assertEqual(
+            Post.objects.using('posts_2').filter(author=self.remote).count(),
+            3,
+        )
+        with self.assertRaises(ValueError):
+            purge_author(self.remote.pk, 'default')
+        # Процесс со старой картой пишет пост и комментарий в старый шард.
+        cache.set(_key(self.remote.pk), 'posts_2')
+        Post.objects.create(text='remote 3', author=self.remote)
+        Comment.objects.create(
+            post=self.remote_post, author=self.local, text='Поздний'
+        )
+        cache.clear()
+        self.assertEqual(purge_author(self.remote.pk, 'posts_2', 2), 1)
+        for model in (Post, ArchivedPost, Comment):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.using('posts_2').exists())
+        self.assertEqual(
+            Post.objects.using('default').filter(author=self.remote).count(),
+            4,
+        )
+        comment = Comment.objects.using('default').get(text='Поздний')
+        self.assertEqual(comment.post_id, self.remote_post.pk)
+        copy = Post.objects.using('default').get(pk=self.remote_post.pk)
+        self.assertEqual(copy.pub_date, self.remote_post.pub_date)
+        self.assertTrue(
+            Reaction.objects.filter(post_id=self.remote_post.pk).exists()
+        )
+        self.assertTrue(
+            PostViewCount.objects.filter(post_id=self.remote_post.pk).exists()
+        )
@@ -0,0 +1,59 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from core import stampede
+
+
+class StampedeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def test_value_is_computed_once(self):
+        """Значение считается один раз и дальше берётся из кеша."""
+        for _ in range(3):
+            value = stampede.fill('key', self.compute, 60)
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_other_worker_computes(self):
+        """Пока другой воркер пересчитывает, отдаётся старое значение."""
+        cache.set('key', ('old', 0.1, time.time() - 1))
+        cache.add('key:fill-lock', 1)
+        self.assertEqual(stampede.fill('key', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+    @override_settings(STAMPEDE_WAIT=0.05)
+    def test_missing_value_waits_then_computes(self):
+        """Без старого значения воркер ждёт недолго и считает сам."""
+        cache.add('key:fill-lock', 1)
+        self.assertEqual(stampede.fill('key', self.compute, 60), 'value 1')
+
+    def test_early_recompute_depends_on_random_draw(self):
+        """Долгий пересчёт начинается раньше срока с вероятностью."""
+        cache.set('key', ('old', 10.0, time.time() + 5))
+        with mock.patch('core.stampede.random.random', return_value=0.0):
+            self.assertEqual(stampede.fill('key', self.compute, 60), 'old')
+        with mock.patch('core.stampede.random.random', return_value=0.9):
+            self.assertEqual(
+                stampede.fill('key', self.compute, 60), 'value 1'
+            )
+
+    def test_template_tag_replaces_cache(self):
+        """{% cache %} из stampede кеширует фрагмент."""
+        template = Template(
+            '{% load stampede %}'
+            '{% cache 20 fragment name %}{{ value }}{% endcache %}'
+        )
+        first = template.render(Context({'name': 'a', 'value': 1}))
+        second = template.render(Context({'name': 'a', 'value': 2}))
+        other = template.render(Context({'name': 'b', 'value': 3}))
+        self.assertEqual((first, second, other), ('1', '1', '3'))
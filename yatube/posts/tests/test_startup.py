@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase
+from django.urls import get_resolver
+
+from core import startup
+
+
+class StartupTests(SimpleTestCase):
+    def test_preload_urls(self):
+        """Таблицы URL вложенных пространств имён строятся заранее."""
+        startup.preload_urls()
+        resolver = get_resolver(settings.ROOT_URLCONF)
+        self.assertTrue(resolver._populated)
+        _, posts = resolver.namespace_dict['posts']
+        self.assertTrue(posts._populated)
+
+    def test_preload_templates(self):
+        """Шаблоны проекта компилируются в кеширующий загрузчик."""
+        engine = engines['django'].engine
+        if engine.debug:
+            self.skipTest('Кеширующий загрузчик выключен в DEBUG.')
+        startup.preload_templates()
+        loader = engine.template_loaders[0]
+        self.assertTrue(any(
+            'posts/index.html' in key for key in loader.get_template_cache
+        ))
+
+    def test_warm_after_start_runs_once_per_process(self):
+        """Прогрев запускается при первом запросе процесса один раз."""
+        application = mock.Mock(return_value=[b''])
+        get_urls = mock.Mock()
+        wrapped = startup.warm_after_start(application, get_urls)
+        with mock.patch('core.startup.warmup.start') as start:
+            wrapped({}, None)
+            wrapped({}, None)
+            with mock.patch('core.startup.os.getpid', return_value=-1):
+                wrapped({}, None)
+        self.assertEqual(start.call_args_list, [
+            mock.call(get_urls), mock.call(get_urls)
+        ])
+        self.assertEqual(application.call_count, 3)
@@ -0,0 +1,99 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import (
+    Follow, FollowSuggestion, Group, Post, StaleSuggestions, User
+)
+
+
+class SuggestionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'star', 'rising', 'writer')
+        }
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for name in ('reader', 'writer'):
+            Post.objects.create(
+                text='Пост', author=cls.users[name], group=group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.users['reader'])
+
+    def follow(self, user, author):
+        Follow.objects.create(user=self.users[user], author=self.users[author])
+
+    def suggested(self, name):
+        return [
+            suggestion.author.username
+            for suggestion in suggestions.for_user(self.users[name])
+        ]
+
+    def test_friends_of_friends_and_group_authors(self):
+        """Рекомендуются авторы друзей и активные авторы общих групп."""
+        self.follow('reader', 'friend')
+        self.follow('friend', 'star')
+        self.follow('friend', 'reader')
+        call_command('suggest_follows', full=True, stdout=StringIO())
+        self.assertEqual(self.suggested('reader'), ['star', 'writer'])
+
+    def test_followed_authors_are_not_suggested(self):
+        """Уже отслеживаемые авторы не рекомендуются."""
+        self.follow('reader', 'friend')
+        self.follow('friend', 'star')
+        self.follow('reader', 'star')
+        suggestions.refresh([self.users['reader'].pk])
+        self.assertNotIn('star', self.suggested('reader'))
+
+    def test_follow_marks_user_and_followers_stale(self):
+        """Подписка помечает к пересчёту пользователя и его подписчиков."""
+        self.follow('friend', 'reader')
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'rising'})
+        )
+        stale = set(
+            StaleSuggestions.objects.values_list('user__username', flat=True)
+        )
+        self.assertEqual(stale, {'reader', 'friend'})
+        self.assertEqual(suggestions.refresh(), 2)
+        self.assertFalse(StaleSuggestions.objects.exists())
+        self.assertEqual(self.suggested('friend'), ['rising'])
+
+    def test_incremental_refresh_skips_fresh_users(self):
+        """Обычный запуск не трогает рекомендации непомеченных."""
+        FollowSuggestion.objects.create(
+            user=self.users['star'], author=self.users['writer'], score=1
+        )
+        call_command('suggest_follows', stdout=StringIO())
+        self.assertEqual(self.suggested('star'), ['writer'])
+
+    def test_pages_show_suggestions(self):
+        """Подписки и профиль показывают рекомендации зрителю."""
+        FollowSuggestion.objects.create(
+            user=self.users['reader'], author=self.users['star'], score=1
+        )
+        urls = (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'writer'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(
+                    [s.author for s in response.context['suggestions']],
+                    [self.users['star']],
+                )
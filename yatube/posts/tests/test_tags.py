@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Mention, Post, PostTag, User
+from posts.tags import find_mentions, find_tags
+
+
+class ExtractTests(TestCase):
+    def test_find_tags(self):
+        """Теги приводятся к нижнему регистру, якоря и ## не считаются."""
+        self.assertEqual(
+            find_tags('#Django и #джанго, не тег: a#b ##x &#39;'),
+            {'django', 'джанго'},
+        )
+
+    def test_find_mentions(self):
+        """Упоминание не захватывает точку в конце предложения."""
+        self.assertEqual(
+            find_mentions('Привет, @leo и @anna.k. Почта a@b.ru'),
+            {'leo', 'anna.k'},
+        )
+
+
+@override_settings(NUMBER_OF_POSTS_PER_PAGE=2)
+class TagPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def create(self, text):
+        self.author_client.post(reverse('posts:post_create'), {'text': text})
+        return Post.objects.latest('pk')
+
+    def collect(self, client, url):
+        texts, after = [], None
+        while True:
+            response = client.get(url, {'after': after} if after else {})
+            texts += [post.text for post in response.context['posts']]
+            after = response.context['next_cursor']
+            if after is None:
+                return texts
+
+    def test_form_save_indexes_post(self):
+        """Сохранение через форму заполняет теги и упоминания."""
+        post = self.create('#Новость для @reader и @nobody')
+        self.assertEqual(
+            list(post.post_tags.values_list('tag__name', flat=True)),
+            ['новость'],
+        )
+        self.assertEqual(
+            list(post.mentions.values_list('user__username', flat=True)),
+            ['reader'],
+        )
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': 'Без тегов'},
+        )
+        self.assertFalse(PostTag.objects.filter(post=post).exists())
+        self.assertFalse(Mention.objects.filter(post=post).exists())
+
+    def test_tag_page_is_keyset_paginated(self):
+        """Страница тега листается курсором, новые записи первыми."""
+        for i in range(5):
+            self.create(f'Запись {i} #Тест')
+        self.create('Другая #тема')
+        texts = self.collect(
+            self.client, reverse('posts:tag_posts', kwargs={'tag': 'ТЕСТ'})
+        )
+        self.assertEqual(
+            texts, [f'Запись {i} #Тест' for i in range(4, -1, -1)]
+        )
+
+    def test_mentions_feed(self):
+        """Лента упоминаний показывает только записи с зрителем."""
+        self.create('Привет, @reader!')
+        self.create('Привет всем')
+        self.create('@reader, как дела?')
+        texts = self.collect(self.reader_client, reverse('posts:mentions'))
+        self.assertEqual(texts, ['@reader, как дела?', 'Привет, @reader!'])
+
+    def test_unknown_tag_and_bad_cursor_return_404(self):
+        """Неизвестный тег и неверный курсор дают 404."""
+        self.create('#есть')
+        responses = (
+            self.client.get(reverse('posts:tag_posts', kwargs={'tag': 'нет'})),
+            self.client.get(
+                reverse('posts:tag_posts', kwargs={'tag': 'есть'}),
+                {'after': 'x'},
+            ),
+        )
+        for response in responses:
+            self.assertEqual(response.status_code, 404)
+
+    def test_backfill_command(self):
+        """Команда разбирает посты, созданные в обход формы."""
+        for i in range(3):
+            Post.objects.create(
+                text=f'#старое {i} @reader', author=self.author
+            )
+        call_command('index_tags', batch_size=2, stdout=StringIO())
+        self.assertEqual(PostTag.objects.count(), 3)
+        self.assertEqual(Mention.objects.filter(user=self.reader).count(), 3)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Follow, Group, Post, TrendingBucket, User
+
+
+@override_settings(TRENDING_TOP=2, TRENDING_REBUILD_INTERVAL=300)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.now = trending.bucket_start(timezone.now())
+
+    def test_events_are_recorded(self):
+        """Посты, комментарии и подписки попадают в интервалы."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Ещё один'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        counts = dict(
+            TrendingBucket.objects.values_list('kind', 'count')
+        )
+        self.assertEqual(counts, {
+            TrendingBucket.GROUP: 1,
+            TrendingBucket.POST: 2,
+            TrendingBucket.AUTHOR: 1,
+        })
+
+    def test_recent_events_outrank_old_ones(self):
+        """Свежие события весят больше старых того же числа."""
+        old = self.now - timedelta(hours=2)
+        for _ in range(3):
+            trending.record(TrendingBucket.POST, 1, now=old)
+            trending.record(TrendingBucket.POST, 2, now=self.now)
+        trending.record(TrendingBucket.POST, 3, now=self.now)
+        self.assertEqual(
+            trending.top(TrendingBucket.POST, '24h', now=self.now), [2, 1]
+        )
+        self.assertEqual(
+            trending.top(TrendingBucket.POST, '1h', now=self.now), [2, 3]
+        )
+
+    def test_record_updates_built_ranking(self):
+        """Событие после построения списка сразу меняет порядок."""
+        trending.record(TrendingBucket.POST, 1, now=self.now)
+        trending.record(TrendingBucket.POST, 2, now=self.now)
+        trending.top(TrendingBucket.POST, '24h', now=self.now)
+        later = self.now + timedelta(minutes=1)
+        with self.assertNumQueries(2):
+            trending.record(TrendingBucket.POST, 2, now=later)
+        with self.assertNumQueries(0):
+            ranked = trending.top(TrendingBucket.POST, '24h', now=later)
+        self.assertEqual(ranked[0], 2)
+
+    def test_stale_buckets_are_purged(self):
+        """Интервалы старше недели удаляются при перестроении."""
+        trending.record(
+            TrendingBucket.POST, 1, now=self.now - timedelta(days=8)
+        )
+        trending.record(TrendingBucket.POST, 2, now=self.now)
+        self.assertEqual(
+            trending.top(TrendingBucket.POST, '7d', now=self.now), [2]
+        )
+        self.assertFalse(
+            TrendingBucket.objects.filter(
+                kind=TrendingBucket.POST, key=1
+            ).exists()
+        )
+
+    def test_page_shows_ranked_objects(self):
+        """Страница показывает популярные посты, группы и авторов."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'], [self.post])
+        self.assertEqual(response.context['groups'], [self.group])
+        self.assertEqual(response.context['authors'], [self.author])
+
+    def test_unknown_window_returns_404(self):
+        """Неизвестное окно даёт 404."""
+        response = self.client.get(
+            reverse('posts:trending'), {'window': '1y'}
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import viewcounts
+from posts.models import Post, PostViewCount, User
+
+
+class ViewCountsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.other = Post.objects.create(text='Другой пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(viewcounts.buffered_views.flush)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def view(self, client, post):
+        client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+
+    def test_views_are_buffered_and_flushed(self):
+        """Просмотры попадают в таблицу только при сбросе буфера."""
+        self.view(self.client, self.post)
+        self.view(self.authorized_client, self.post)
+        self.view(self.authorized_client, self.other)
+        self.assertFalse(PostViewCount.objects.exists())
+        viewcounts.buffered_views.flush()
+        self.assertEqual(
+            viewcounts.view_counts([self.post.id, self.other.id]),
+            {self.post.id: 2, self.other.id: 1},
+        )
+        self.view(Client(REMOTE_ADDR='10.0.0.1'), self.post)
+        viewcounts.buffered_views.flush()
+        self.assertEqual(
+            PostViewCount.objects.get(post=self.post).count, 3
+        )
+
+    def test_views_survive_cache_eviction(self):
+        """Несброшенные просмотры не зависят от кеша."""
+        self.view(self.client, self.post)
+        cache.clear()
+        viewcounts.buffered_views.flush()
+        self.assertEqual(PostViewCount.objects.get(post=self.post).count, 1)
+
+    def test_repeat_views_are_deduplicated(self):
+        """Повторный просмотр того же посетителя не считается."""
+        for _ in range(3):
+            self.view(self.authorized_client, self.post)
+        viewcounts.buffered_views.flush()
+        self.assertEqual(PostViewCount.objects.get(post=self.post).count, 1)
+
+    def test_list_counts_in_one_query(self):
+        """Просмотры постов страницы выбираются одним запросом."""
+        PostViewCount.objects.create(post=self.post, count=5)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user})
+        )
+        views = {
+            post.id: post.views for post in response.context['page_obj']
+        }
+        self.assertEqual(views, {self.post.id: 5, self.other.id: 0})
+        self.assertEqual(viewcounts.most_viewed(1), [self.post.id])
@@ -0,0 +1,89 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.warmup import start, warm
+from posts.groupstats import rebuild
+from posts.models import Group, Post, PostViewCount, User
+from posts.warmup import urls
+
+
+@mock.patch('core.pagecache.is_shared', lambda: True)
+@override_settings(PAGE_CACHE_ENABLED=True, NUMBER_OF_POSTS_PER_PAGE=2)
+class WarmupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(3)
+        ]
+        PostViewCount.objects.create(post=cls.posts[0], count=5)
+        # Пост удалён, а счётчик просмотров ещё не сброшен.
+        PostViewCount.objects.create(post_id=999, count=10)
+        rebuild()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_urls(self):
+        """Прогреваются страницы ленты, группы, профили и посты."""
+        self.assertEqual(urls(5, 10, 10, 10), [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.posts[0].pk]),
+        ])
+
+    def test_warm_fills_page_cache(self):
+        """Прогретая страница отдаётся из кеша, просмотр не учитывается."""
+        pages = urls(1, 1, 1, 1)
+        result = warm(pages, concurrency=1, budget=10)
+        self.assertEqual((result.warmed, result.failed), (len(pages), 0))
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        self.assertIsNone(
+            cache.get(f'views:seen:ip:127.0.0.1:{self.posts[0].pk}')
+        )
+
+    def test_budget(self):
+        """После бюджета времени новые страницы не рисуются."""
+        pages = urls(5, 10, 10, 10)
+        result = warm(pages, concurrency=1, budget=0)
+        self.assertEqual(result.warmed, 0)
+        self.assertEqual(result.skipped, len(pages))
+
+    def test_command_reports_progress(self):
+        """Команда печатает каждую страницу и итог."""
+        out = StringIO()
+        call_command(
+            'warm_cache', '--index-pages=1', '--groups=0', '--profiles=0',
+            '--posts=0', '--concurrency=1', stdout=out,
+        )
+        self.assertIn('[1/1] / 200', out.getvalue())
+        self.assertIn('Прогрето страниц: 1, ошибок: 0', out.getvalue())
+
+    @mock.patch('core.warmup.threading.Thread')
+    def test_start_warms_in_one_worker(self, thread):
+        """После старта прогревает один воркер и только общий кеш."""
+        with mock.patch('core.warmup.is_shared', return_value=False):
+            self.assertIsNone(start(urls))
+        with mock.patch('core.warmup.is_shared', return_value=True):
+            self.assertIsNotNone(start(urls))
+            # Второй воркер видит метку первого.
+            self.assertIsNone(start(urls))
+        thread.return_value.start.assert_called_once_with()
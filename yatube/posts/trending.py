@@ -0,0 +1,140 @@
+"""Популярное за последний час, сутки и неделю.
+
+События (новый пост в группе, комментарий к посту, подписка на автора)
+копятся в ``TrendingBucket`` по десятиминутным интервалам. Рейтинг
+объекта в окне — сумма событий по интервалам окна с экспоненциальным
+затуханием: вес интервала вдвое меньше на каждую четверть окна давности.
+
+Для каждого счётчика и окна в кеше лежит список кандидатов с их
+рейтингами. Рейтинги хранятся относительно момента построения списка
+(forward decay): событие после построения добавляет вес
+``2 ** ((сейчас - построен) / полураспад)``, и порядок старых
+кандидатов от времени не меняется. Поэтому запись обновляет в списке
+только свой объект, а целиком список перестраивается раз в
+``TRENDING_REBUILD_INTERVAL`` секунд, чтобы выбросить вышедшие из окна
+интервалы.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TrendingBucket
+
+BUCKET = timedelta(minutes=10)
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+}
+LONGEST_WINDOW = max(WINDOWS.values())
+DEFAULT_WINDOW = '24h'
+CANDIDATES_FACTOR = 4
+
+
+def bucket_start(moment):
+    epoch = moment.replace(minute=0, second=0, microsecond=0)
+    return epoch + (moment - epoch) // BUCKET * BUCKET
+
+
+def half_life(window):
+    return WINDOWS[window] / 4
+
+
+def weight(moment, reference, window):
+    return 2 ** ((moment - reference) / half_life(window))
+
+
+def cache_key(kind, window):
+    return f'trending:{kind}:{window}'
+
+
+def record(kind, key, now=None):
+    """Учитывает событие и обновляет рейтинг объекта в кешах окон."""
+    now = now or timezone.now()
+    bucket = bucket_start(now)
+    updated = TrendingBucket.objects.filter(
+        kind=kind, key=key, bucket=bucket
+    ).update(count=F('count') + 1)
+    if not updated:
+        try:
+            with transaction.atomic():
+                TrendingBucket.objects.create(
+                    kind=kind, key=key, bucket=bucket, count=1
+                )
+        except IntegrityError:
+            TrendingBucket.objects.filter(
+                kind=kind, key=key, bucket=bucket
+            ).update(count=F('count') + 1)
+    rankings = cache.get_many(
+        [cache_key(kind, window) for window in WINDOWS]
+    )
+    if not rankings:
+        return
+    buckets = list(TrendingBucket.objects.filter(
+        kind=kind, key=key, bucket__gte=bucket_start(now - LONGEST_WINDOW)
+    ).values_list('bucket', 'count'))
+    for window in WINDOWS:
+        ranking = rankings.get(cache_key(kind, window))
+        if ranking is not None:
+            _update_candidate(kind, key, window, ranking, buckets, now)
+
+
+def _update_candidate(kind, key, window, ranking, buckets, now):
+    start = bucket_start(now - WINDOWS[window])
+    scores = ranking['scores']
+    scores[key] = sum(
+        count * weight(bucket, ranking['built_at'], window)
+        for bucket, count in buckets
+        if bucket >= start
+    )
+    limit = settings.TRENDING_TOP * CANDIDATES_FACTOR
+    if len(scores) > limit:
+        for weakest in sorted(scores, key=scores.get)[:len(scores) - limit]:
+            del scores[weakest]
+    cache.set(cache_key(kind, window), ranking, None)
+
+
+def rebuild(kind, window, now=None):
+    """Пересчитывает список кандидатов окна по интервалам из БД."""
+    now = now or timezone.now()
+    if WINDOWS[window] == LONGEST_WINDOW:
+        purge(kind, now)
+    buckets = TrendingBucket.objects.filter(
+        kind=kind, bucket__gte=bucket_start(now - WINDOWS[window])
+    ).values_list('key', 'bucket', 'count')
+    scores = {}
+    for key, bucket, count in buckets.iterator():
+        scores[key] = scores.get(key, 0) + count * weight(bucket, now, window)
+    limit = settings.TRENDING_TOP * CANDIDATES_FACTOR
+    top = sorted(scores, key=scores.get, reverse=True)[:limit]
+    ranking = {
+        'built_at': now,
+        'scores': {key: scores[key] for key in top},
+    }
+    cache.set(cache_key(kind, window), ranking, None)
+    return ranking
+
+
+def top(kind, window, now=None):
+    """Id самых популярных объектов в окне, по убыванию рейтинга."""
+    now = now or timezone.now()
+    ranking = cache.get(cache_key(kind, window))
+    rebuild_after = timedelta(seconds=settings.TRENDING_REBUILD_INTERVAL)
+    if ranking is None or now - ranking['built_at'] >= rebuild_after:
+        ranking = rebuild(kind, window, now)
+    scores = ranking['scores']
+    return sorted(scores, key=scores.get, reverse=True)[
+        :settings.TRENDING_TOP
+    ]
+
+
+def purge(kind, now=None):
+    """Удаляет интервалы, вышедшие из самого длинного окна."""
+    now = now or timezone.now()
+    return TrendingBucket.objects.filter(
+        kind=kind, bucket__lt=bucket_start(now - LONGEST_WINDOW)
+    ).delete()[0]
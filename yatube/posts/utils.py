@@ -1,10 +1,80 @@
+import re
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.http import Http404
+
+from . import sharding
+from .models import ArchivedPost, Comment, Post
+
+COMMENT_CURSOR = re.compile(r'\d+(\.\d+)*')
+POST_CURSOR = re.compile(r'\d+')
+# Лентам хватает отрывка: полный текст и его HTML не загружаем.
+LIST_DEFERRED = ('text', 'text_html')
 
 
-def paginations(request, post_list):
+def paginations(request, post_list, count=None):
     paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_PER_PAGE)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
     return page_obj
+
+
+def posts_page(index, cursor=None):
+    """Посты по строкам индексной таблицы после курсора.
+
+    ``index`` — выборка строк со ссылкой на пост (``PostTag``,
+    ``Mention``), отфильтрованная по ключу. Посты идут по убыванию id,
+    курсор — id последнего показанного: порция — один диапазон по
+    индексу таблицы, сами посты добираются вторым запросом по ключу.
+    """
+    if cursor:
+        if not POST_CURSOR.fullmatch(cursor):
+            raise Http404('Неверный курсор.')
+        index = index.filter(post_id__lt=int(cursor))
+    post_ids = list(
+        index.order_by('-post_id').values_list('post_id', flat=True)[
+            :settings.NUMBER_OF_POSTS_PER_PAGE + 1
+        ]
+    )
+    next_cursor = None
+    if len(post_ids) > settings.NUMBER_OF_POSTS_PER_PAGE:
+        post_ids.pop()
+        next_cursor = post_ids[-1]
+    posts = sharding.in_bulk(
+        Post.objects.defer(*LIST_DEFERRED), post_ids, 'author', 'group'
+    )
+    archived_ids = [pk for pk in post_ids if pk not in posts]
+    if archived_ids:
+        posts.update(sharding.in_bulk(
+            ArchivedPost.objects.defer(*LIST_DEFERRED), archived_ids,
+            'author', 'group',
+        ))
+    return [posts[pk] for pk in post_ids if pk in posts], next_cursor
+
+
+def comments_page(post, cursor=None):
+    """Порция ветки комментариев поста после курсора и курсор следующей.
+
+    Комментарии идут по возрастанию пути, то есть в порядке обхода ветки
+    в глубину. Курсор — путь последнего показанного комментария, поэтому
+    каждая порция — один диапазон по индексу (post, path), а ответы
+    выводятся сразу под своими комментариями без рекурсии.
+    """
+    comments = sharding.related(
+        Comment.objects.using(post._state.db).filter(post_id=post.id),
+        'author',
+    ).order_by('path').cached()
+    if cursor:
+        if not COMMENT_CURSOR.fullmatch(cursor):
+            raise Http404('Неверный курсор комментариев.')
+        comments = comments.filter(path__gt=cursor)
+    page = list(comments[:settings.COMMENTS_PER_PAGE + 1])
+    next_cursor = None
+    if len(page) > settings.COMMENTS_PER_PAGE:
+        page.pop()
+        next_cursor = page[-1].path
+    return page, next_cursor
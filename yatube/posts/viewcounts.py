@@ -0,0 +1,96 @@
+"""Счётчики просмотров постов.
+
+Просмотры копятся в памяти процесса (``CounterBuffer``) и попадают в
+таблицу ``PostViewCount`` пачкой, одной транзакцией раз в
+``VIEW_COUNT_FLUSH_INTERVAL`` секунд — из потока таймера, а не в
+запросе. Повторный просмотр того же поста тем же посетителем в течение
+``VIEW_COUNT_DEDUP_WINDOW`` не считается; отметки о просмотрах лежат в
+кеше, и с ``LocMemCache`` у каждого воркера свои.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from core.warmup import is_warmup
+
+from . import counters, sharding
+from .models import ArchivedPost, Post, PostViewCount
+
+
+def _viewer(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    return f'ip:{request.META.get("REMOTE_ADDR")}'
+
+
+def record_view(request, post_id):
+    """Учитывает просмотр поста, если посетитель не видел его недавно."""
+    if is_warmup(request):
+        return
+    seen_key = f'views:seen:{_viewer(request)}:{post_id}'
+    if cache.add(seen_key, 1, settings.VIEW_COUNT_DEDUP_WINDOW):
+        buffered_views.add(post_id)
+
+
+def _write(alias, post_ids, deltas):
+    # Удалённые посты отбрасываются: у счётчика нет внешнего ключа.
+    found = set()
+    for shard, ids in sharding.locate(post_ids).items():
+        for model in (Post, ArchivedPost):
+            found.update(
+                model.objects.using(shard).filter(pk__in=ids).values_list(
+                    'pk', flat=True
+                )
+            )
+    existing = set(
+        PostViewCount.objects.filter(
+            post_id__in=found
+        ).values_list('post_id', flat=True)
+    )
+    for post_id in existing:
+        PostViewCount.objects.filter(post_id=post_id).update(
+            count=F('count') + deltas[post_id]
+        )
+    PostViewCount.objects.bulk_create(
+        PostViewCount(post_id=post_id, count=deltas[post_id])
+        for post_id in found - existing
+    )
+
+
+buffered_views = counters.CounterBuffer(
+    PostViewCount,
+    'count',
+    max_size=None,
+    interval=settings.VIEW_COUNT_FLUSH_INTERVAL,
+    write=_write,
+)
+counters.BUFFERS.append(buffered_views)
+
+
+def view_counts(post_ids):
+    """Просмотры для набора постов одним запросом."""
+    return dict(
+        PostViewCount.objects.filter(
+            post_id__in=list(post_ids)
+        ).values_list('post_id', 'count')
+    )
+
+
+def attach_view_counts(page_obj):
+    """Проставляет ``post.views`` всем постам страницы."""
+    page_obj.object_list = list(page_obj.object_list)
+    counts = view_counts(post.pk for post in page_obj.object_list)
+    for post in page_obj.object_list:
+        post.views = counts.get(post.pk, 0)
+    return page_obj
+
+
+def most_viewed(limit):
+    """Id самых просматриваемых постов."""
+    return list(
+        PostViewCount.objects.order_by('-count').values_list(
+            'post_id', flat=True
+        )[:limit]
+    )
@@ -1,15 +1,35 @@
 from django.contrib.auth.decorators import login_required
+from django.core.validators import slug_re
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 
+from core import identity, pagecache
 
-from .models import Group, Follow, Post, User
+from . import (
+    archive, follows, groupstats, negative, sharding, suggestions, trending
+)
+from .counters import reaction_counts
+from .models import (
+    ArchivedPost, Group, Follow, Post, Reaction, Tag, TrendingBucket, User
+)
 from .forms import CommentForm, PostForm
-from .utils import paginations
+from .rendering import normalize_tag
+from .utils import LIST_DEFERRED, comments_page, paginations, posts_page
+from .viewcounts import attach_view_counts, record_view, view_counts
 
 
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = paginations(request, post_list)
+    pagecache.tag(request, 'posts')
+    post_list = sharding.merge(
+        archive.fall_through(
+            Post.objects.using(alias).defer(*LIST_DEFERRED).cached(),
+            ArchivedPost.objects.using(alias).defer(*LIST_DEFERRED),
+            key='all',
+        )
+        for alias in sharding.shards()
+    )
+    page_obj = attach_view_counts(paginations(request, post_list))
     context = {
         'page_obj': page_obj,
     }
@@ -17,40 +37,174 @@ def index(request):
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginations(request, post_list)
+    negative.groups.reject_unknown(slug)
+    group = identity.get_object_or_404(Group.objects.cached(), slug=slug)
+    pagecache.tag(request, f'group:{group.pk}')
+    post_list = sharding.merge(
+        archive.fall_through(
+            Post.objects.using(alias).filter(group=group).defer(
+                *LIST_DEFERRED
+            ).cached(),
+            ArchivedPost.objects.using(alias).filter(group=group).defer(
+                *LIST_DEFERRED
+            ),
+            key=f'group:{group.pk}',
+        )
+        for alias in sharding.shards()
+    )
+    page_obj = attach_view_counts(paginations(request, post_list))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'followed': follows.follow_states(
+            request.user, (post.author_id for post in page_obj)
+        ),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def group_index(request):
+    after = request.GET.get('after')
+    if after is not None and not slug_re.match(after):
+        raise Http404
+    groups, next_cursor = groupstats.directory_page(after)
+    context = {
+        'groups': groups,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
+def tag_posts(request, tag):
+    tag = get_object_or_404(Tag, name=normalize_tag(tag))
+    posts, next_cursor = posts_page(
+        tag.post_tags.all(), request.GET.get('after')
+    )
+    context = {
+        'tag': tag,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/tag_posts.html', context)
+
+
+@login_required
+def mentions(request):
+    posts, next_cursor = posts_page(
+        request.user.mentions.all(), request.GET.get('after')
+    )
+    context = {
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = paginations(request, post_list)
+    negative.users.reject_unknown(username)
+    author = identity.get_object_or_404(
+        User.objects.select_related('follow_counts'), username=username
+    )
+    pagecache.tag(request, f'author:{author.pk}')
+    post_list = archive.fall_through(
+        author.posts.defer(*LIST_DEFERRED).cached(),
+        author.archived_posts.defer(*LIST_DEFERRED),
+        key=f'author:{author.pk}',
+    )
+    page_obj = attach_view_counts(paginations(request, post_list))
+    followers_count, following_count = follows.counts(author)
     context = {
         'author': author,
         'page_obj': page_obj,
+        'following': author.pk in follows.follow_states(
+            request.user, [author.pk]
+        ),
+        'followers_count': followers_count,
+        'following_count': following_count,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    user = post.author
-    count = Post.objects.filter(author_id=user).all().count()
-    form = CommentForm(request.POST or None)
+    negative.posts.reject_unknown(post_id)
+    pagecache.tag(request, f'post:{post_id}')
+    post = archive.get_post(post_id, 'author', 'group')
+    pagecache.tag(request, f'author:{post.author_id}')
+    record_view(request, post.id)
+    count = archive.author_post_count(post.author_id)
+    form = CommentForm(
+        request.POST or None,
+        initial={'parent': request.GET.get('reply_to')}
+    )
+    comments, next_cursor = comments_page(post)
+    liked = request.user.is_authenticated and Reaction.objects.filter(
+        post_id=post.id, user=request.user
+    ).exists()
     context = {
         'post': post,
         'count': count,
         'form': form,
+        'comments': comments,
+        'next_cursor': next_cursor,
+        'liked': liked,
+        'reaction_count': (
+            post.reaction_count + reaction_counts.pending(post.id)
+        ),
+        'views': view_counts([post.id]).get(post.id, 0),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@pagecache.on_hit('posts:post_detail')
+def record_cached_view(request, post_id):
+    record_view(request, post_id)
+
+
+def post_comments(request, post_id):
+    post = archive.get_post(post_id)
+    comments, next_cursor = comments_page(post, request.GET.get('after'))
+    context = {
+        'post': post,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+def trending_page(request):
+    window = request.GET.get('window', trending.DEFAULT_WINDOW)
+    if window not in trending.WINDOWS:
+        raise Http404
+    ranked = {
+        kind: trending.top(kind, window)
+        for kind in (
+            TrendingBucket.POST, TrendingBucket.GROUP, TrendingBucket.AUTHOR
+        )
+    }
+    posts = sharding.in_bulk(
+        Post.objects.defer(*LIST_DEFERRED), ranked[TrendingBucket.POST],
+        'author', 'group',
+    )
+    groups = Group.objects.in_bulk(ranked[TrendingBucket.GROUP])
+    authors = User.objects.in_bulk(ranked[TrendingBucket.AUTHOR])
+    context = {
+        'window': window,
+        'windows': trending.WINDOWS,
+        'posts': [
+            posts[pk] for pk in ranked[TrendingBucket.POST] if pk in posts
+        ],
+        'groups': [
+            groups[pk] for pk in ranked[TrendingBucket.GROUP] if pk in groups
+        ],
+        'authors': [
+            authors[pk] for pk in ranked[TrendingBucket.AUTHOR]
+            if pk in authors
+        ],
+    }
+    return render(request, 'posts/trending.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None)
@@ -64,7 +218,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = sharding.get_post(post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
 
@@ -86,8 +240,9 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = sharding.get_post(post_id)
     form = CommentForm(request.POST or None)
+    form.fields['parent'].queryset = post.comments.all()
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -103,35 +258,90 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    page_obj = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    page_count = len(page_obj)
+    post_list = _followed_posts(request.user)
+    page_obj = attach_view_counts(paginations(request, post_list))
     context = {
         'page_obj': page_obj,
-        'page_count': page_count,
-        'follow': True
+        'follow': True,
+        'suggestions': suggestions.for_user(request.user),
     }
-    context.update(paginations(page_obj, request))
     return render(request, 'posts/follow.html', context)
 
 
+def _followed_posts(user):
+    # Запрос идёт от подписок: посты каждого автора берутся диапазоном
+    # индекса (author, pub_date), и сортируются только они, а не вся
+    # таблица. Подписок в шардах нет, поэтому авторы раскладываются по
+    # шардам заранее.
+    author_ids = list(Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    ))
+    parts = []
+    for alias, ids in sharding.authors_by_shard(author_ids).items():
+        hot = sharding.related(
+            Post.objects.using(alias).filter(author_id__in=ids),
+            'author', 'group',
+        ).defer(*LIST_DEFERRED)
+        archived = sharding.related(
+            ArchivedPost.objects.using(alias).filter(author_id__in=ids),
+            'author', 'group',
+        ).defer(*LIST_DEFERRED)
+        parts.append(archive.FallThrough(
+            hot, archived, hot.count(), archived.count()
+        ))
+    return sharding.merge(parts)
+
+
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = identity.get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(
+                user=request.user,
+                author=author
+            )
+            if created:
+                follows.adjust(request.user.pk, author.pk, 1)
+                suggestions.mark_stale(request.user.pk, author.pk)
     return redirect('posts:follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).delete()
+    author = identity.get_object_or_404(User, username=username)
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(
+            user=request.user,
+            author=author
+        ).delete()
+        if deleted:
+            follows.adjust(request.user.pk, author.pk, -1)
+            suggestions.mark_stale(request.user.pk, author.pk)
     return redirect('posts:follow_index')
+
+
+@login_required
+def post_like(request, post_id):
+    post = sharding.get_post(post_id)
+    if request.method == 'POST':
+        _, created = Reaction.objects.get_or_create(
+            user=request.user,
+            post=post
+        )
+        if created:
+            reaction_counts.add(post.id, 1)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+def post_unlike(request, post_id):
+    post = sharding.get_post(post_id)
+    if request.method == 'POST':
+        deleted, _ = Reaction.objects.filter(
+            user=request.user,
+            post=post
+        ).delete()
+        if deleted:
+            reaction_counts.add(post.id, -1)
+    return redirect('posts:post_detail', post_id=post_id)
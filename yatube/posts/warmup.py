@@ -0,0 +1,83 @@
+"""Страницы для прогрева кеша после деплоя, см. ``core.warmup``."""
+import math
+
+from django.conf import settings
+from django.urls import reverse
+
+from . import sharding
+from .models import ArchivedPost, GroupStats, Post, User
+from .viewcounts import most_viewed
+
+
+def _index_pages(limit):
+    total = sum(
+        Post.objects.using(alias).count()
+        + ArchivedPost.objects.using(alias).count()
+        for alias in sharding.shards()
+    )
+    pages = min(limit, math.ceil(total / settings.NUMBER_OF_POSTS_PER_PAGE))
+    index = reverse('posts:index')
+    return [index] + [f'{index}?page={page}' for page in range(2, pages + 1)]
+
+
+def _top_groups(limit):
+    return [
+        reverse('posts:group_posts', args=[slug])
+        for slug in GroupStats.objects.filter(post_count__gt=0).order_by(
+            '-post_count'
+        ).values_list('group__slug', flat=True)[:limit]
+    ]
+
+
+def _post_authors(post_ids):
+    """Авторы существующих постов из ``post_ids``: {id поста: id автора}."""
+    found = {}
+    for model in (Post, ArchivedPost):
+        missing = [post_id for post_id in post_ids if post_id not in found]
+        found.update(
+            (post_id, post.author_id) for post_id, post in sharding.in_bulk(
+                model.objects.only('author_id'), missing
+            ).items()
+        )
+    return {
+        post_id: found[post_id] for post_id in post_ids if post_id in found
+    }
+
+
+def _profiles(author_ids, limit):
+    author_ids = list(dict.fromkeys(author_ids))[:limit]
+    usernames = dict(
+        User.objects.filter(pk__in=author_ids).values_list('pk', 'username')
+    )
+    return [
+        reverse('posts:profile', args=[usernames[author_id]])
+        for author_id in author_ids if author_id in usernames
+    ]
+
+
+def urls(index_pages, groups, profiles, posts):
+    """Страницы по убыванию пользы: первые страницы ленты, самые большие
+    группы, профили авторов и сами посты с наибольшим числом просмотров.
+    Миниатюры картинок создаются при рисовании этих страниц.
+    """
+    # Удалённые посты остаются в счётчиках просмотров до сброса.
+    authors = _post_authors(most_viewed(max(posts, profiles)))
+    return (
+        _index_pages(index_pages)
+        + _top_groups(groups)
+        + _profiles(authors.values(), profiles)
+        + [
+            reverse('posts:post_detail', args=[post_id])
+            for post_id in list(authors)[:posts]
+        ]
+    )
+
+
+def default_urls():
+    """Страницы для прогрева при старте воркера."""
+    return urls(
+        settings.WARM_CACHE_INDEX_PAGES,
+        settings.WARM_CACHE_GROUPS,
+        settings.WARM_CACHE_PROFILES,
+        settings.WARM_CACHE_POSTS,
+    )
@@ -37,7 +37,9 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
-    'django.contrib.admin',
+    # Без автообнаружения при старте: admin.py приложений загружаются
+    # вместе с URLconf, см. yatube.urls.
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -49,13 +51,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',
+    'core.middleware.IdentityMapMiddleware',
+    'core.middleware.HoleMiddleware',
+    'core.middleware.PageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.SamplingProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -89,9 +96,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Запасной шард для постов: пустует, пока его нет в POST_SHARDS.
+    'posts_2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'posts_2.sqlite3'),
+    },
 }
 
+DATABASE_ROUTERS = ['posts.sharding.ShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -140,7 +154,27 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Базы, по которым посты и комментарии раскладываются по авторам,
+# см. posts.sharding.
+POST_SHARDS = ['default']
+SHARD_MAP_CACHE_TIMEOUT = 60
+
 NUMBER_OF_POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+GROUPS_PER_PAGE = 50
+GROUPS_PAGE_CACHE_TIMEOUT = 5 * 60
+POST_EXCERPT_LENGTH = 500
+TEXT_COMPRESSION_THRESHOLD = 2048
+POST_ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_COUNT_CACHE_TIMEOUT = 5 * 60
+COMMENT_MAX_DEPTH = 8
+REACTION_FLUSH_INTERVAL = 5
+REACTION_FLUSH_SIZE = 100
+VIEW_COUNT_FLUSH_INTERVAL = 30
+VIEW_COUNT_DEDUP_WINDOW = 30 * 60
+TRENDING_TOP = 10
+FOLLOW_SUGGESTIONS = 5
+TRENDING_REBUILD_INTERVAL = 5 * 60
 LIMIT_TEXT = 15
 FIRST_PAGE_RECORDS = NUMBER_OF_POSTS_PER_PAGE
 SECOND_PAGE_RECORDS = 3
@@ -160,3 +194,108 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Сколько секунд хранить результаты запросов с .cached(), см.
+# core.querycache. С LocMemCache кеш запросов выключен.
+QUERY_CACHE_TIMEOUT = 5 * 60
+
+# Сессии и снимки пользователей в кеше, см. core.sessions. Кеш
+# используется, только если он общий, с LocMemCache сессии в БД.
+SESSION_ENGINE = 'core.sessions'
+AUTH_USER_CACHE_TIMEOUT = 15 * 60
+
+# Страницы целиком из кеша, см. core.pagecache. При разработке и с
+# LocMemCache страницы рисуются заново.
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_VIEWS = [
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'about:author',
+    'about:tech',
+]
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_STALE_TIMEOUT = 5 * 60
+PAGE_CACHE_LOCK_TIMEOUT = 30
+
+# Пересчёт устаревших значений в одном воркере, см. core.stampede.
+STAMPEDE_BETA = 1.0
+STAMPEDE_GRACE = 60
+STAMPEDE_LOCK_TIMEOUT = 30
+STAMPEDE_WAIT = 0.5
+STAMPEDE_POLL_INTERVAL = 0.02
+
+# Таблицы URL, шаблоны и переводы загружаются при импорте
+# yatube.wsgi, до первого запроса, см. core.startup.
+STARTUP_PRELOAD = not DEBUG
+
+# Прогрев кеша после деплоя, см. core.warmup и команду warm_cache.
+# При старте прогревает один воркер и только общий кеш.
+WARM_CACHE_ON_STARTUP = not DEBUG
+# Сколько секунд после прогрева при старте воркеры его не повторяют.
+WARM_CACHE_LOCK_TIMEOUT = 10 * 60
+WARM_CACHE_HOST = 'localhost'
+WARM_CACHE_CONCURRENCY = 4
+WARM_CACHE_BUDGET = 30
+WARM_CACHE_INDEX_PAGES = 5
+WARM_CACHE_GROUPS = 10
+WARM_CACHE_PROFILES = 20
+WARM_CACHE_POSTS = 50
+
+# Модели, которые за запрос загружаются один раз, см. core.identity.
+IDENTITY_MAP_MODELS = ['auth.User', 'posts.Group']
+
+# Негативный кеш пользователей, групп и постов, см. core.negative.
+NEGATIVE_CACHE_ENABLED = True
+NEGATIVE_CACHE_REBUILD_INTERVAL = 10 * 60
+NEGATIVE_CACHE_ERROR_RATE = 0.01
+# Сколько секунд помнить ключ, которого не нашёл запрос к БД, когда кеш
+# не общий.
+NEGATIVE_CACHE_MISS_TIMEOUT = 60
+# Сколько секунд хранить страницу 404 для отказов негативного кеша.
+NOT_FOUND_CACHE_TIMEOUT = 60 * 60
+
+PROFILER_VIEWS = []
+# Как часто воркер перечитывает из БД view, включённые через
+# core:profiler, в секундах, см. core.profiling.watch.
+PROFILER_VIEWS_REFRESH = 5
+PROFILER_HEADER = 'HTTP_X_YATUBE_PROFILE'
+PROFILER_INTERVAL = 0.005
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG_INTERVAL = 60
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+        'slow_queries': {
+            'class': 'logging.FileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'yatube.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -20,12 +20,18 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+# Модули admin.py (а с ними формы и виджеты админки) загружаются здесь,
+# с URLconf: на первом запросе или в core.startup.preload до fork, а не
+# при старте процесса.
+admin.autodiscover()
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('core/', include('core.urls', namespace='core')),
 ]
 
 handler403 = 'core.views.permission_denied'
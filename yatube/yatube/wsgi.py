@@ -7,10 +7,32 @@ For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
-from django.core.wsgi import get_wsgi_application
-
+# django.utils.version импортирует distutils, а подмена из setuptools
+# тянет за собой pkg_resources. В окружении воркеров задайте
+# SETUPTOOLS_USE_DISTUTILS=stdlib: переменную читают при старте
+# интерпретатора, поэтому здесь её выставлять поздно.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
+from django.conf import settings  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
 application = get_wsgi_application()
+
+# Приложения загружены, их модули можно импортировать.
+from core import profiling, startup  # noqa: E402
+from posts import counters  # noqa: E402
+
+atexit.register(counters.flush_all)
+
+if settings.STARTUP_PRELOAD:
+    startup.preload()
+
+application = startup.after_start(application, profiling.watch)
+
+if settings.WARM_CACHE_ON_STARTUP:
+    from posts.warmup import default_urls
+
+    application = startup.warm_after_start(application, default_urls)